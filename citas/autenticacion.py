@@ -0,0 +1,71 @@
+"""
+Autenticación por token de la API con el usuario en caché.
+
+`TokenAuthentication` consulta Token y usuario en cada solicitud de la app.
+`TokenEnCache` guarda solo el id y el rol del usuario en la caché
+compartida (`CACHES`) durante `TOKEN_CACHE_TTL` segundos, así que una
+solicitud con un token ya visto no toca la base de datos para autenticarse.
+Con `DatabaseCache` (solo en desarrollo) leer la caché ya es una consulta,
+así que ahí no se guarda nada y se autentica igual que `TokenAuthentication`.
+`request.user` es entonces un CustomUser con solo esos campos cargados; los
+demás se leen de la base la primera vez que se usan (campos diferidos). En
+la caché no queda el hash de la contraseña ni otros datos del usuario.
+
+La entrada se borra al confirmarse cualquier cambio que pueda dejarla vieja
+(ver signals.py): cerrar sesión en la API o rotar el token (se borra el
+Token) y guardar o borrar el usuario (contraseña, rol, `is_active`). Una
+solicitud que leyó la base justo antes de ese cambio podría volver a dejar
+el usuario anterior; el TTL limita ese caso.
+"""
+import hashlib
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache, caches
+from django.core.cache.backends.db import DatabaseCache
+from django.db import transaction
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+
+
+def _clave(key):
+    # El token no se usa tal cual como llave de la caché
+    return f"token:{hashlib.sha256(key.encode()).hexdigest()}"
+
+
+def _cache_en_memoria():
+    # Se revisa en cada solicitud: override_settings puede cambiar CACHES
+    return not isinstance(caches['default'], DatabaseCache)
+
+
+class TokenEnCache(TokenAuthentication):
+
+    def authenticate_credentials(self, key):
+        if not _cache_en_memoria():
+            return super().authenticate_credentials(key)
+
+        guardado = cache.get(_clave(key))
+        if guardado is not None:
+            user = _usuario(*guardado)
+            return user, Token(key=key, user=user)
+
+        user, token = super().authenticate_credentials(key)
+        cache.set(_clave(key), (user.pk, user.role), settings.TOKEN_CACHE_TTL)
+        return user, token
+
+
+def _usuario(pk, role):
+    # Solo un usuario activo llega a la caché (TokenAuthentication lo revisa)
+    User = get_user_model()
+    return User.from_db(None, ['id', 'role', 'is_active'], [pk, role, True])
+
+
+def olvidar_token(key):
+    """Borra el usuario en caché de `key` al confirmarse la transacción."""
+    clave = _clave(key)
+    transaction.on_commit(lambda: cache.delete(clave))
+
+
+def olvidar_tokens_de(user_id):
+    for key in Token.objects.filter(user_id=user_id).values_list('key', flat=True):
+        olvidar_token(key)
@@ -0,0 +1,93 @@
+"""
+Búsqueda de pacientes.
+
+Cada paciente guarda en `busqueda` su nombre, apellidos, número de
+expediente y teléfono en minúsculas y sin acentos, separados por espacios
+(se actualiza en `Paciente.save`). Buscar es pedir que cada palabra del
+texto aparezca en esa columna; en PostgreSQL la atiende un índice GIN con
+`gin_trgm_ops` (migración 0023), sin recorrer la tabla. En SQLite la misma
+consulta es un LIKE sobre una sola columna.
+
+Una palabra con solo dígitos (o una P y dígitos) encuentra además al
+paciente con ese id o ese número de expediente exacto: '12', 'P12' y 'P0012'
+encuentran el expediente P0012.
+
+Los resultados se ordenan por relevancia: el id o expediente exacto y una
+palabra completa pesan más que un inicio de palabra y este más que un
+fragmento.
+"""
+import re
+import unicodedata
+from functools import reduce
+from operator import add
+
+from django.db.models import Case, IntegerField, Q, Value, When
+
+# Palabras del texto que se toman en cuenta
+MAX_PALABRAS = 5
+
+CAMPOS = ('nombre', 'apellido_paterno', 'apellido_materno', 'numero', 'telefono')
+
+# Orden de los resultados; sirve también para paginarlos (ver paginacion.py)
+ORDEN = ('-relevancia', 'apellido_paterno', 'nombre', 'id')
+
+
+def normalizar(texto):
+    """Minúsculas y sin acentos: 'Peña Ávila' -> 'pena avila'."""
+    texto = unicodedata.normalize('NFKD', texto or '')
+    return ''.join(c for c in texto if not unicodedata.combining(c)).lower()
+
+
+def texto_busqueda(paciente):
+    palabras = normalizar(' '.join(getattr(paciente, campo) or '' for campo in CAMPOS)).split()
+    # Espacios en los extremos para distinguir palabras completas e inicios
+    return f" {' '.join(palabras)} "
+
+
+def palabras_busqueda(texto):
+    return normalizar(texto).split()[:MAX_PALABRAS]
+
+
+def _numero(palabra):
+    """Id o expediente exacto para una palabra como '12' o 'p0012'; None si no es número."""
+    from .expedientes import formato_numero
+
+    digitos = re.fullmatch(r'p?(\d{1,9})', palabra)
+    if digitos is None:
+        return None
+    n = int(digitos.group(1))
+    return Q(pk=n) | Q(numero=formato_numero(n))
+
+
+def _peso(palabra):
+    numero = _numero(palabra)
+    return Case(
+        *([When(numero, then=Value(3))] if numero is not None else []),
+        When(busqueda__contains=f" {palabra} ", then=Value(3)),
+        When(busqueda__contains=f" {palabra}", then=Value(2)),
+        default=Value(1),
+        output_field=IntegerField(),
+    )
+
+
+def buscar_pacientes(texto, pacientes=None):
+    """
+    Pacientes que contienen todas las palabras de `texto`, con el atributo
+    `relevancia` y ordenados por ella. Sin palabras, ninguno.
+    """
+    from .models import Paciente
+
+    pacientes = Paciente.objects.all() if pacientes is None else pacientes
+    palabras = palabras_busqueda(texto)
+    if not palabras:
+        return pacientes.none()
+
+    for palabra in palabras:
+        condicion = Q(busqueda__contains=palabra)
+        numero = _numero(palabra)
+        if numero is not None:
+            condicion |= numero
+        pacientes = pacientes.filter(condicion)
+    return pacientes.annotate(
+        relevancia=reduce(add, (_peso(palabra) for palabra in palabras))
+    ).order_by(*ORDEN)
@@ -0,0 +1,92 @@
+"""
+Versiones reducidas de las imágenes de estudios para los PDFs de historial.
+
+El historial muestra cada imagen a 280x200 pt, así que no tiene sentido
+leer ni incrustar el original de varios MB. El derivado se guarda junto al
+original (`<nombre con extensión>_hist.jpg`) al subir el estudio, o la primera vez que se
+necesita para los estudios anteriores.
+"""
+import logging
+import os
+import tempfile
+
+from PIL import Image as PILImage
+
+from . import tasks
+from .ocr import es_imagen
+
+logger = logging.getLogger(__name__)
+
+# El doble del tamaño en el PDF (280x200 pt) para que se imprima nítido
+TAMANO_DERIVADO = (560, 400)
+CALIDAD_JPEG = 75
+SUFIJO = '_hist.jpg'
+
+
+def nombre_derivado(nombre):
+    # Con la extensión: `x.jpg` y `x.png` (archivos anteriores a los nombres
+    # por contenido) no comparten derivado
+    return nombre + SUFIJO
+
+
+def _nombre_derivado_anterior(nombre):
+    # Nombre que usaban los derivados antes de incluir la extensión
+    return os.path.splitext(nombre)[0] + SUFIJO
+
+
+def generar_derivado(archivo):
+    """Crea (si no existe) el derivado de `archivo` y devuelve su ruta."""
+    ruta = archivo.storage.path(nombre_derivado(archivo.name))
+    if os.path.exists(ruta):
+        return ruta
+
+    with archivo.storage.open(archivo.name) as f:
+        imagen = PILImage.open(f)
+        imagen.thumbnail(TAMANO_DERIVADO)
+        if imagen.mode not in ('RGB', 'L'):
+            imagen = imagen.convert('RGB')
+
+        # Se escribe a un temporal y se renombra para que dos procesos
+        # generando el mismo derivado no dejen un archivo a medias.
+        fd, temporal = tempfile.mkstemp(suffix='.jpg', dir=os.path.dirname(ruta))
+        try:
+            with os.fdopen(fd, 'wb') as salida:
+                imagen.save(salida, 'JPEG', quality=CALIDAD_JPEG, optimize=True)
+            os.replace(temporal, ruta)
+        except Exception:
+            if os.path.exists(temporal):
+                os.remove(temporal)
+            raise
+    return ruta
+
+
+def ruta_para_pdf(estudio):
+    """
+    Ruta de la imagen a incrustar en el PDF: el derivado, generándolo si hace
+    falta, o el original si no se pudo generar.
+    """
+    try:
+        return generar_derivado(estudio.archivo)
+    except Exception:
+        logger.exception("No se pudo generar el derivado del estudio %s", estudio.id)
+        return estudio.archivo.path
+
+
+def eliminar_derivado(storage, nombre):
+    for derivado in (nombre_derivado(nombre), _nombre_derivado_anterior(nombre)):
+        ruta = storage.path(derivado)
+        if os.path.exists(ruta):
+            os.remove(ruta)
+
+
+def _generar_derivado_estudio(estudio_id):
+    from .models import Estudio
+
+    estudio = Estudio.objects.filter(id=estudio_id).first()
+    if estudio is not None:
+        generar_derivado(estudio.archivo)
+
+
+def encolar_derivado(estudio):
+    if es_imagen(estudio.archivo.name):
+        tasks.encolar(_generar_derivado_estudio, estudio.id)
@@ -0,0 +1,222 @@
+"""
+Disponibilidad de horarios de los doctores.
+
+La agenda de un doctor en un día se carga con una sola consulta y se guarda
+como una lista ordenada de minutos (desde la medianoche) de sus citas. Con
+`bisect` se responde en O(log n) si una hora choca con otra cita (a menos de
+`INTERVALO` minutos); la lista de horas libres se obtiene recorriendo la
+cuadrícula y la lista ordenada a la vez. La usan `CitaForm`, el reagendado
+automático (services.py) y la API de disponibilidad.
+
+`buscar_espacios` hace lo mismo para varios doctores y un rango de fechas:
+una consulta por rango y un barrido en memoria, día por día, en orden
+cronológico.
+
+`reservar_cita` guarda una cita sin dobles reservas: dentro de una
+transacción toma un bloqueo de la agenda (doctor, día) y vuelve a revisar la
+agenda antes de escribir. En PostgreSQL es un advisory lock de transacción,
+así que solo esperan las reservas del mismo doctor y día; las demás no se
+bloquean ni se reintentan.
+"""
+import heapq
+from bisect import bisect_left, insort
+from collections import defaultdict
+from datetime import time, timedelta
+
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .models import Cita, Doctor
+
+# Horario de consulta y separación mínima entre citas
+HORA_INICIO = time(9, 30)
+HORA_FIN = time(16, 0)
+INTERVALO = 15  # minutos
+MAX_CITAS_POR_DIA = 20
+
+# Las citas canceladas no ocupan su horario
+ESTADO_CANCELADA = 'Cancelada'
+
+
+def _minutos(hora):
+    return hora.hour * 60 + hora.minute
+
+
+def _hora(minutos):
+    return time(minutos // 60, minutos % 60)
+
+
+def en_horario(hora):
+    return HORA_INICIO <= hora <= HORA_FIN
+
+
+class AgendaDia:
+    """Horas ocupadas de un doctor en un día."""
+
+    def __init__(self, horas=()):
+        self.ocupados = sorted(_minutos(hora) for hora in horas)
+
+    def __len__(self):
+        return len(self.ocupados)
+
+    @property
+    def llena(self):
+        return len(self.ocupados) >= MAX_CITAS_POR_DIA
+
+    def agregar(self, hora):
+        insort(self.ocupados, _minutos(hora))
+
+    def conflicto(self, hora):
+        """Hora de una cita a menos de `INTERVALO` minutos de `hora`, o None."""
+        minutos = _minutos(hora)
+        i = bisect_left(self.ocupados, minutos)
+        # Solo las citas vecinas (la anterior y la siguiente) pueden chocar
+        for j in (i - 1, i):
+            if 0 <= j < len(self.ocupados) and abs(self.ocupados[j] - minutos) < INTERVALO:
+                return _hora(self.ocupados[j])
+        return None
+
+    def libre(self, hora):
+        return en_horario(hora) and not self.llena and self.conflicto(hora) is None
+
+    def horas_libres(self, desde=None):
+        """
+        Horas de la cuadrícula de `INTERVALO` minutos entre `HORA_INICIO` y
+        `HORA_FIN` (a partir de `desde`, si se da) sin citas cerca. No toma en
+        cuenta `MAX_CITAS_POR_DIA`; para eso está `llena`.
+        """
+        inicio = _minutos(HORA_INICIO)
+        if desde is not None and _minutos(desde) > inicio:
+            # Primer punto de la cuadrícula en o después de `desde`
+            inicio += -(-(_minutos(desde) - inicio) // INTERVALO) * INTERVALO
+
+        j = 0
+        for minutos in range(inicio, _minutos(HORA_FIN) + 1, INTERVALO):
+            while j < len(self.ocupados) and self.ocupados[j] <= minutos - INTERVALO:
+                j += 1
+            # ocupados[j] es la primera cita que podría chocar con `minutos`
+            if j < len(self.ocupados) and self.ocupados[j] < minutos + INTERVALO:
+                continue
+            yield _hora(minutos)
+
+    def siguiente_libre(self, desde=None):
+        """Primera hora en la que se puede agendar, o None si no hay."""
+        if self.llena:
+            return None
+        return next(self.horas_libres(desde), None)
+
+
+def cargar_agenda(doctor, fecha, excluir=None):
+    """
+    Agenda de `doctor` en `fecha` en una consulta. `excluir` es el id de una
+    cita que no cuenta (la que se está modificando o reagendando).
+    """
+    # Con estado exacto (no iexact) la consulta usa el índice parcial cita_agenda_activa_idx
+    citas = Cita.objects.filter(doctor=doctor, fecha=fecha).exclude(estado=ESTADO_CANCELADA)
+    if excluir is not None:
+        citas = citas.exclude(pk=excluir)
+    return AgendaDia(citas.values_list('hora', flat=True))
+
+
+def cargar_agendas(desde, hasta, doctores, excluir=None):
+    """
+    Agendas {(doctor_id, fecha): AgendaDia} de `doctores` (ids) entre
+    `desde` y `hasta`, en una consulta. Los días sin citas no aparecen.
+    """
+    citas = (
+        Cita.objects.filter(doctor__in=doctores, fecha__range=(desde, hasta))
+        .exclude(estado=ESTADO_CANCELADA)
+    )
+    if excluir is not None:
+        citas = citas.exclude(pk=excluir)
+
+    horas = defaultdict(list)
+    for doctor_id, fecha, hora in citas.values_list('doctor_id', 'fecha', 'hora').order_by():
+        horas[(doctor_id, fecha)].append(hora)
+    return {clave: AgendaDia(lista) for clave, lista in horas.items()}
+
+
+def _con_doctor(horas, doctor_id):
+    for hora in horas:
+        yield hora, doctor_id
+
+
+def buscar_espacios(desde, hasta, doctores=None, limite=10, excluir=None, ahora=None):
+    """
+    Primeros `limite` espacios libres entre `desde` y `hasta` como tuplas
+    (fecha, hora, doctor_id), en orden cronológico. Sin `doctores` se busca
+    en todos. Hoy solo cuentan las horas posteriores a `ahora` (con zona
+    horaria; por omisión, el momento actual).
+    """
+    # Hora local del consultorio (TIME_ZONE), no la del servidor
+    ahora = timezone.localtime(ahora)
+    desde = max(desde, ahora.date())
+    if limite <= 0 or desde > hasta:
+        return []
+    if doctores is None:
+        doctores = list(Doctor.objects.values_list('pk', flat=True))
+    doctores = sorted(doctores)
+    agendas = cargar_agendas(desde, hasta, doctores, excluir=excluir)
+
+    espacios = []
+    vacia = AgendaDia()
+    fecha = desde
+    while fecha <= hasta and len(espacios) < limite:
+        hora_minima = ahora.time() if fecha == ahora.date() else None
+        por_doctor = []
+        for doctor_id in doctores:
+            agenda = agendas.get((doctor_id, fecha), vacia)
+            if not agenda.llena:
+                por_doctor.append(_con_doctor(agenda.horas_libres(hora_minima), doctor_id))
+        # Las horas de cada doctor ya vienen ordenadas; se mezclan por hora
+        for hora, doctor_id in heapq.merge(*por_doctor):
+            espacios.append((fecha, hora, doctor_id))
+            if len(espacios) >= limite:
+                break
+        fecha += timedelta(days=1)
+    return espacios
+
+
+# ---------------------------
+# Reserva
+# ---------------------------
+class HorarioOcupado(Exception):
+    """La hora ya no está libre al momento de guardar la cita."""
+
+
+def bloquear_agenda(doctor_id, fecha):
+    """
+    Bloquea la agenda de `doctor_id` en `fecha` hasta el fin de la
+    transacción en curso. En otros motores se bloquea la fila del doctor
+    (SQLite no tiene SELECT ... FOR UPDATE: ahí hace falta
+    `"transaction_mode": "IMMEDIATE"` en OPTIONS, que serializa las escrituras).
+    """
+    if connection.vendor == 'postgresql':
+        # La forma de dos enteros: (doctor, día) sin combinarlos en una clave
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT pg_advisory_xact_lock(%s::integer, %s::integer)",
+                [doctor_id, fecha.toordinal()],
+            )
+    else:
+        list(Doctor.objects.select_for_update().filter(pk=doctor_id).values_list('pk'))
+
+
+def reservar_cita(cita):
+    """
+    Guarda `cita` si su hora sigue libre. Lanza `HorarioOcupado` si otra
+    reserva confirmada antes la ocupó o llenó el día.
+    """
+    with transaction.atomic():
+        bloquear_agenda(cita.doctor_id, cita.fecha)
+        agenda = cargar_agenda(cita.doctor_id, cita.fecha, excluir=cita.pk)
+        ocupada = agenda.conflicto(cita.hora)
+        if ocupada is not None:
+            raise HorarioOcupado(
+                f"⚠️ El horario de las {ocupada.strftime('%H:%M')} acaba de ser ocupado. "
+                "Debe dejar al menos 15 minutos de diferencia."
+            )
+        if agenda.llena:
+            raise HorarioOcupado("📅 Este día acaba de llenarse. Por favor, seleccione otra fecha.")
+        cita.save()
+    return cita
@@ -0,0 +1,154 @@
+"""
+Números de expediente de los pacientes (P0001, P0002, ...).
+
+En PostgreSQL salen de una secuencia (`SECUENCIA`): `nextval` no espera a
+otras transacciones, así que dos registros simultáneos nunca repiten número.
+En otros motores se usa el contador `Consecutivo(CONSECUTIVO)`, que se
+incrementa con un UPDATE atómico (la fila queda bloqueada hasta el fin de la
+transacción). Los dos reservan varios números en un solo paso para las
+importaciones. Un número reservado en una transacción que se revierte no se
+reutiliza: puede haber huecos, nunca repetidos.
+
+Los números no se revisan antes de usarse: la restricción única de
+`Paciente.numero` rechaza uno repetido y `guardar_con_numero` (o
+`importar_pacientes`) reserva otro y reintenta. Eso solo pasa si el contador
+quedó atrás de los expedientes porque se cargaron pacientes con su número ya
+puesto (`loaddata`, un respaldo); la migración 0022 lo deja al día al
+crearlo y después de una carga se corre el comando `sincronizar_expedientes`.
+"""
+from django.db import IntegrityError, connection, transaction
+from django.db.models import F
+from django.db.models.functions import Greatest
+
+from . import typeahead
+from .busqueda import texto_busqueda
+from .models import Consecutivo, Paciente
+
+SECUENCIA = 'citas_paciente_numero_seq'
+CONSECUTIVO = 'paciente_numero'
+# Números que se prueban si el guardado choca con un expediente existente
+INTENTOS_NUMERO = 10
+
+
+def formato_numero(n):
+    return f"P{n:04d}"
+
+
+def reservar_numeros(cantidad=1):
+    """Lista de `cantidad` números nuevos, en orden."""
+    if cantidad <= 0:
+        return []
+
+    if connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT nextval(%s) FROM generate_series(1, %s)", [SECUENCIA, cantidad])
+            return sorted(fila[0] for fila in cursor.fetchall())
+
+    with transaction.atomic():
+        actualizados = Consecutivo.objects.filter(nombre=CONSECUTIVO).update(ultimo=F('ultimo') + cantidad)
+        if not actualizados:
+            # La migración crea el contador; esto solo pasa en una base sin ella
+            Consecutivo.objects.create(nombre=CONSECUTIVO, ultimo=ultimo_numero() + cantidad)
+        ultimo = Consecutivo.objects.values_list('ultimo', flat=True).get(nombre=CONSECUTIVO)
+    return list(range(ultimo - cantidad + 1, ultimo + 1))
+
+
+def asignar_numeros(cantidad=1, ocupados=()):
+    """
+    `cantidad` números de expediente nuevos, ya con formato, que no aparecen
+    en `ocupados`. No consulta a los pacientes: un número ya usado lo detecta
+    la restricción única al guardar.
+    """
+    ocupados = set(ocupados)
+    numeros = []
+    while len(numeros) < cantidad:
+        nuevos = (formato_numero(n) for n in reservar_numeros(cantidad - len(numeros)))
+        numeros.extend(n for n in nuevos if n not in ocupados)
+    return numeros
+
+
+def _numero_repetido(numeros):
+    # Solo después de un IntegrityError: ¿fue el número o otra restricción (el teléfono)?
+    return Paciente.objects.filter(numero__in=numeros).exists()
+
+
+def guardar_con_numero(paciente, guardar):
+    """
+    Pone a `paciente` un número nuevo y lo guarda con `guardar()`. Si otro
+    paciente ya tiene ese número, se reintenta con el siguiente.
+    """
+    for _ in range(INTENTOS_NUMERO):
+        paciente.numero = asignar_numeros()[0]
+        try:
+            with transaction.atomic():
+                guardar()
+            return
+        except IntegrityError:
+            if not _numero_repetido([paciente.numero]):
+                raise
+    raise RuntimeError(
+        "No se pudo asignar un número de expediente libre; corre `manage.py sincronizar_expedientes`."
+    )
+
+
+def sincronizar_contador():
+    """
+    Adelanta la secuencia (o el contador) hasta el mayor número usado. Nunca
+    la regresa. Devuelve ese número.
+    """
+    ultimo = ultimo_numero()
+    if connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"SELECT setval(%s, GREATEST(%s, last_value)) FROM {SECUENCIA}", [SECUENCIA, ultimo]
+            )
+        return ultimo
+
+    actualizados = Consecutivo.objects.filter(nombre=CONSECUTIVO).update(ultimo=Greatest(F('ultimo'), ultimo))
+    if not actualizados:
+        Consecutivo.objects.create(nombre=CONSECUTIVO, ultimo=ultimo)
+    return ultimo
+
+
+def ultimo_numero(pacientes=None):
+    """Mayor número ya usado: el de los expedientes o, si es mayor, el id."""
+    pacientes = Paciente.objects.all() if pacientes is None else pacientes
+    mayor = 0
+    for numero, paciente_id in pacientes.values_list('numero', 'id').iterator():
+        mayor = max(mayor, paciente_id)
+        if numero[1:].isdigit():
+            mayor = max(mayor, int(numero[1:]))
+    return mayor
+
+
+def importar_pacientes(pacientes, lote=500):
+    """
+    Guarda `pacientes` (instancias sin guardar) con `bulk_create`. Los
+    números de expediente se reservan todos juntos. No se disparan las
+    señales de guardado; los pacientes nuevos no tienen documentos en caché
+    que invalidar, solo el índice de autocompletado.
+    """
+    sin_numero = [p for p in pacientes if not p.numero]
+    ocupados = [p.numero for p in pacientes if p.numero]
+    for paciente in pacientes:
+        paciente.calcular_edad()
+
+    for _ in range(INTENTOS_NUMERO):
+        for paciente, numero in zip(sin_numero, asignar_numeros(len(sin_numero), ocupados)):
+            paciente.numero = numero
+        for paciente in pacientes:
+            paciente.busqueda = texto_busqueda(paciente)
+        try:
+            with transaction.atomic():
+                creados = Paciente.objects.bulk_create(pacientes, batch_size=lote)
+            break
+        except IntegrityError:
+            if not _numero_repetido([p.numero for p in sin_numero]):
+                raise
+    else:
+        raise RuntimeError(
+            "No se pudieron asignar números de expediente libres; corre `manage.py sincronizar_expedientes`."
+        )
+    # Sin señales: al confirmarse, los procesos toman los pacientes nuevos por updated_at
+    typeahead.pacientes_importados()
+    return creados
@@ -0,0 +1,178 @@
+"""
+Exportación de PDFs (historial, reportes) en segundo plano.
+
+La vista crea una `ExportacionPDF` y responde de inmediato con una página
+que consulta el estado. El PDF lo genera el worker
+`manage.py procesar_exportaciones` (ver Procfile), un proceso aparte de
+gunicorn: una ráfaga de reportes de fin de mes no le quita CPU ni GIL a las
+solicitudes, y si el worker se reinicia las exportaciones siguen en la base.
+
+Cada worker toma una exportación con un UPDATE condicionado a su estado, así
+que varios workers no generan la misma. Una que lleva más de
+`EXPORTACION_TIMEOUT` segundos 'Procesando' (su worker murió) se vuelve a
+tomar, hasta `EXPORTACION_INTENTOS` veces; después queda en 'Error'. El
+archivo se puede descargar durante `EXPORTACION_VIGENCIA` segundos.
+
+Pedir otra vez el mismo documento (recargar la página) no encola otro: se
+reutiliza la exportación del usuario con los mismos parámetros mientras los
+datos no cambien (ver `HUELLAS` y versiones.py).
+"""
+import logging
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files import File
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .models import Cita, ExportacionPDF, Paciente
+from .pdfs import archivo_temporal, render_historial, render_reporte
+from .services import HistorialPorLotes
+from .versiones import huella
+
+logger = logging.getLogger(__name__)
+
+
+# ---------------------------
+# Generadores por tipo
+# ---------------------------
+def _generar_historial(destino, paciente_id, cita_id=None):
+    paciente = Paciente.objects.get(id=paciente_id)
+    cita_actual = None
+    if cita_id is not None:
+        cita_actual = Cita.objects.select_related('doctor__user').get(id=cita_id)
+    render_historial(destino, paciente, HistorialPorLotes(paciente), cita_actual=cita_actual)
+
+
+def _generar_reporte(destino, titulo, inicio, fin):
+    citas = (
+        Cita.objects.filter(fecha__range=(inicio, fin))
+        .select_related('paciente', 'doctor__user')
+        .order_by('fecha', 'hora')
+        .iterator(chunk_size=500)
+    )
+    render_reporte(destino, titulo, citas)
+
+
+GENERADORES = {
+    'historial': _generar_historial,
+    'reporte': _generar_reporte,
+}
+
+
+# ---------------------------
+# Versión de los datos por tipo
+# ---------------------------
+def _huella_historial(paciente_id, cita_id=None):
+    # Las citas, signos y estudios del paciente, sus datos y los nombres de sus doctores
+    doctores = Cita.objects.filter(paciente_id=paciente_id).values_list('doctor__user_id', flat=True)
+    return huella(
+        ('historial', paciente_id),
+        ('paciente', paciente_id),
+        *(('usuario', usuario_id) for usuario_id in sorted(set(doctores))),
+    )
+
+
+def _huella_reporte(titulo, inicio, fin):
+    # Cualquier cita, paciente o usuario puede aparecer en un reporte
+    return huella(('reporte', 'citas'))
+
+
+HUELLAS = {
+    'historial': _huella_historial,
+    'reporte': _huella_reporte,
+}
+
+
+# ---------------------------
+# Cola
+# ---------------------------
+def encolar_exportacion(usuario, tipo, nombre_descarga, **parametros):
+    """
+    Registra la exportación para el worker. Los `parametros` se guardan como
+    JSON y se pasan tal cual al generador.
+
+    Si el usuario ya tiene una exportación igual (mismo tipo, parámetros y
+    huella de los datos) pendiente, en proceso o lista para descargar, se
+    devuelve esa en lugar de crear otra.
+    """
+    huella_actual = HUELLAS[tipo](**parametros)
+    existente = (
+        ExportacionPDF.objects.filter(
+            usuario=usuario, tipo=tipo, parametros=parametros, huella=huella_actual,
+            estado__in=['Pendiente', 'Procesando', 'Completado'],
+        )
+        .exclude(expira_en__lte=timezone.now())
+        .order_by('-creado_en', '-id')
+        .first()
+    )
+    if existente is not None:
+        return existente
+
+    return ExportacionPDF.objects.create(
+        usuario=usuario,
+        tipo=tipo,
+        parametros=parametros,
+        nombre_descarga=nombre_descarga,
+        huella=huella_actual,
+    )
+
+
+def tomar_exportacion():
+    """
+    Marca como 'Procesando' la exportación pendiente más antigua (o una
+    abandonada por un worker que murió) y la devuelve; None si no hay.
+
+    Una abandonada que ya se tomó `EXPORTACION_INTENTOS` veces (por ejemplo,
+    un PDF que siempre agota la memoria del worker) pasa a 'Error'.
+    """
+    abandonada = timezone.now() - timedelta(seconds=settings.EXPORTACION_TIMEOUT)
+    candidatas = ExportacionPDF.objects.filter(
+        Q(estado='Pendiente') | Q(estado='Procesando', tomada_en__lt=abandonada) |
+        Q(estado='Procesando', tomada_en__isnull=True)
+    ).order_by('creado_en', 'id').values_list('id', 'estado', 'tomada_en', 'intentos')[:10]
+
+    for exportacion_id, estado, tomada_en, intentos in candidatas:
+        # Solo uno de los workers que la vieron cumple la condición
+        vista = ExportacionPDF.objects.filter(
+            id=exportacion_id, estado=estado, tomada_en=tomada_en, intentos=intentos,
+        )
+        if intentos >= settings.EXPORTACION_INTENTOS:
+            vista.update(estado='Error', error=f"Sin terminar después de {intentos} intentos.")
+            continue
+        if vista.update(estado='Procesando', tomada_en=timezone.now(), intentos=F('intentos') + 1):
+            return ExportacionPDF.objects.get(id=exportacion_id)
+    return None
+
+
+def procesar_pendientes():
+    """Genera todas las exportaciones que se puedan tomar; devuelve cuántas."""
+    total = 0
+    while (exportacion := tomar_exportacion()) is not None:
+        generar_exportacion(exportacion)
+        total += 1
+    return total
+
+
+def generar_exportacion(exportacion):
+    """Genera el PDF de una exportación ya tomada con `tomar_exportacion`."""
+    try:
+        with archivo_temporal() as destino:
+            GENERADORES[exportacion.tipo](destino, **exportacion.parametros)
+            destino.seek(0)
+            exportacion.archivo.save(f"{uuid.uuid4().hex}.pdf", File(destino), save=False)
+    except Exception as e:
+        logger.exception("No se pudo generar la exportación %s", exportacion.id)
+        exportacion.estado = 'Error'
+        exportacion.error = str(e)
+        exportacion.save(update_fields=['estado', 'error'])
+        return
+
+    exportacion.estado = 'Completado'
+    exportacion.expira_en = timezone.now() + timedelta(seconds=settings.EXPORTACION_VIGENCIA)
+    exportacion.save(update_fields=['estado', 'archivo', 'expira_en'])
+
+
+def vencida(exportacion):
+    return exportacion.expira_en is not None and exportacion.expira_en <= timezone.now()
@@ -0,0 +1,123 @@
+"""
+Extracción de texto de estudios en segundo plano.
+
+`agregar_estudio` solo guarda el archivo y llama a `encolar_extraccion`.
+Cada página se envía por separado al pool de procesos de OCR y su texto se
+guarda en `PaginaExtraida` con el SHA-256 del archivo, de modo que volver a
+subir o a procesar el mismo archivo no repite el trabajo.
+
+Cada tarea hace un intento. Si falla y quedan intentos, el estudio vuelve a
+'Pendiente' y se encola de nuevo con espera exponencial
+(`tasks.encolar_despues`), sin ocupar un hilo del pool mientras espera.
+"""
+import logging
+from concurrent.futures.process import BrokenProcessPool
+
+from django.conf import settings
+
+from . import ocr, tasks
+from .models import Estudio, PaginaExtraida
+from .storage import sha256_de_nombre
+
+logger = logging.getLogger(__name__)
+
+MAX_INTENTOS = 3
+
+
+def encolar_extraccion(estudio):
+    # Si el mismo archivo ya se procesó para otro estudio se reutiliza el texto
+    previo = (
+        Estudio.objects.filter(archivo=estudio.archivo.name, estado_extraccion='Completado')
+        .exclude(id=estudio.id)
+        .values_list('texto_extraido', flat=True)
+        .first()
+    )
+    if previo is not None and sha256_de_nombre(estudio.archivo.name):
+        estudio.texto_extraido = previo
+        estudio.estado_extraccion = 'Completado'
+        estudio.save(update_fields=['texto_extraido', 'estado_extraccion'])
+        return
+
+    tasks.encolar(procesar_estudio, estudio.id)
+
+
+def extraer_texto(ruta):
+    """
+    Texto completo de un archivo. Solo se procesan las páginas que no están
+    ya en caché; el resto se reparte entre los procesos del pool.
+    """
+    if not (ocr.es_pdf(ruta) or ocr.es_imagen(ruta)):
+        return "Tipo de archivo no compatible."
+
+    sha256 = sha256_de_nombre(ruta) or ocr.sha256_archivo(ruta)
+    total = ocr.contar_paginas(ruta)
+
+    textos = dict(
+        PaginaExtraida.objects.filter(archivo_sha256=sha256, pagina__lt=total)
+        .values_list('pagina', 'texto')
+    )
+
+    faltantes = [n for n in range(total) if n not in textos]
+    if faltantes:
+        timeout = getattr(settings, 'OCR_TIMEOUT', 300)
+        pool = tasks.pool_procesos()
+        futuros = {n: pool.submit(ocr.extraer_pagina, ruta, n) for n in faltantes}
+
+        nuevas = []
+        try:
+            for n, futuro in futuros.items():
+                textos[n] = futuro.result(timeout=timeout)
+                nuevas.append(PaginaExtraida(archivo_sha256=sha256, pagina=n, texto=textos[n]))
+        except TimeoutError:
+            # cancel() no detiene una página que ya corre: se terminan los procesos
+            tasks.descartar_pool_procesos(terminar=True)
+            raise
+        finally:
+            for futuro in futuros.values():
+                futuro.cancel()
+            # Si una página falla, las ya extraídas quedan guardadas para el reintento
+            PaginaExtraida.objects.bulk_create(nuevas, ignore_conflicts=True)
+
+    return "\n".join(textos[n] for n in range(total) if textos[n]).strip()
+
+
+def intentar_extraccion(estudio):
+    """
+    Un intento de extraer el texto de `estudio`. Si falla, el estudio queda
+    'Pendiente' mientras le queden intentos y 'Error' después de
+    MAX_INTENTOS. Devuelve True si el texto quedó guardado.
+    """
+    estudio.estado_extraccion = 'Procesando'
+    estudio.intentos_extraccion += 1
+    estudio.save(update_fields=['estado_extraccion', 'intentos_extraccion'])
+
+    try:
+        texto = extraer_texto(estudio.archivo.path)
+    except Exception as e:
+        if isinstance(e, BrokenProcessPool):
+            tasks.descartar_pool_procesos()
+        logger.exception(
+            "Fallo al extraer texto del estudio %s (intento %s)",
+            estudio.id, estudio.intentos_extraccion,
+        )
+        estudio.estado_extraccion = 'Pendiente' if estudio.intentos_extraccion < MAX_INTENTOS else 'Error'
+        estudio.save(update_fields=['estado_extraccion'])
+        return False
+
+    estudio.texto_extraido = texto
+    estudio.estado_extraccion = 'Completado'
+    estudio.save(update_fields=['texto_extraido', 'estado_extraccion'])
+    return True
+
+
+def procesar_estudio(estudio_id):
+    """
+    Tarea de la cola: un intento de extracción; si falla y quedan intentos
+    se vuelve a encolar tras 2**intentos segundos.
+    """
+    estudio = Estudio.objects.filter(id=estudio_id).first()
+    if estudio is None or estudio.estado_extraccion in ('Completado', 'Error'):
+        return
+
+    if not intentar_extraccion(estudio) and estudio.estado_extraccion == 'Pendiente':
+        tasks.encolar_despues(2 ** estudio.intentos_extraccion, procesar_estudio, estudio.id)
@@ -105,7 +105,7 @@ class PacienteForm(forms.ModelForm):
 # Formulario de Cita
 # -------------------------
 from django.core.exceptions import ValidationError
-from datetime import datetime, time, timedelta
+from .disponibilidad import cargar_agenda, en_horario, reservar_cita
 
 class CitaForm(forms.ModelForm):
     doctor_user = forms.ModelChoiceField(
@@ -142,31 +142,22 @@ class CitaForm(forms.ModelForm):
             return cleaned_data
 
         # Rango horario permitido: 9:30 AM a 4:00 PM
-        hora_inicio = time(9, 30)
-        hora_fin = time(16, 0)
-
-        if not (hora_inicio <= hora <= hora_fin):
+        if not en_horario(hora):
             raise ValidationError("⏰ Solo se pueden agendar citas entre 9:30 AM y 4:00 PM.")
 
-        # Intervalo mínimo de 15 minutos
-        citas_existentes = Cita.objects.filter(fecha=fecha, doctor=doctor)
-        for cita in citas_existentes:
-            diferencia = abs(datetime.combine(date.today(), cita.hora) - datetime.combine(date.today(), hora))
-            if diferencia < timedelta(minutes=15):
-                raise ValidationError(f"⚠️ Ya existe una cita para ese horario ({cita.hora.strftime('%H:%M')}). "
-                                      "Debe dejar al menos 15 minutos de diferencia.")
-
-        # Validar máximo de citas por día (ejemplo: 20 citas diarias por doctor)
-        MAX_CITAS_POR_DIA = 20
-        if citas_existentes.count() >= MAX_CITAS_POR_DIA:
-            # Calcular horas disponibles
-            horas_disponibles = []
-            hora_actual = hora_inicio
-            while hora_actual <= hora_fin:
-                if not Cita.objects.filter(fecha=fecha, doctor=doctor, hora=hora_actual).exists():
-                    horas_disponibles.append(hora_actual.strftime("%H:%M"))
-                hora_actual = (datetime.combine(date.today(), hora_actual) + timedelta(minutes=15)).time()
+        # Agenda del doctor ese día, en una consulta (ver disponibilidad.py).
+        # Al modificar una cita, ella misma no cuenta.
+        agenda = cargar_agenda(doctor, fecha, excluir=self.instance.pk)
 
+        # Intervalo mínimo de 15 minutos
+        ocupada = agenda.conflicto(hora)
+        if ocupada is not None:
+            raise ValidationError(f"⚠️ Ya existe una cita para ese horario ({ocupada.strftime('%H:%M')}). "
+                                  "Debe dejar al menos 15 minutos de diferencia.")
+
+        # Validar máximo de citas por día (MAX_CITAS_POR_DIA por doctor)
+        if agenda.llena:
+            horas_disponibles = [h.strftime("%H:%M") for h in agenda.horas_libres()]
             horas_str = ", ".join(horas_disponibles) if horas_disponibles else "Ninguna"
             raise ValidationError(
                 f"📅 Este día ya tiene el máximo de citas asignadas. Por favor, seleccione otra fecha.\n"
@@ -184,7 +175,9 @@ class CitaForm(forms.ModelForm):
             cita.paciente = self.paciente  # asigna paciente automáticamente
 
         if commit:
-            cita.save()
+            # Vuelve a revisar la agenda bajo bloqueo (ver disponibilidad.py);
+            # puede lanzar HorarioOcupado
+            reservar_cita(cita)
         return cita
 
 # -------------------------
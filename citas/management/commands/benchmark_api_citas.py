@@ -0,0 +1,102 @@
+import json
+import random
+import time
+from datetime import date, timedelta, time as hora
+from decimal import Decimal
+
+from django.db import connection, transaction
+from django.core.management.base import BaseCommand, CommandError
+
+from citas.models import Cita, CustomUser, Doctor, Paciente, SignosVitales
+from citas.paginacion import paginar
+from citas.serializers import CAMPOS_CITA_RAPIDA, CitaSerializer, citas_rapidas
+from citas.views import ORDEN_CITAS, CitasListAPIView
+
+
+class Command(BaseCommand):
+    help = (
+        "Compara la serialización de /api/citas/ con CitaSerializer (como antes) "
+        "y con la lectura rápida por páginas, sobre citas de prueba que se "
+        "descartan al terminar. También revisa que ambas den el mismo resultado."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--citas', type=int, default=50000)
+        parser.add_argument('--limite', type=int, default=CitasListAPIView.MAX_LIMITE)
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            self._datos_de_prueba(options['citas'])
+            citas = Cita.objects.all()
+
+            # Las dos rutas deben coincidir campo por campo
+            muestra = list(citas.select_related('paciente', 'signosvitales').order_by(*ORDEN_CITAS)[:500])
+            anterior = json.loads(json.dumps(CitaSerializer(muestra, many=True).data))
+            rapida = citas_rapidas(citas.values(*CAMPOS_CITA_RAPIDA).order_by(*ORDEN_CITAS)[:500])
+            if anterior != json.loads(json.dumps(rapida)):
+                raise CommandError("La lectura rápida no coincide con CitaSerializer.")
+
+            def con_serializador():
+                return CitaSerializer(citas.select_related('paciente').order_by('fecha', 'hora'), many=True).data
+
+            def por_paginas():
+                filas, cursor = [], None
+                while True:
+                    pagina = paginar(citas.values(*CAMPOS_CITA_RAPIDA), ORDEN_CITAS, options['limite'], despues=cursor)
+                    filas.extend(citas_rapidas(pagina.objetos))
+                    cursor = pagina.siguiente
+                    if not cursor:
+                        return filas
+
+            for nombre, leer in [('CitaSerializer', con_serializador), ('lectura rápida', por_paginas)]:
+                consultas = [0]
+
+                def contar(execute, sql, params, many, context):
+                    consultas[0] += 1
+                    return execute(sql, params, many, context)
+
+                with connection.execute_wrapper(contar):
+                    inicio = time.perf_counter()
+                    filas = leer()
+                    segundos = time.perf_counter() - inicio
+                self.stdout.write(
+                    f"{nombre:15s} {len(filas)} citas en {segundos * 1000:8.0f} ms "
+                    f"({len(filas) / segundos:8.0f} citas/s, {consultas[0]} consultas)"
+                )
+
+            transaction.set_rollback(True)
+
+    def _datos_de_prueba(self, total):
+        aleatorio = random.Random(0)
+        doctores = []
+        for i in range(5):
+            user = CustomUser.objects.create_user(
+                username=f'benchmark_api_{i}', password=None, email=f'benchmark_api_{i}@example.com',
+                nombre='Bench', apellido_paterno=f'Doctor {i}', role='doctor',
+            )
+            doctores.append(Doctor.objects.create(user=user, especialidad='General'))
+        pacientes = Paciente.objects.bulk_create([
+            Paciente(
+                nombre=f'Paciente {i}', apellido_paterno='Bench', fecha_nacimiento=date(1990, 1, 1),
+                edad=35, telefono=f'{7700000000 + i}', numero=f'B{i:07d}',
+            )
+            for i in range(max(total // 10, 1))
+        ], batch_size=1000)
+
+        hoy = date.today()
+        citas = Cita.objects.bulk_create([
+            Cita(
+                paciente=aleatorio.choice(pacientes), doctor=aleatorio.choice(doctores),
+                fecha=hoy + timedelta(days=aleatorio.randint(-365, 30)),
+                hora=hora(aleatorio.randint(9, 15), aleatorio.choice([0, 15, 30, 45])),
+            )
+            for _ in range(total)
+        ], batch_size=1000)
+        # La mitad con signos vitales
+        SignosVitales.objects.bulk_create([
+            SignosVitales(
+                cita=cita, peso=Decimal('70.50'), presion_arterial='120/80', temperatura=Decimal('36.5'),
+                frecuencia_cardiaca=72, frecuencia_respiratoria=16, saturacion_oxigeno=98,
+            )
+            for cita in citas[::2]
+        ], batch_size=1000)
@@ -0,0 +1,83 @@
+import io
+import time
+from datetime import date, time as hora
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from citas import exports, pdf_assets, pdfs
+from citas.models import Cita, CustomUser, Doctor, Paciente, Receta
+
+
+class Command(BaseCommand):
+    help = (
+        "Mide el tiempo por documento de los PDFs de receta e historial con los "
+        "recursos de pdf_assets recién cargados (como antes, en cada petición) "
+        "y ya en caché. Los datos de prueba se descartan al terminar."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeticiones', type=int, default=20)
+
+    def handle(self, *args, **options):
+        repeticiones = options['repeticiones']
+
+        with transaction.atomic():
+            cita = self._datos_de_prueba()
+
+            # La vista de la receta sirve el PDF de caché (ver versiones.py)
+            # y el historial se genera en segundo plano (ver exports.py);
+            # se miden directamente los generadores.
+            def receta():
+                destino = io.BytesIO()
+                pdfs.render_receta(destino, Cita.objects.select_related(
+                    'paciente', 'doctor__user', 'receta', 'signosvitales'
+                ).get(id=cita.id))
+                return destino.getvalue()
+
+            def historial():
+                destino = io.BytesIO()
+                exports.GENERADORES['historial'](destino, cita.paciente_id, cita_id=cita.id)
+                return destino.getvalue()
+
+            for nombre, generar in [('receta', receta), ('historial', historial)]:
+                frio = self._medir(generar, repeticiones, limpiar_cache=True)
+                caliente = self._medir(generar, repeticiones, limpiar_cache=False)
+                self.stdout.write(
+                    f"{nombre:10s} sin caché: {frio['ms']:7.1f} ms, {frio['kb']:7.1f} KB | "
+                    f"con caché: {caliente['ms']:7.1f} ms, {caliente['kb']:7.1f} KB"
+                )
+
+            transaction.set_rollback(True)
+
+    def _medir(self, generar, repeticiones, limpiar_cache):
+        generar()  # calentar imports y conexiones
+        total = 0.0
+        tamano = 0
+        for _ in range(repeticiones):
+            if limpiar_cache:
+                pdf_assets.logo_bytes.cache_clear()
+                pdf_assets.estilos_historial.cache_clear()
+                pdf_assets.estilos_receta.cache_clear()
+            inicio = time.perf_counter()
+            pdf = generar()
+            total += time.perf_counter() - inicio
+            tamano = len(pdf)
+        return {'ms': total / repeticiones * 1000, 'kb': tamano / 1024}
+
+    def _datos_de_prueba(self):
+        user = CustomUser.objects.create_user(
+            username='benchmark_pdf', password='x', email='benchmark_pdf@example.com',
+            nombre='Bench', apellido_paterno='Mark', role='doctor',
+        )
+        doctor = Doctor.objects.create(user=user, especialidad='General')
+        paciente = Paciente.objects.create(
+            nombre='Paciente', apellido_paterno='Prueba', fecha_nacimiento=date(1990, 1, 1),
+            telefono='0000000000',
+        )
+        cita = Cita.objects.create(
+            paciente=paciente, doctor=doctor, fecha=date.today(), hora=hora(10, 0),
+            diagnostico='Diagnóstico de prueba',
+        )
+        Receta.objects.create(cita=cita, doctor=doctor, medicamentos='Paracetamol 500 mg', indicaciones='Cada 8 horas')
+        return cita
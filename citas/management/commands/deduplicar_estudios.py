@@ -0,0 +1,94 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Count
+
+from citas.derivatives import SUFIJO, eliminar_derivado
+from citas.models import ContenidoArchivo, Estudio
+from citas.storage import sha256_contenido, sha256_de_nombre
+
+
+class Command(BaseCommand):
+    help = (
+        "Migra los archivos de estudios al almacenamiento por contenido "
+        "(estudios/<ab>/<sha256><ext>), elimina duplicados y recalcula las referencias."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help="Solo muestra lo que se haría.")
+        parser.add_argument(
+            '--eliminar-huerfanos', action='store_true',
+            help="Borra los archivos de estudios/ que ningún estudio utiliza.",
+        )
+
+    def handle(self, *args, **options):
+        dry_run = options['dry_run']
+        storage = Estudio._meta.get_field('archivo').storage
+
+        migrados = {}   # nombre anterior -> nombre por contenido
+        for estudio in Estudio.objects.exclude(archivo='').only('id', 'archivo'):
+            nombre = estudio.archivo.name
+            if sha256_de_nombre(nombre):
+                continue
+            if not storage.exists(nombre):
+                self.stderr.write(f"Estudio {estudio.id}: no existe {nombre}")
+                continue
+
+            if nombre not in migrados:
+                with storage.open(nombre) as f:
+                    if dry_run:
+                        migrados[nombre] = f"(sha256 {sha256_contenido(f)})"
+                    else:
+                        migrados[nombre] = storage.save(nombre, f)
+            self.stdout.write(f"Estudio {estudio.id}: {nombre} -> {migrados[nombre]}")
+
+            if not dry_run:
+                Estudio.objects.filter(id=estudio.id).update(archivo=migrados[nombre])
+
+        # Archivos en estudios/ que ya no usa ningún estudio
+        en_uso = set(Estudio.objects.values_list('archivo', flat=True))
+        directorio = Estudio._meta.get_field('archivo').upload_to.rstrip('/')
+        sueltos = [
+            f"{directorio}/{archivo}" for archivo in storage.listdir(directorio)[1]
+            if f"{directorio}/{archivo}" not in en_uso and not archivo.endswith(SUFIJO)
+        ] if storage.exists(directorio) else []
+
+        eliminados = 0
+        for nombre in sueltos:
+            if nombre in migrados or options['eliminar_huerfanos']:
+                self.stdout.write(f"Eliminando {nombre}")
+                if not dry_run:
+                    storage.delete(nombre)
+                    eliminar_derivado(storage, nombre)
+                eliminados += 1
+            else:
+                self.stdout.write(f"Sin usar (se conserva): {nombre}")
+
+        if not dry_run:
+            self._recalcular_referencias(storage)
+
+        unicos = len(set(migrados.values()))
+        self.stdout.write(self.style.SUCCESS(
+            f"{len(migrados)} archivo(s) migrado(s) a {unicos} archivo(s) único(s); "
+            f"{eliminados} archivo(s) eliminado(s)."
+        ))
+
+    def _recalcular_referencias(self, storage):
+        conteos = (
+            Estudio.objects.exclude(archivo='')
+            .values('archivo')
+            .annotate(total=Count('id'))
+        )
+        vigentes = []
+        for fila in conteos:
+            sha256 = sha256_de_nombre(fila['archivo'])
+            if not sha256 or not storage.exists(fila['archivo']):
+                continue
+            ContenidoArchivo.objects.update_or_create(
+                sha256=sha256,
+                defaults={
+                    'nombre': fila['archivo'],
+                    'tamano': storage.size(fila['archivo']),
+                    'referencias': fila['total'],
+                },
+            )
+            vigentes.append(sha256)
+        ContenidoArchivo.objects.exclude(sha256__in=vigentes).delete()
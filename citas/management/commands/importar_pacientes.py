@@ -0,0 +1,74 @@
+import csv
+import re
+from datetime import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from citas.expedientes import importar_pacientes
+from citas.models import Paciente
+
+COLUMNAS = ['nombre', 'apellido_paterno', 'apellido_materno', 'fecha_nacimiento', 'lugar_origen', 'telefono']
+TELEFONO = re.compile(r'^\d{10}$')
+
+
+class Command(BaseCommand):
+    help = (
+        "Importa pacientes desde un CSV con las columnas "
+        f"{', '.join(COLUMNAS)} (fecha_nacimiento como AAAA-MM-DD). "
+        "Los números de expediente se asignan en un solo paso."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('archivo')
+        parser.add_argument('--lote', type=int, default=500)
+        parser.add_argument('--dry-run', action='store_true', help="Solo valida el archivo.")
+
+    def handle(self, *args, **options):
+        with open(options['archivo'], newline='', encoding='utf-8-sig') as f:
+            lector = csv.DictReader(f)
+            faltantes = {'nombre', 'apellido_paterno', 'fecha_nacimiento', 'telefono'} - set(lector.fieldnames or [])
+            if faltantes:
+                raise CommandError(f"Faltan columnas: {', '.join(sorted(faltantes))}")
+            filas = list(lector)
+
+        telefonos = {(fila.get('telefono') or '').strip() for fila in filas}
+        registrados = set(Paciente.objects.filter(telefono__in=telefonos).values_list('telefono', flat=True))
+
+        pacientes = []
+        for linea, fila in enumerate(filas, start=2):
+            datos = {col: (fila.get(col) or '').strip() for col in COLUMNAS}
+            error = self._validar(datos, registrados)
+            if error:
+                self.stderr.write(f"Línea {linea}: {error}")
+                continue
+            registrados.add(datos['telefono'])
+            pacientes.append(Paciente(
+                nombre=datos['nombre'],
+                apellido_paterno=datos['apellido_paterno'],
+                apellido_materno=datos['apellido_materno'] or None,
+                fecha_nacimiento=datos['fecha_nacimiento'],
+                lugar_origen=datos['lugar_origen'] or None,
+                telefono=datos['telefono'],
+            ))
+
+        if options['dry_run']:
+            self.stdout.write(f"{len(pacientes)} de {len(filas)} pacientes se importarían.")
+            return
+
+        with transaction.atomic():
+            importar_pacientes(pacientes, lote=options['lote'])
+        self.stdout.write(self.style.SUCCESS(f"{len(pacientes)} de {len(filas)} pacientes importados."))
+
+    def _validar(self, datos, registrados):
+        if not datos['nombre'] or not datos['apellido_paterno']:
+            return "falta el nombre o el apellido paterno"
+        try:
+            datos['fecha_nacimiento'] = datetime.strptime(datos['fecha_nacimiento'], '%Y-%m-%d').date()
+        except ValueError:
+            return f"fecha de nacimiento inválida: {datos['fecha_nacimiento']!r}"
+        if not TELEFONO.match(datos['telefono']):
+            return f"el teléfono debe tener exactamente 10 dígitos: {datos['telefono']!r}"
+        if datos['telefono'] in registrados:
+            return f"el teléfono {datos['telefono']} ya está registrado"
+        return None
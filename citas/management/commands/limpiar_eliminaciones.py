@@ -0,0 +1,20 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from citas.models import Eliminacion
+
+
+class Command(BaseCommand):
+    help = (
+        "Borra los registros de eliminaciones con más de SYNC_ELIMINACIONES_DIAS "
+        "días. Una app que no sincronizó en ese tiempo recibe todo de nuevo "
+        "(ver citas/sincronizacion.py)."
+    )
+
+    def handle(self, *args, **options):
+        limite = timezone.now() - timedelta(days=settings.SYNC_ELIMINACIONES_DIAS)
+        borrados, _ = Eliminacion.objects.filter(eliminado_en__lt=limite).delete()
+        self.stdout.write(self.style.SUCCESS(f"{borrados} registro(s) de eliminación borrado(s)."))
@@ -0,0 +1,41 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+from django.utils import timezone
+
+from citas.exports import procesar_pendientes
+from citas.models import ExportacionPDF
+
+
+class Command(BaseCommand):
+    help = (
+        "Borra las exportaciones PDF vencidas (y las que nunca terminaron hace más "
+        "de un día) y genera las pendientes, si no hay un worker "
+        "procesar_exportaciones corriendo."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--sin-pendientes', action='store_true',
+            help="Solo borra; no procesa las exportaciones pendientes.",
+        )
+
+    def handle(self, *args, **options):
+        ahora = timezone.now()
+        vencidas = ExportacionPDF.objects.filter(
+            Q(expira_en__lte=ahora) |
+            Q(expira_en__isnull=True, creado_en__lte=ahora - timedelta(days=1))
+        )
+        # delete() por instancia para que la señal borre cada archivo
+        borradas = 0
+        for exportacion in vencidas.iterator():
+            exportacion.delete()
+            borradas += 1
+        self.stdout.write(f"{borradas} exportación(es) vencida(s) borrada(s).")
+
+        if options['sin_pendientes']:
+            return
+
+        total = procesar_pendientes()
+        self.stdout.write(self.style.SUCCESS(f"{total} exportación(es) pendiente(s) procesada(s)."))
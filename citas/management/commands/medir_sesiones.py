@@ -0,0 +1,72 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test import Client
+from django.test.utils import override_settings
+from django.urls import reverse
+
+from citas.models import CustomUser, Doctor
+
+
+class Command(BaseCommand):
+    help = (
+        "Simula pestañas de doctores consultando actualizar_citas y cuenta las "
+        "escrituras y lecturas de django_session con la configuración anterior "
+        "(base de datos y SESSION_SAVE_EVERY_REQUEST) y con la actual "
+        "(citas/sesiones.py). Los datos de prueba se descartan al terminar."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--pestanas', type=int, default=5)
+        parser.add_argument('--consultas', type=int, default=60, help="Consultas por pestaña.")
+        parser.add_argument('--intervalo', type=int, default=15, help="Segundos entre consultas de una pestaña.")
+
+    def handle(self, *args, **options):
+        anterior = override_settings(
+            SESSION_ENGINE='django.contrib.sessions.backends.db',
+            SESSION_SAVE_EVERY_REQUEST=True,
+            MIDDLEWARE=[m for m in settings.MIDDLEWARE if m != 'citas.sesiones.RenovarSesionMiddleware'],
+        )
+        minutos = options['consultas'] * options['intervalo'] / 60
+        for nombre, configuracion in [('anterior', anterior), ('actual', override_settings())]:
+            with configuracion, transaction.atomic():
+                escrituras, lecturas = self._medir(options['pestanas'], options['consultas'])
+                transaction.set_rollback(True)
+            self.stdout.write(
+                f"{nombre:9s} {escrituras:5d} escrituras ({escrituras / minutos:7.1f}/min), "
+                f"{lecturas:5d} lecturas de django_session"
+            )
+
+    def _medir(self, pestanas, consultas):
+        clientes = []
+        for i in range(pestanas):
+            user = CustomUser.objects.create_user(
+                username=f'medir_sesiones_{i}', password=None, email=f'medir_sesiones_{i}@example.com',
+                nombre='Sesiones', apellido_paterno=f'Doctor {i}', role='doctor',
+            )
+            Doctor.objects.create(user=user, especialidad='General')
+            cliente = Client()
+            cliente.force_login(user)
+            clientes.append(cliente)
+
+        conteo = {'escrituras': 0, 'lecturas': 0}
+
+        def contar(execute, sql, params, many, context):
+            if 'django_session' in sql:
+                conteo['lecturas' if sql.lstrip().upper().startswith('SELECT') else 'escrituras'] += 1
+            return execute(sql, params, many, context)
+
+        url = reverse('actualizar_citas')
+        etags = [None] * pestanas
+        with connection.execute_wrapper(contar):
+            for _ in range(consultas):
+                for i, cliente in enumerate(clientes):
+                    # Como el navegador: manda el ETag de la respuesta anterior
+                    extra = {'HTTP_IF_NONE_MATCH': etags[i]} if etags[i] else {}
+                    respuesta = cliente.get(url, **extra)
+                    etags[i] = respuesta.get('ETag', etags[i])
+
+        # Las sesiones en caché no se descartan con la transacción
+        for cliente in clientes:
+            cliente.session.delete()
+        return conteo['escrituras'], conteo['lecturas']
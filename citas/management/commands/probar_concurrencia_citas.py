@@ -0,0 +1,112 @@
+import threading
+from datetime import date, timedelta, time as hora
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test import Client
+from django.test.utils import setup_databases, teardown_databases
+from django.urls import reverse
+
+from citas.disponibilidad import INTERVALO, ESTADO_CANCELADA
+from citas.models import Cita, CustomUser, Doctor, Paciente
+
+
+class Command(BaseCommand):
+    help = (
+        "Manda en paralelo varias reservas para el mismo doctor y horario al "
+        "endpoint de agendar cita y cuenta cuántas quedaron encimadas. Corre en "
+        "una base de prueba (test_<NAME>, como manage.py test) que se crea y se "
+        "borra con el comando; la base real no se toca. Pensado para "
+        "PostgreSQL: la base de prueba de SQLite (en memoria) no admite "
+        "escrituras desde varios hilos."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--clientes', type=int, default=10)
+        parser.add_argument('--rondas', type=int, default=5)
+
+    def handle(self, *args, **options):
+        clientes = options['clientes']
+        rondas = options['rondas']
+        # Una base aparte y no una transacción que se revierte: las reservas
+        # corren en hilos con su propia conexión, como en el servidor
+        bases = setup_databases(verbosity=0, interactive=False, aliases={'default'})
+        try:
+            admin, doctor, pacientes = self._datos_de_prueba(clientes)
+            # Cada ronda en un día distinto para que la agenda empiece vacía
+            fecha = date.today() + timedelta(days=1)
+            encimadas_total = 0
+            for ronda in range(rondas):
+                respuestas = self._ronda(admin, doctor, pacientes, fecha + timedelta(days=ronda))
+                horas = sorted(
+                    h.hour * 60 + h.minute for h in
+                    Cita.objects.filter(doctor=doctor, fecha=fecha + timedelta(days=ronda))
+                    .exclude(estado=ESTADO_CANCELADA).values_list('hora', flat=True)
+                )
+                encimadas = sum(1 for a, b in zip(horas, horas[1:]) if b - a < INTERVALO)
+                encimadas_total += encimadas
+                self.stdout.write(
+                    f"ronda {ronda + 1}: {clientes} clientes, "
+                    f"{respuestas.count(302)} agendadas, {respuestas.count(200)} rechazadas, "
+                    f"{len(horas)} citas en la agenda, {encimadas} encimadas"
+                )
+
+            if encimadas_total:
+                self.stdout.write(self.style.ERROR(f"{encimadas_total} citas encimadas"))
+            else:
+                self.stdout.write(self.style.SUCCESS("Sin citas encimadas"))
+        finally:
+            connection.close()
+            teardown_databases(bases, verbosity=0)
+
+    def _ronda(self, admin, doctor, pacientes, fecha):
+        # Con timeout: si un hilo falla antes de llegar, los demás no esperan para siempre
+        barrera = threading.Barrier(len(pacientes), timeout=30)
+        respuestas = [None] * len(pacientes)
+
+        def reservar(i, paciente):
+            try:
+                cliente = Client()
+                cliente.force_login(admin)
+                sesion = cliente.session
+                sesion['paciente_id'] = paciente.pk
+                sesion.save()
+                # Todas a la misma hora o a pocos minutos, para que choquen
+                minutos = (i % 3) * 5
+                datos = {
+                    'fecha': fecha.isoformat(),
+                    'hora': hora(10, minutos).strftime('%H:%M'),
+                    'doctor_user': doctor.pk,
+                }
+                barrera.wait()
+                respuestas[i] = cliente.post(reverse('agendar_cita'), datos).status_code
+                # Las sesiones en caché no se borran con la base de prueba
+                cliente.session.delete()
+            finally:
+                connection.close()
+
+        hilos = [threading.Thread(target=reservar, args=(i, p)) for i, p in enumerate(pacientes)]
+        for hilo in hilos:
+            hilo.start()
+        for hilo in hilos:
+            hilo.join()
+        return respuestas
+
+    def _datos_de_prueba(self, clientes):
+        admin = CustomUser.objects.create_user(
+            username='concurrencia_admin', password='x', email='concurrencia_admin@example.com',
+            nombre='Concurrencia', apellido_paterno='Admin', role='administradora',
+        )
+        user = CustomUser.objects.create_user(
+            username='concurrencia_doctor', password='x', email='concurrencia_doctor@example.com',
+            nombre='Concurrencia', apellido_paterno='Doctor', role='doctor',
+        )
+        doctor = Doctor.objects.create(user=user, especialidad='General')
+        pacientes = [
+            Paciente.objects.create(
+                nombre=f'Paciente {i}', apellido_paterno='Concurrencia',
+                fecha_nacimiento=date(1990, 1, 1), telefono=f'{9000000000 + i}',
+            )
+            for i in range(clientes)
+        ]
+        return admin, doctor, pacientes
@@ -0,0 +1,32 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from citas.extraction import intentar_extraccion
+from citas.models import Estudio
+
+
+class Command(BaseCommand):
+    help = "Procesa los estudios cuya extracción de texto quedó pendiente (p. ej. tras reiniciar el servidor)."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--errores', action='store_true',
+            help="Reintenta también los estudios que quedaron en estado 'Error'.",
+        )
+
+    def handle(self, *args, **options):
+        estados = ['Pendiente', 'Procesando']
+        if options['errores']:
+            Estudio.objects.filter(estado_extraccion='Error').update(
+                estado_extraccion='Pendiente', intentos_extraccion=0
+            )
+
+        total = 0
+        for estudio in Estudio.objects.filter(estado_extraccion__in=estados):
+            # Aquí sí se espera entre intentos: el comando corre en su propio proceso
+            while not intentar_extraccion(estudio) and estudio.estado_extraccion == 'Pendiente':
+                time.sleep(2 ** estudio.intentos_extraccion)
+            total += 1
+
+        self.stdout.write(self.style.SUCCESS(f"{total} estudio(s) procesado(s)."))
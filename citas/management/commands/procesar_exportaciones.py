@@ -0,0 +1,28 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from citas.exports import procesar_pendientes
+
+
+class Command(BaseCommand):
+    help = (
+        "Worker de exportaciones PDF: genera las pendientes y vuelve a revisar "
+        "cada --intervalo segundos. Corre en su propio proceso (ver Procfile); "
+        "se pueden levantar varios."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--intervalo', type=float, default=1.0, help="Segundos entre revisiones.")
+        parser.add_argument('--una-vez', action='store_true', help="Genera las pendientes y termina.")
+
+    def handle(self, *args, **options):
+        while True:
+            close_old_connections()
+            total = procesar_pendientes()
+            if total:
+                self.stdout.write(f"{total} exportación(es) generada(s).")
+            if options['una_vez']:
+                return
+            time.sleep(options['intervalo'])
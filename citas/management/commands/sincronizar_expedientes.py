@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from citas.expedientes import sincronizar_contador
+
+
+class Command(BaseCommand):
+    help = (
+        "Adelanta la secuencia de números de expediente hasta el mayor número "
+        "usado. Correr después de loaddata o de restaurar un respaldo."
+    )
+
+    def handle(self, *args, **options):
+        ultimo = sincronizar_contador()
+        self.stdout.write(self.style.SUCCESS(f"El siguiente expediente será mayor que {ultimo}."))
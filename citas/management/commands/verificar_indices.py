@@ -0,0 +1,113 @@
+import random
+from datetime import date, timedelta, time as hora
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+
+from citas.disponibilidad import ESTADO_CANCELADA
+from citas.models import Cita, CustomUser, Doctor, Paciente
+
+
+class Command(BaseCommand):
+    help = (
+        "Carga datos de prueba, revisa con EXPLAIN que las consultas frecuentes "
+        "de Cita y Paciente usen sus índices y falla si alguna no lo hace. Los "
+        "datos se descartan al terminar."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--citas', type=int, default=20000)
+        parser.add_argument('--verbose-plan', action='store_true', help="Muestra el plan completo.")
+
+    def handle(self, *args, **options):
+        fallas = []
+        with transaction.atomic():
+            doctor, paciente, fecha = self._datos_de_prueba(options['citas'])
+            self._analizar()
+
+            for nombre, consulta, indice in self._consultas(doctor, paciente, fecha):
+                plan = consulta.explain()
+                ok = indice in plan
+                if not ok:
+                    fallas.append(nombre)
+                self.stdout.write(f"{'OK   ' if ok else 'FALLA'} {nombre} ({indice})")
+                if options['verbose_plan'] or not ok:
+                    self.stdout.write('      ' + plan.replace('\n', '\n      '))
+
+            transaction.set_rollback(True)
+
+        if fallas:
+            raise CommandError(f"{len(fallas)} consultas no usan su índice: {', '.join(fallas)}")
+        self.stdout.write(self.style.SUCCESS("Todas las consultas usan su índice."))
+
+    def _consultas(self, doctor, paciente, fecha):
+        """(nombre, queryset, índice esperado) de cada consulta frecuente."""
+        return [
+            ("agenda del día (disponibilidad.cargar_agenda)",
+             Cita.objects.filter(doctor=doctor, fecha=fecha)
+             .exclude(estado=ESTADO_CANCELADA).values_list('hora', flat=True),
+             'cita_agenda_activa_idx'),
+            ("agendas de un rango (disponibilidad.cargar_agendas)",
+             Cita.objects.filter(doctor__in=[doctor.pk], fecha__range=(fecha, fecha + timedelta(days=14)))
+             .exclude(estado=ESTADO_CANCELADA).values_list('doctor_id', 'fecha', 'hora').order_by(),
+             'cita_agenda_activa_idx'),
+            ("citas del día del doctor (actualizar_citas)",
+             Cita.objects.filter(doctor=doctor, fecha=fecha).order_by('hora'),
+             'cita_doctor_fecha_hora_idx'),
+            ("pendientes de hoy (inicio)",
+             Cita.objects.filter(fecha=fecha, estado='Pendiente'),
+             'cita_fecha_estado_idx'),
+            ("próxima cita (inicio)",
+             Cita.objects.filter(fecha__gt=fecha).order_by('fecha', 'hora')[:1],
+             'cita_fecha_hora_id_idx'),
+            ("ventana de recepción (dashboard_administradora)",
+             Cita.objects.filter(fecha__range=(fecha, fecha + timedelta(days=6)))
+             .order_by('fecha', 'hora', 'id')[:51],
+             'cita_fecha_hora_id_idx'),
+            ("última cita del paciente (buscar_pacientes_doctor)",
+             Cita.objects.filter(paciente=paciente).order_by('-fecha', '-hora')[:1],
+             'cita_paciente_reciente_idx'),
+            ("pacientes por nombre (buscar_pacientes_doctor)",
+             Paciente.objects.order_by('nombre', 'id')[:26],
+             'paciente_nombre_id_idx'),
+        ]
+
+    def _analizar(self):
+        """Estadísticas al día para que el planificador conozca los datos nuevos."""
+        with connection.cursor() as cursor:
+            if connection.vendor == 'postgresql':
+                cursor.execute(f"ANALYZE {Cita._meta.db_table}, {Paciente._meta.db_table}")
+            elif connection.vendor == 'sqlite':
+                cursor.execute("ANALYZE")
+
+    def _datos_de_prueba(self, total_citas):
+        aleatorio = random.Random(0)
+        doctores = []
+        for i in range(10):
+            user = CustomUser.objects.create_user(
+                username=f'indices_{i}', password=None, email=f'indices_{i}@example.com',
+                nombre='Índices', apellido_paterno=f'Doctor {i}', role='doctor',
+            )
+            doctores.append(Doctor.objects.create(user=user, especialidad='General'))
+
+        # Números de expediente propios: no se gasta la secuencia (ver expedientes.py)
+        pacientes = Paciente.objects.bulk_create([
+            Paciente(
+                nombre=f'Paciente {i}', apellido_paterno='Índices', fecha_nacimiento=date(1990, 1, 1),
+                telefono=f'{8800000000 + i}', numero=f'I{i:07d}',
+            )
+            for i in range(max(total_citas // 10, 1))
+        ], batch_size=1000)
+
+        hoy = date.today()
+        estados = ['Pendiente', 'Confirmada', 'Cancelada', 'Atendida']
+        Cita.objects.bulk_create([
+            Cita(
+                paciente=aleatorio.choice(pacientes), doctor=aleatorio.choice(doctores),
+                fecha=hoy + timedelta(days=aleatorio.randint(-365, 60)),
+                hora=hora(aleatorio.randint(9, 15), aleatorio.choice([0, 15, 30, 45])),
+                estado=aleatorio.choice(estados),
+            )
+            for _ in range(total_citas)
+        ], batch_size=1000)
+        return doctores[0], pacientes[0], hoy
@@ -0,0 +1,30 @@
+# Generated by Django 5.2.5 on 2026-10-18 09:12
+
+from django.db import migrations, models
+
+
+def marcar_existentes(apps, schema_editor):
+    # Los estudios anteriores ya se procesaron dentro de la petición.
+    Estudio = apps.get_model('citas', 'Estudio')
+    Estudio.objects.update(estado_extraccion='Completado')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('citas', '0017_alter_cita_options_alter_estudio_options_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='estudio',
+            name='estado_extraccion',
+            field=models.CharField(choices=[('Pendiente', 'Pendiente'), ('Procesando', 'Procesando'), ('Completado', 'Completado'), ('Error', 'Error')], default='Pendiente', max_length=20),
+        ),
+        migrations.AddField(
+            model_name='estudio',
+            name='intentos_extraccion',
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+        migrations.RunPython(marcar_existentes, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 5.2.5 on 2026-10-18 10:03
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('citas', '0018_estudio_estado_extraccion'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PaginaExtraida',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('archivo_sha256', models.CharField(max_length=64)),
+                ('pagina', models.PositiveIntegerField()),
+                ('texto', models.TextField(blank=True)),
+                ('creado_en', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('archivo_sha256', 'pagina'), name='pagina_extraida_unica')],
+            },
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.5 on 2026-10-18 11:20
+
+import citas.storage
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('citas', '0019_paginaextraida'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ContenidoArchivo',
+            fields=[
+                ('sha256', models.CharField(max_length=64, primary_key=True, serialize=False)),
+                ('nombre', models.CharField(max_length=255)),
+                ('tamano', models.BigIntegerField(default=0)),
+                ('referencias', models.PositiveIntegerField(default=0)),
+            ],
+        ),
+        migrations.AlterField(
+            model_name='estudio',
+            name='archivo',
+            field=models.FileField(storage=citas.storage.AlmacenamientoPorContenido(), upload_to='estudios/'),
+        ),
+    ]
@@ -0,0 +1,47 @@
+# Generated by Django 5.2.5 on 2026-10-18 13:10
+
+from django.db import migrations, models
+
+SECUENCIA = 'citas_paciente_numero_seq'
+CONSECUTIVO = 'paciente_numero'
+
+
+def ultimo_numero(Paciente):
+    mayor = 0
+    for numero, paciente_id in Paciente.objects.values_list('numero', 'id').iterator():
+        mayor = max(mayor, paciente_id)
+        if numero[1:].isdigit():
+            mayor = max(mayor, int(numero[1:]))
+    return mayor
+
+
+def crear_contador(apps, schema_editor):
+    ultimo = ultimo_numero(apps.get_model('citas', 'Paciente'))
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(f"CREATE SEQUENCE IF NOT EXISTS {SECUENCIA} START WITH {ultimo + 1}")
+    else:
+        Consecutivo = apps.get_model('citas', 'Consecutivo')
+        Consecutivo.objects.update_or_create(nombre=CONSECUTIVO, defaults={'ultimo': ultimo})
+
+
+def borrar_contador(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(f"DROP SEQUENCE IF EXISTS {SECUENCIA}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('citas', '0021_exportacionpdf'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Consecutivo',
+            fields=[
+                ('nombre', models.CharField(max_length=50, primary_key=True, serialize=False)),
+                ('ultimo', models.BigIntegerField(default=0)),
+            ],
+        ),
+        migrations.RunPython(crear_contador, borrar_contador),
+    ]
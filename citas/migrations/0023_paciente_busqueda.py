@@ -0,0 +1,52 @@
+# Generated by Django 5.2.5 on 2026-10-18 13:40
+
+import unicodedata
+
+from django.db import migrations, models
+
+CAMPOS = ('nombre', 'apellido_paterno', 'apellido_materno', 'numero', 'telefono')
+
+
+def normalizar(texto):
+    texto = unicodedata.normalize('NFKD', texto or '')
+    return ''.join(c for c in texto if not unicodedata.combining(c)).lower()
+
+
+def llenar_busqueda(apps, schema_editor):
+    Paciente = apps.get_model('citas', 'Paciente')
+    pacientes = list(Paciente.objects.only('id', *CAMPOS))
+    for paciente in pacientes:
+        palabras = normalizar(' '.join(getattr(paciente, campo) or '' for campo in CAMPOS)).split()
+        paciente.busqueda = f" {' '.join(palabras)} "
+    Paciente.objects.bulk_update(pacientes, ['busqueda'], batch_size=500)
+
+
+def crear_indice(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+        schema_editor.execute(
+            "CREATE INDEX IF NOT EXISTS citas_paciente_busqueda_trgm "
+            "ON citas_paciente USING gin (busqueda gin_trgm_ops)"
+        )
+
+
+def borrar_indice(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute("DROP INDEX IF EXISTS citas_paciente_busqueda_trgm")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('citas', '0022_consecutivo'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='paciente',
+            name='busqueda',
+            field=models.TextField(blank=True, default='', editable=False),
+        ),
+        migrations.RunPython(llenar_busqueda, migrations.RunPython.noop),
+        migrations.RunPython(crear_indice, borrar_indice),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.5 on 2026-10-18 14:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('citas', '0023_paciente_busqueda'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='cita',
+            index=models.Index(fields=['doctor', 'fecha', 'hora'], name='cita_doctor_fecha_hora_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='cita',
+            index=models.Index(fields=['fecha', 'estado'], name='cita_fecha_estado_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='cita',
+            index=models.Index(fields=['fecha', 'hora', 'id'], name='cita_fecha_hora_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='cita',
+            index=models.Index(fields=['paciente', '-fecha', '-hora'], name='cita_paciente_reciente_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='paciente',
+            index=models.Index(fields=['nombre', 'id'], name='paciente_nombre_id_idx'),
+        ),
+    ]
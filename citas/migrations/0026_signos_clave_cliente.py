@@ -0,0 +1,18 @@
+# Generated by Django 5.2.5 on 2026-10-18 11:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('citas', '0025_sincronizacion'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='signosvitales',
+            name='clave_cliente',
+            field=models.UUIDField(blank=True, editable=False, null=True),
+        ),
+    ]
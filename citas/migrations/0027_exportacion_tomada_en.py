@@ -0,0 +1,18 @@
+# Generated by Django 5.2.5 on 2026-10-18 14:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('citas', '0026_signos_clave_cliente'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='exportacionpdf',
+            name='tomada_en',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
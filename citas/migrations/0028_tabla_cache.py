@@ -0,0 +1,15 @@
+# Generated by Django 5.2.5 on 2026-10-18 14:40
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+    # Creaba la tabla de la caché; ya no hace nada. En producción la caché es
+    # Redis y en desarrollo la tabla se crea con `manage.py createcachetable`
+    # (ver CACHES en settings.py). Se conserva porque 0029 depende de ella.
+
+    dependencies = [
+        ('citas', '0027_exportacion_tomada_en'),
+    ]
+
+    operations = []
@@ -0,0 +1,41 @@
+# Generated by Django 5.2.5 on 2026-10-18 15:30
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def copiar_claves(apps, schema_editor):
+    # La última clave de cada cita pasa a la tabla de capturas aplicadas
+    SignosVitales = apps.get_model('citas', 'SignosVitales')
+    CapturaSignos = apps.get_model('citas', 'CapturaSignos')
+    CapturaSignos.objects.bulk_create([
+        CapturaSignos(clave=clave, cita_id=cita_id)
+        for cita_id, clave in SignosVitales.objects.filter(clave_cliente__isnull=False)
+        .values_list('cita_id', 'clave_cliente').iterator()
+    ], batch_size=1000, ignore_conflicts=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('citas', '0028_tabla_cache'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CapturaSignos',
+            fields=[
+                ('clave', models.UUIDField(primary_key=True, serialize=False)),
+                ('aplicada_en', models.DateTimeField(auto_now_add=True)),
+                ('cita', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='capturas_signos', to='citas.cita')),
+            ],
+            options={
+                'verbose_name_plural': 'Capturas de signos vitales',
+            },
+        ),
+        migrations.RunPython(copiar_claves, migrations.RunPython.noop),
+        migrations.RemoveField(
+            model_name='signosvitales',
+            name='clave_cliente',
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.5 on 2026-10-18 12:10
+
+import django.core.validators
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('citas', '0029_capturas_signos'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='doctor',
+            name='horario',
+        ),
+        migrations.AlterField(
+            model_name='paciente',
+            name='telefono',
+            field=models.CharField(max_length=10, unique=True, validators=[django.core.validators.RegexValidator(message='El número de teléfono debe tener exactamente 10 dígitos.', regex='^\\d{10}$')]),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.5 on 2026-10-18 16:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('citas', '0030_remove_doctor_horario'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='exportacionpdf',
+            name='huella',
+            field=models.CharField(blank=True, max_length=40),
+        ),
+        migrations.AddField(
+            model_name='exportacionpdf',
+            name='intentos',
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+    ]
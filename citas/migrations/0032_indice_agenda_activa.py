@@ -0,0 +1,24 @@
+# Generated by Django 5.2.5 on 2026-10-18 16:40
+
+from django.db import migrations, models
+
+
+def normalizar_canceladas(apps, schema_editor):
+    # disponibilidad.py ya compara el estado exacto (para usar el índice parcial)
+    Cita = apps.get_model('citas', 'Cita')
+    Cita.objects.filter(estado__iexact='Cancelada').exclude(estado='Cancelada').update(estado='Cancelada')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('citas', '0031_intentos_exportacion'),
+    ]
+
+    operations = [
+        migrations.RunPython(normalizar_canceladas, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='cita',
+            index=models.Index(condition=models.Q(('estado', 'Cancelada'), _negated=True), fields=['doctor', 'fecha', 'hora'], name='cita_agenda_activa_idx'),
+        ),
+    ]
@@ -54,6 +54,7 @@ class Doctor(models.Model):
 from django.db import models
 from django.core.validators import RegexValidator
 from datetime import date
+from .storage import AlmacenamientoPorContenido
 
 class Paciente(models.Model):
     nombre = models.CharField(max_length=100)
@@ -79,19 +80,45 @@ class Paciente(models.Model):
     # número de expediente interno: P0001, P0002...
     numero = models.CharField(max_length=10, unique=True, blank=True)
 
-    def save(self, *args, **kwargs):
-        # Calcular edad automáticamente
+    # nombre, apellidos, número y teléfono sin acentos (ver busqueda.py)
+    busqueda = models.TextField(blank=True, default='', editable=False)
+
+    # Última modificación, para la sincronización de la app (ver sincronizacion.py)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
+
+    class Meta:
+        indexes = [
+            # Lista de pacientes sin búsqueda, paginada por nombre
+            models.Index(fields=['nombre', 'id'], name='paciente_nombre_id_idx'),
+        ]
+
+    def calcular_edad(self):
         if self.fecha_nacimiento:
             today = date.today()
             self.edad = today.year - self.fecha_nacimiento.year - (
                 (today.month, today.day) < (self.fecha_nacimiento.month, self.fecha_nacimiento.day)
             )
 
-        # Generar número único P0001, P0002...
+    def save(self, *args, **kwargs):
+        # Calcular edad automáticamente
+        self.calcular_edad()
+
+        # Un guardado parcial también actualiza lo que se calcula aquí
+        if kwargs.get('update_fields') is not None:
+            kwargs['update_fields'] = {*kwargs['update_fields'], 'edad', 'busqueda', 'updated_at'}
+            if not self.numero:
+                kwargs['update_fields'].add('numero')
+
+        # Generar número único P0001, P0002... (ver expedientes.py)
         if not self.numero:
-            last = Paciente.objects.all().order_by('id').last()
-            next_id = (last.id + 1) if last else 1
-            self.numero = f"P{next_id:04d}"
+            from .expedientes import guardar_con_numero
+            guardar_con_numero(self, lambda: self._guardar(*args, **kwargs))
+        else:
+            self._guardar(*args, **kwargs)
+
+    def _guardar(self, *args, **kwargs):
+        from .busqueda import texto_busqueda
+        self.busqueda = texto_busqueda(self)
 
         super().save(*args, **kwargs)
 
@@ -101,17 +128,98 @@ class Paciente(models.Model):
 
 
 
+class Eliminacion(models.Model):
+    """
+    Registro de un paciente, cita o signos vitales borrado, para que la
+    sincronización de la app lo quite también (ver sincronizacion.py).
+    """
+    modelo = models.CharField(max_length=30)
+    objeto_id = models.BigIntegerField()
+    eliminado_en = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    class Meta:
+        verbose_name_plural = "Eliminaciones"
+
+    def __str__(self):
+        return f"{self.modelo} {self.objeto_id} ({self.eliminado_en})"
+
+
+class Consecutivo(models.Model):
+    """
+    Contador con nombre para motores sin secuencias (ver expedientes.py).
+    `ultimo` es el último valor entregado.
+    """
+    nombre = models.CharField(max_length=50, primary_key=True)
+    ultimo = models.BigIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.nombre}: {self.ultimo}"
+
+
+class ContenidoArchivo(models.Model):
+    """
+    Archivo físico guardado por contenido (ver citas/storage.py).
+    `referencias` cuenta los estudios que apuntan a él.
+    """
+    sha256 = models.CharField(max_length=64, primary_key=True)
+    nombre = models.CharField(max_length=255)
+    tamano = models.BigIntegerField(default=0)
+    referencias = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.nombre} ({self.referencias} ref.)"
+
+
 class Estudio(models.Model):
+    ESTADO_EXTRACCION_CHOICES = (
+        ('Pendiente', 'Pendiente'),
+        ('Procesando', 'Procesando'),
+        ('Completado', 'Completado'),
+        ('Error', 'Error'),
+    )
+
     paciente = models.ForeignKey(Paciente, on_delete=models.CASCADE, related_name='estudios')
-    archivo = models.FileField(upload_to='estudios/')
+    archivo = models.FileField(upload_to='estudios/', storage=AlmacenamientoPorContenido())
     descripcion = models.CharField(max_length=255, blank=True, null=True)
     texto_extraido = models.TextField(blank=True, null=True)
     fecha_subida = models.DateTimeField(auto_now_add=True)
 
+    # Extracción de texto en segundo plano (ver citas/extraction.py)
+    estado_extraccion = models.CharField(max_length=20, choices=ESTADO_EXTRACCION_CHOICES, default='Pendiente')
+    intentos_extraccion = models.PositiveSmallIntegerField(default=0)
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Archivo con el que se cargó, para mover su referencia si se
+        # reemplaza (ver signals.py)
+        instance._archivo_cargado = instance.__dict__.get('archivo')
+        return instance
+
     def __str__(self):
         return f"{self.descripcion or 'Estudio'} - {self.paciente.nombre}"
 
 
+class PaginaExtraida(models.Model):
+    """
+    Texto extraído de una página de un archivo, identificado por el SHA-256
+    del archivo. Evita repetir el OCR cuando el mismo archivo se vuelve a
+    subir o a procesar.
+    """
+    archivo_sha256 = models.CharField(max_length=64)
+    pagina = models.PositiveIntegerField()
+    texto = models.TextField(blank=True)
+    creado_en = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['archivo_sha256', 'pagina'], name='pagina_extraida_unica'),
+        ]
+
+    def __str__(self):
+        return f"{self.archivo_sha256[:12]} - página {self.pagina + 1}"
+
+
 
 # -------------------------
 # Sección de Modelos de Citas 
@@ -132,6 +240,7 @@ class Cita(models.Model):
     recordatorio_activado = models.BooleanField(default=False)
     estado = models.CharField(max_length=50, choices=ESTADO_CHOICES, default='Pendiente')
     creada_en = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
 
     # Diagnósticos
     diagnostico = models.TextField(null=True, blank=True)
@@ -139,6 +248,33 @@ class Cita(models.Model):
     nuevo_diagnostico = models.TextField(null=True, blank=True)
     medicamentos = models.TextField(null=True, blank=True)
     instrucciones = models.TextField(null=True, blank=True)
+
+    class Meta:
+        # Consultas frecuentes (ver el comando verificar_indices)
+        indexes = [
+            # Agenda de un doctor en un día o rango, en orden de hora
+            models.Index(fields=['doctor', 'fecha', 'hora'], name='cita_doctor_fecha_hora_idx'),
+            # Horas ocupadas (disponibilidad.py): solo las citas que no están canceladas
+            models.Index(
+                fields=['doctor', 'fecha', 'hora'], name='cita_agenda_activa_idx',
+                condition=~models.Q(estado='Cancelada'),
+            ),
+            # Citas del día por estado (inicio)
+            models.Index(fields=['fecha', 'estado'], name='cita_fecha_estado_idx'),
+            # Dashboards de recepción y reportes: ventana de fechas paginada
+            models.Index(fields=['fecha', 'hora', 'id'], name='cita_fecha_hora_id_idx'),
+            # Última cita de un paciente e historial
+            models.Index(fields=['paciente', '-fecha', '-hora'], name='cita_paciente_reciente_idx'),
+        ]
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Doctor y día con los que se cargó, para avisar también a esa agenda
+        # si la cita cambia de doctor o de fecha (ver signals.py)
+        instance._agenda_cargada = (instance.__dict__.get('doctor_id'), instance.__dict__.get('fecha'))
+        return instance
+
     def __str__(self):
         return f"Cita de {self.paciente} con {self.doctor} el {self.fecha} a las {self.hora}"
 
@@ -158,6 +294,7 @@ class SignosVitales(models.Model):
     frecuencia_cardiaca = models.IntegerField(null=True, blank=True)
     frecuencia_respiratoria = models.IntegerField(null=True, blank=True)
     saturacion_oxigeno = models.IntegerField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
     
     class Meta:
         verbose_name_plural = "Signos Vitales"
@@ -165,6 +302,23 @@ class SignosVitales(models.Model):
     def __str__(self):
         return f"Signos vitales de {self.cita.paciente} - {self.cita.fecha}"
 
+
+class CapturaSignos(models.Model):
+    """
+    Clave de cada captura de signos vitales que ya se aplicó desde la app;
+    un reintento con una clave conocida no vuelve a escribir (ver
+    services.guardar_signos_lote).
+    """
+    clave = models.UUIDField(primary_key=True)
+    cita = models.ForeignKey(Cita, on_delete=models.CASCADE, related_name='capturas_signos')
+    aplicada_en = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        verbose_name_plural = "Capturas de signos vitales"
+
+    def __str__(self):
+        return f"{self.clave} (cita {self.cita_id})"
+
 from django.contrib.auth.models import User
 from django.conf import settings
 class DiagnosticoHistorico(models.Model):
@@ -209,4 +363,41 @@ class Receta(models.Model):
         return self.cita.paciente
 
     
-    
\ No newline at end of file
+    
+
+class ExportacionPDF(models.Model):
+    """
+    PDF generado en segundo plano (ver citas/exports.py). El archivo se puede
+    descargar hasta `expira_en`; después lo borra `limpiar_exportaciones`.
+    """
+    TIPO_CHOICES = (
+        ('historial', 'Historial clínico'),
+        ('reporte', 'Reporte de citas'),
+    )
+    ESTADO_CHOICES = (
+        ('Pendiente', 'Pendiente'),
+        ('Procesando', 'Procesando'),
+        ('Completado', 'Completado'),
+        ('Error', 'Error'),
+    )
+
+    usuario = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='exportaciones')
+    tipo = models.CharField(max_length=20, choices=TIPO_CHOICES)
+    parametros = models.JSONField(default=dict)
+    nombre_descarga = models.CharField(max_length=255)
+    estado = models.CharField(max_length=20, choices=ESTADO_CHOICES, default='Pendiente')
+    archivo = models.FileField(upload_to='exportaciones/', blank=True)
+    error = models.TextField(blank=True)
+    creado_en = models.DateTimeField(auto_now_add=True)
+    expira_en = models.DateTimeField(blank=True, null=True)
+    # Cuándo la tomó un worker y cuántas veces se ha tomado (ver exports.tomar_exportacion)
+    tomada_en = models.DateTimeField(blank=True, null=True)
+    intentos = models.PositiveSmallIntegerField(default=0)
+    # Versión de los datos al encolarla (ver exports.encolar_exportacion)
+    huella = models.CharField(max_length=40, blank=True)
+
+    class Meta:
+        verbose_name_plural = "Exportaciones PDF"
+
+    def __str__(self):
+        return f"{self.get_tipo_display()} - {self.nombre_descarga} ({self.estado})"
@@ -0,0 +1,136 @@
+"""
+Extracción de texto de estudios (PDF e imágenes), página por página.
+
+Este módulo no importa modelos de Django a propósito: sus funciones se
+ejecutan dentro del pool de procesos de OCR, que arranca procesos nuevos
+sin la configuración de Django cargada.
+"""
+import hashlib
+import io
+import os
+from functools import lru_cache
+
+import pytesseract
+from PyPDF2 import PdfReader
+from PIL import Image as PILImage, ImageOps
+
+
+# ------------------------------------------
+# ROUTE FOR TESSERACT (AUTOMATIC)
+# ------------------------------------------
+pytesseract.pytesseract.tesseract_cmd = r"C:\Program Files\Tesseract-OCR\tesseract.exe"
+
+EXTENSIONES_IMAGEN = [".jpg", ".jpeg", ".png"]
+
+# Lado mayor (px) al que se reduce una imagen antes del OCR; ~300 dpi en carta.
+MAX_LADO_OCR = 3300
+
+
+def es_pdf(ruta):
+    return os.path.splitext(ruta)[1].lower() == ".pdf"
+
+
+def es_imagen(ruta):
+    return os.path.splitext(ruta)[1].lower() in EXTENSIONES_IMAGEN
+
+
+def sha256_archivo(ruta):
+    h = hashlib.sha256()
+    with open(ruta, 'rb') as f:
+        for bloque in iter(lambda: f.read(1024 * 1024), b''):
+            h.update(bloque)
+    return h.hexdigest()
+
+
+@lru_cache(maxsize=2)
+def _leer_pdf(ruta, modificado):
+    with open(ruta, 'rb') as f:
+        return PdfReader(io.BytesIO(f.read()))
+
+
+def abrir_pdf(ruta):
+    """
+    PdfReader de `ruta`, leído una sola vez por proceso: las páginas de un
+    mismo estudio que le tocan a este proceso reutilizan el lector en lugar
+    de volver a leer el PDF completo para cada una.
+    """
+    return _leer_pdf(ruta, os.path.getmtime(ruta))
+
+
+def contar_paginas(ruta):
+    """Número de páginas a procesar: las del PDF, o una para una imagen."""
+    if es_pdf(ruta):
+        with open(ruta, 'rb') as f:
+            return len(PdfReader(f).pages)
+    return 1
+
+
+# ------------------------------------------
+# PREPROCESAMIENTO PARA TESSERACT
+# ------------------------------------------
+def _umbral_otsu(histograma):
+    total = sum(histograma)
+    suma_total = sum(i * h for i, h in enumerate(histograma))
+    suma_fondo = peso_fondo = 0
+    mejor_umbral, mejor_varianza = 127, 0.0
+
+    for i, h in enumerate(histograma):
+        peso_fondo += h
+        if peso_fondo == 0:
+            continue
+        peso_frente = total - peso_fondo
+        if peso_frente == 0:
+            break
+        suma_fondo += i * h
+        media_fondo = suma_fondo / peso_fondo
+        media_frente = (suma_total - suma_fondo) / peso_frente
+        varianza = peso_fondo * peso_frente * (media_fondo - media_frente) ** 2
+        if varianza > mejor_varianza:
+            mejor_umbral, mejor_varianza = i, varianza
+    return mejor_umbral
+
+
+def preparar_imagen(imagen):
+    """Escala de grises, reducción a MAX_LADO_OCR y binarización (Otsu)."""
+    imagen = ImageOps.grayscale(imagen)
+    if max(imagen.size) > MAX_LADO_OCR:
+        imagen.thumbnail((MAX_LADO_OCR, MAX_LADO_OCR))
+    umbral = _umbral_otsu(imagen.histogram())
+    return imagen.point(lambda p: 255 if p > umbral else 0, mode='1')
+
+
+# ------------------------------------------
+# READ IMAGE + OCR
+# ------------------------------------------
+def leer_imagen(imagen):
+    if not isinstance(imagen, PILImage.Image):
+        imagen = PILImage.open(imagen)
+    texto = pytesseract.image_to_string(preparar_imagen(imagen), lang='spa')
+    return texto.strip()
+
+
+# ------------------------------------------
+# READ PDF PAGE (texto embebido u OCR)
+# ------------------------------------------
+def leer_pagina_pdf(page):
+    texto = (page.extract_text() or "").strip()
+    if texto:
+        return texto
+
+    # Página escaneada: sin capa de texto, se hace OCR a sus imágenes
+    textos = []
+    for img in page.images:
+        textos.append(leer_imagen(PILImage.open(io.BytesIO(img.data))))
+    return "\n".join(t for t in textos if t)
+
+
+def extraer_pagina(ruta, numero):
+    """Texto de la página `numero` (base 0) de un estudio."""
+    try:
+        if es_pdf(ruta):
+            return leer_pagina_pdf(abrir_pdf(ruta).pages[numero])
+        return leer_imagen(ruta)
+    except Exception as e:
+        # Algunas excepciones de pytesseract no se pueden serializar de vuelta
+        # al proceso principal y romperían el pool completo.
+        raise RuntimeError(f"{type(e).__name__}: {e}") from None
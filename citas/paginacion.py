@@ -0,0 +1,120 @@
+"""
+Paginación por llave (keyset).
+
+En lugar de OFFSET, cada página se pide a partir de los valores de orden
+del último (o primer) registro de la anterior, así que el costo no crece con
+el número de página: con un índice sobre las columnas de orden la consulta
+lee solo `tamano + 1` filas. El cursor es esa lista de valores en JSON y
+base64, opaco para el cliente.
+
+`orden` son nombres de campos o anotaciones (con '-' para descendente) que
+no pueden ser nulos, y el último debe ser único (normalmente 'id').
+"""
+import base64
+import binascii
+import json
+from dataclasses import dataclass
+from functools import reduce
+from operator import or_
+
+from django.core.exceptions import ValidationError
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Q
+
+
+@dataclass
+class Pagina:
+    objetos: list
+    siguiente: str | None = None
+    anterior: str | None = None
+
+
+def crear_cursor(valores):
+    texto = json.dumps(list(valores), cls=DjangoJSONEncoder, separators=(',', ':'))
+    return base64.urlsafe_b64encode(texto.encode()).decode().rstrip('=')
+
+
+def leer_cursor(cursor, orden, queryset=None):
+    """
+    Valores de un cursor, o None si no es válido para `orden`. Con
+    `queryset`, cada valor se convierte al tipo de su campo (o anotación);
+    si alguno no se puede convertir, el cursor no es válido.
+    """
+    try:
+        valores = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+    except (ValueError, binascii.Error):
+        return None
+    if not isinstance(valores, list) or len(valores) != len(orden):
+        return None
+    if queryset is None:
+        return valores
+
+    convertidos = []
+    for campo, valor in zip(orden, valores):
+        if valor is None or isinstance(valor, (list, dict)):
+            return None
+        try:
+            convertidos.append(_campo(queryset, campo.lstrip('-')).to_python(valor))
+        except (ValidationError, TypeError, ValueError):
+            return None
+    return convertidos
+
+
+def _campo(queryset, nombre):
+    if nombre in queryset.query.annotations:
+        return queryset.query.annotations[nombre].output_field
+    return queryset.model._meta.get_field(nombre)
+
+
+def _valor(objeto, campo):
+    nombre = campo.lstrip('-')
+    return objeto[nombre] if isinstance(objeto, dict) else getattr(objeto, nombre)
+
+
+def _despues_de(orden, valores, adelante):
+    """Q de los registros que van después de `valores` (antes, si no `adelante`)."""
+    condiciones = []
+    iguales = {}
+    for campo, valor in zip(orden, valores):
+        nombre = campo.lstrip('-')
+        descendente = campo.startswith('-')
+        operador = 'lt' if descendente == adelante else 'gt'
+        condiciones.append(Q(**iguales, **{f"{nombre}__{operador}": valor}))
+        iguales[nombre] = valor
+    return reduce(or_, condiciones)
+
+
+def _invertir(campo):
+    return campo[1:] if campo.startswith('-') else f"-{campo}"
+
+
+def paginar(queryset, orden, tamano, despues=None, antes=None):
+    """
+    Página de `tamano` registros de `queryset` en `orden`: la primera, la
+    que sigue al cursor `despues` o la que precede al cursor `antes`. Un
+    cursor inválido se toma como ausente.
+    """
+    valores_despues = leer_cursor(despues, orden, queryset) if despues else None
+    valores_antes = leer_cursor(antes, orden, queryset) if antes else None
+
+    if valores_antes is not None:
+        queryset = queryset.filter(_despues_de(orden, valores_antes, adelante=False))
+        filas = list(queryset.order_by(*[_invertir(c) for c in orden])[:tamano + 1])
+        hay_mas = len(filas) > tamano
+        filas = filas[:tamano][::-1]
+        return Pagina(
+            filas,
+            siguiente=crear_cursor(_valor(filas[-1], c) for c in orden) if filas else None,
+            anterior=crear_cursor(_valor(filas[0], c) for c in orden) if hay_mas else None,
+        )
+
+    if valores_despues is not None:
+        queryset = queryset.filter(_despues_de(orden, valores_despues, adelante=True))
+    filas = list(queryset.order_by(*orden)[:tamano + 1])
+    hay_mas = len(filas) > tamano
+    filas = filas[:tamano]
+    return Pagina(
+        filas,
+        siguiente=crear_cursor(_valor(filas[-1], c) for c in orden) if hay_mas else None,
+        anterior=crear_cursor(_valor(filas[0], c) for c in orden) if valores_despues is not None and filas else None,
+    )
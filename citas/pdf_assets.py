@@ -0,0 +1,217 @@
+"""
+Recursos compartidos por los generadores de PDF (receta, historial, reportes).
+
+El logo original pesa 1.4 MB (1024x1024 RGBA) y se dibuja a 35-70 pt, así
+que se carga y reduce una sola vez por proceso. Los estilos tampoco cambian
+entre peticiones y se construyen una vez. Los flowables (tablas, imágenes)
+se arman en cada llamada a partir de estas piezas, porque reportlab guarda
+estado de maquetación en ellos y no conviene compartirlos entre documentos.
+"""
+import io
+import os
+from functools import lru_cache
+
+from django.conf import settings
+from PIL import Image as PILImage
+from reportlab.lib import colors
+from reportlab.lib.enums import TA_CENTER, TA_JUSTIFY, TA_LEFT, TA_RIGHT
+from reportlab.lib.styles import ParagraphStyle, getSampleStyleSheet
+from reportlab.lib.units import inch
+from reportlab.platypus import Image, Paragraph, Spacer, Table, TableStyle
+from reportlab.platypus.flowables import HRFlowable
+
+RUTA_LOGO = os.path.join(settings.BASE_DIR, "static", "citas", "img", "logo.png")
+
+# 3x el tamaño máximo en el que se dibuja (70 pt)
+LADO_LOGO_PX = 210
+
+# Colores del historial
+AZUL_OSCURO = colors.HexColor("#1a365d")
+AZUL_MEDIO = colors.HexColor("#2d5a8c")
+AZUL_CLARO = colors.HexColor("#e6f2ff")
+GRIS = colors.HexColor("#4a5568")
+
+# Colores de la receta
+RECETA_AZUL_OSCURO = colors.HexColor("#0d47a1")
+RECETA_AZUL_MEDIO = colors.HexColor("#1976d2")
+RECETA_GRIS_MEDIO = colors.HexColor("#424242")
+RECETA_GRIS_CLARO = colors.HexColor("#757575")
+BLANCO = colors.HexColor("#ffffff")
+
+
+class _Estilos(dict):
+    __getattr__ = dict.__getitem__
+
+
+# ---------------------------
+# Logo
+# ---------------------------
+@lru_cache(maxsize=1)
+def logo_bytes():
+    """PNG del logo reducido, o None si el archivo no existe."""
+    if not os.path.exists(RUTA_LOGO):
+        return None
+    with PILImage.open(RUTA_LOGO) as imagen:
+        imagen.thumbnail((LADO_LOGO_PX, LADO_LOGO_PX))
+        salida = io.BytesIO()
+        imagen.save(salida, 'PNG', optimize=True)
+    return salida.getvalue()
+
+
+def logo(width, height):
+    datos = logo_bytes()
+    if datos is None:
+        return None
+    return Image(io.BytesIO(datos), width=width, height=height)
+
+
+# ---------------------------
+# Estilos
+# ---------------------------
+@lru_cache(maxsize=1)
+def estilos_historial():
+    return _Estilos(
+        title=ParagraphStyle(
+            "title", fontSize=22, fontName="Helvetica-Bold", alignment=TA_CENTER,
+            textColor=AZUL_OSCURO, spaceAfter=14,
+        ),
+        subtitle=ParagraphStyle(
+            "subtitle", fontSize=12, fontName="Helvetica", alignment=TA_CENTER,
+            textColor=GRIS, spaceAfter=20,
+        ),
+        section=ParagraphStyle(
+            "section", fontSize=16, fontName="Helvetica-Bold", textColor=AZUL_MEDIO,
+            spaceBefore=30, spaceAfter=10,
+        ),
+        normal=ParagraphStyle("normal", fontSize=10, fontName="Helvetica", textColor=GRIS),
+        bold=ParagraphStyle("bold", fontSize=10, fontName="Helvetica-Bold", textColor=AZUL_OSCURO),
+        info=ParagraphStyle(
+            "info", fontSize=11, fontName="Helvetica", textColor=AZUL_OSCURO, spaceAfter=5,
+        ),
+        hospital_name=ParagraphStyle(
+            "hospital_name", fontSize=18, fontName="Helvetica-Bold", textColor=AZUL_OSCURO,
+            alignment=TA_CENTER, spaceAfter=0,
+        ),
+    )
+
+
+@lru_cache(maxsize=1)
+def estilos_receta():
+    return _Estilos(
+        titulo=ParagraphStyle("titulo", fontSize=11, textColor=RECETA_AZUL_OSCURO, alignment=TA_CENTER),
+        titulo_sin_logo=ParagraphStyle("titulo", fontSize=12, textColor=RECETA_AZUL_OSCURO, alignment=TA_CENTER),
+        contacto=ParagraphStyle('contacto', fontSize=7, alignment=TA_RIGHT),
+        label=ParagraphStyle('label', fontSize=8, textColor=RECETA_AZUL_OSCURO, alignment=TA_LEFT),
+        value=ParagraphStyle('value', fontSize=8, textColor=RECETA_GRIS_MEDIO, alignment=TA_LEFT),
+        value_chico=ParagraphStyle('value', fontSize=7, textColor=RECETA_GRIS_MEDIO, alignment=TA_LEFT),
+        signo_label=ParagraphStyle('label', fontSize=7, textColor=RECETA_GRIS_CLARO),
+        signo_value=ParagraphStyle('value', fontSize=8, textColor=RECETA_GRIS_MEDIO),
+        diagnostico=ParagraphStyle(
+            'diagnostico', fontSize=7, textColor=RECETA_GRIS_MEDIO, leading=9, alignment=TA_CENTER,
+        ),
+        subtitulo=ParagraphStyle('subtitulo', fontSize=7, textColor=BLANCO, alignment=TA_CENTER),
+        contenido=ParagraphStyle(
+            'contenido', fontSize=6, textColor=RECETA_GRIS_MEDIO, leading=8, alignment=TA_JUSTIFY,
+        ),
+        firma_nom=ParagraphStyle("firma_nom", fontSize=7, alignment=TA_RIGHT),
+    )
+
+
+@lru_cache(maxsize=1)
+def estilos_reporte():
+    styles = getSampleStyleSheet()
+    return _Estilos(
+        title=ParagraphStyle(
+            'Title', parent=styles['Heading1'], fontSize=16, spaceAfter=30,
+            textColor=AZUL_OSCURO, alignment=1,
+        ),
+        no_data=ParagraphStyle(
+            'NoData', parent=styles['BodyText'], fontSize=12, textColor=colors.gray, alignment=1,
+        ),
+    )
+
+
+# ---------------------------
+# Encabezados
+# ---------------------------
+_ESTILO_ENCABEZADO_HISTORIAL = TableStyle([
+    ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+    ('ALIGN', (0, 0), (0, 0), 'CENTER'),
+    ('ALIGN', (1, 0), (1, 0), 'CENTER'),
+    ('BOTTOMPADDING', (0, 0), (-1, -1), 5),
+])
+
+
+def encabezado_historial():
+    """Logo, nombre del hospital, línea divisoria y título del historial."""
+    estilos = estilos_historial()
+    story = []
+
+    imagen = logo(70, 70)
+    if imagen is not None:
+        header_table = Table([[
+            imagen,
+            Paragraph(
+                "<b>HOSPITAL SAN PEDRO</b><br/><font size='10'>Centro Médico Especializado</font>",
+                estilos.hospital_name,
+            ),
+        ]], colWidths=[80, 450])
+        header_table.setStyle(_ESTILO_ENCABEZADO_HISTORIAL)
+        story.append(header_table)
+    else:
+        story.append(Paragraph("<b>HOSPITAL SAN PEDRO</b>", estilos.title))
+
+    story.append(Spacer(1, 5))
+    story.append(HRFlowable(width="100%", thickness=1, color=AZUL_MEDIO, spaceBefore=5, spaceAfter=10))
+    story.append(Paragraph("HISTORIAL CLÍNICO", estilos.title))
+    story.append(Paragraph("Documento confidencial - Uso médico exclusivo", estilos.subtitle))
+    return story
+
+
+HOSPITAL_NOMBRE = "Hospital San Pedro"
+
+_ESTILO_ENCABEZADO_RECETA = TableStyle([
+    ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+    ('TOPPADDING', (0, 0), (-1, -1), 2),
+    ('BOTTOMPADDING', (0, 0), (-1, -1), 4),
+])
+
+
+def encabezado_receta(fecha):
+    """Encabezado en 3 columnas de la receta: logo, título y contacto."""
+    estilos = estilos_receta()
+    contacto = Paragraph(
+        f"<font size='7'><b>Av. 5 de Mayo Sur Nº 29</b></font><br/>"
+        f"<font size='7'>Zacapoaxtla, Pue.</font><br/>"
+        f"<font size='7'><b>Tel:</b> 233 314 3084</font><br/>"
+        f"<font size='7'><b>Fecha:</b> {fecha.strftime('%d/%m/%Y')}</font>",
+        estilos.contacto
+    )
+
+    imagen = logo(35, 35)
+    if imagen is not None:
+        fila = [
+            imagen,
+            Paragraph(
+                f"<font size='11'><b>{HOSPITAL_NOMBRE}</b></font><br/>"
+                f"<font size='9' color='#1976d2'><b>RECETA MÉDICA</b></font>",
+                estilos.titulo
+            ),
+            contacto,
+        ]
+        col_widths = [0.7*inch, 5.0*inch, 2.3*inch]
+    else:
+        fila = [
+            Paragraph(
+                f"<font size='12'><b>{HOSPITAL_NOMBRE}</b></font><br/>"
+                f"<font size='10' color='#1976d2'><b>RECETA MÉDICA</b></font>",
+                estilos.titulo_sin_logo
+            ),
+            "",
+            contacto,
+        ]
+        col_widths = [4.0*inch, 1.0*inch, 3.0*inch]
+
+    header_table = Table([fila], colWidths=col_widths)
+    header_table.setStyle(_ESTILO_ENCABEZADO_RECETA)
+    return header_table
@@ -0,0 +1,787 @@
+"""
+Generadores de PDF que no dependen de la petición.
+
+Reciben los datos ya cargados y un destino (respuesta, buffer o archivo),
+de modo que las vistas y las tareas en segundo plano pueden usarlos igual.
+
+Los documentos largos (historial, reportes) se arman por partes (una cita,
+un bloque de filas) con `DocumentoPorPartes`, que alimenta el `build()` de
+reportlab parte por parte. reportlab guarda todas las páginas terminadas
+hasta `save()`, así que además cada `PARTES_POR_LOTE` partes se cierra un
+PDF temporal y al final `unir_pdfs` copia sus páginas al destino objeto por
+objeto. La memoria depende del tamaño del lote, no del número de citas.
+"""
+import io
+import os
+import tempfile
+from array import array
+from datetime import date
+from itertools import chain, islice
+
+from django.conf import settings
+from django.core.cache import cache
+from PyPDF2 import PdfReader
+from PyPDF2.generic import (
+    ArrayObject, DictionaryObject, IndirectObject, NameObject, NumberObject as NumeroPdf, StreamObject,
+)
+from reportlab.lib import colors
+from reportlab.lib.pagesizes import letter, portrait
+from reportlab.lib.units import inch
+from reportlab.platypus import Image, Paragraph, SimpleDocTemplate, Spacer, Table, TableStyle
+
+from .derivatives import ruta_para_pdf
+from .models import Cita
+from .pdf_assets import (
+    AZUL_CLARO, AZUL_MEDIO, BLANCO, RECETA_AZUL_MEDIO, RECETA_AZUL_OSCURO, RECETA_GRIS_MEDIO,
+    encabezado_historial, encabezado_receta, estilos_historial, estilos_receta, estilos_reporte,
+)
+from .versiones import huella
+
+# Filas por tabla en los reportes; solo la primera lleva encabezado
+FILAS_POR_TABLA = 40
+
+
+# Partes por PDF temporal: con 50 citas (o 50 tablas de reporte) el lote
+# más grande no pasa de unos MB en memoria
+PARTES_POR_LOTE = 50
+
+
+class _HistoriaPorPartes(list):
+    """
+    Lista de flowables que `build()` consume desde el frente; cuando se
+    vacía, `len()` la rellena con la siguiente parte.
+    """
+
+    def __init__(self, partes):
+        super().__init__()
+        self._partes = iter(partes)
+
+    def __len__(self):
+        while not super().__len__():
+            parte = next(self._partes, None)
+            if parte is None:
+                return 0
+            self.extend(parte)
+        return super().__len__()
+
+
+class DocumentoPorPartes(SimpleDocTemplate):
+    """
+    `SimpleDocTemplate` que recibe la historia como un iterable de listas de
+    flowables en lugar de una sola lista. Usa el `build()` de reportlab sin
+    cambios; solo la lista se va llenando conforme se maqueta.
+    """
+
+    def build_por_partes(self, partes, **kwargs):
+        self.build(_HistoriaPorPartes(partes), **kwargs)
+
+
+def construir_por_lotes(destino, crear_documento, partes, por_lote=None):
+    """
+    Escribe en `destino` el PDF de `partes`. Cada `por_lote` partes
+    (`PARTES_POR_LOTE`) se maquetan con `crear_documento(archivo)` en un PDF
+    temporal, que empieza en página nueva; luego se unen con `unir_pdfs`.
+    """
+    por_lote = por_lote or PARTES_POR_LOTE
+    partes = iter(partes)
+    lotes = []
+    try:
+        for primera in partes:
+            lote = tempfile.TemporaryFile()
+            lotes.append(lote)
+            crear_documento(lote).build_por_partes(chain([primera], islice(partes, por_lote - 1)))
+        unir_pdfs(destino, lotes)
+    finally:
+        for lote in lotes:
+            lote.close()
+
+
+class _SalidaPdf:
+    """Escribe objetos PDF uno por uno y recuerda dónde quedó cada uno."""
+
+    def __init__(self, destino):
+        self.destino = destino
+        self.posicion = 0
+        # Posición de cada objeto (el número es el índice + 1); 8 bytes por objeto
+        self.posiciones = array('q')
+        self.escribir(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+
+    def escribir(self, datos):
+        self.destino.write(datos)
+        self.posicion += len(datos)
+
+    def reservar(self):
+        self.posiciones.append(-1)
+        return len(self.posiciones)
+
+    def objeto(self, numero, objeto):
+        self.posiciones[numero - 1] = self.posicion
+        self.escribir(f"{numero} 0 obj\n".encode())
+        objeto.write_to_stream(self, None)
+        self.escribir(b"\nendobj\n")
+
+    write = escribir
+
+    def terminar(self, raiz, info):
+        xref = self.posicion
+        self.escribir(f"xref\n0 {len(self.posiciones) + 1}\n0000000000 65535 f \n".encode())
+        for posicion in self.posiciones:
+            self.escribir(f"{posicion:010d} 00000 n \n".encode())
+        trailer = DictionaryObject({
+            NameObject('/Size'): NumeroPdf(len(self.posiciones) + 1),
+            NameObject('/Root'): IndirectObject(raiz, 0, None),
+        })
+        if info is not None:
+            trailer[NameObject('/Info')] = IndirectObject(info, 0, None)
+        self.escribir(b"trailer\n")
+        trailer.write_to_stream(self, None)
+        self.escribir(f"\nstartxref\n{xref}\n%%EOF\n".encode())
+
+
+def _copiar(objeto, salida, copiados):
+    """
+    Copia de `objeto` con sus referencias renumeradas. Cada objeto indirecto
+    se escribe en `salida` la primera vez que aparece (`copiados` lleva la
+    numeración nueva) y ya no se guarda en memoria.
+    """
+    if isinstance(objeto, IndirectObject):
+        if objeto.idnum not in copiados:
+            copiados[objeto.idnum] = numero = salida.reservar()
+            salida.objeto(numero, _copiar(objeto.get_object(), salida, copiados))
+        return IndirectObject(copiados[objeto.idnum], 0, None)
+    if isinstance(objeto, DictionaryObject):
+        copia = objeto.__class__()
+        if isinstance(objeto, StreamObject):
+            copia._data = objeto._data
+        for clave, valor in dict.items(objeto):
+            copia[NameObject(clave)] = _copiar(valor, salida, copiados)
+        return copia
+    if isinstance(objeto, ArrayObject):
+        return ArrayObject(_copiar(valor, salida, copiados) for valor in list.__iter__(objeto))
+    return objeto
+
+
+def unir_pdfs(destino, archivos):
+    """
+    Escribe en `destino` las páginas de los PDFs `archivos`, en orden. Lee un
+    archivo a la vez y escribe cada objeto en cuanto lo copia: en memoria
+    solo quedan el lector del archivo en curso y la posición de cada objeto.
+    """
+    salida = _SalidaPdf(destino)
+    paginas = salida.reservar()
+    hojas = array('q')
+    info = None
+    for archivo in archivos:
+        archivo.seek(0)
+        lector = PdfReader(archivo)
+        copiados = {}
+        for pagina in lector.pages:
+            referencia = pagina.indirect_reference
+            copiados[referencia.idnum] = numero = salida.reservar()
+            copia = DictionaryObject()
+            for clave, valor in dict.items(pagina):
+                if clave != '/Parent':
+                    copia[NameObject(clave)] = _copiar(valor, salida, copiados)
+            copia[NameObject('/Parent')] = IndirectObject(paginas, 0, None)
+            salida.objeto(numero, copia)
+            hojas.append(numero)
+        if info is None and '/Info' in lector.trailer:
+            info = _copiar(lector.trailer.raw_get('/Info'), salida, copiados).idnum
+
+    salida.objeto(paginas, DictionaryObject({
+        NameObject('/Type'): NameObject('/Pages'),
+        NameObject('/Kids'): ArrayObject(IndirectObject(n, 0, None) for n in hojas),
+        NameObject('/Count'): NumeroPdf(len(hojas)),
+    }))
+    raiz = salida.reservar()
+    salida.objeto(raiz, DictionaryObject({
+        NameObject('/Type'): NameObject('/Catalog'),
+        NameObject('/Pages'): IndirectObject(paginas, 0, None),
+    }))
+    salida.terminar(raiz, info)
+
+
+def archivo_temporal():
+    """
+    Destino para un PDF: queda en memoria hasta `PDF_SPOOL_MAX` bytes y pasa
+    a disco si es más grande.
+    """
+    return tempfile.SpooledTemporaryFile(max_size=settings.PDF_SPOOL_MAX)
+
+
+# ==========================================
+#      HISTORIAL CLÍNICO
+# ==========================================
+def _bloque_cita(cita, estilos):
+    """Flowables de una cita: signos, diagnóstico, receta y estudios del día."""
+    normal = estilos.normal
+    bold = estilos.bold
+
+    story = []
+    story.append(Paragraph(f"Cita del {cita.fecha.strftime('%d/%m/%Y')}", estilos.section))
+
+    # Doctor de esta cita específica
+    story.append(Paragraph(
+        f"<b>Atendió:</b> Dr. {cita.doctor.user.nombre} {cita.doctor.user.apellido_paterno} {cita.doctor.user.apellido_materno or ''}",
+        normal
+    ))
+    story.append(Spacer(1, 10))
+
+    bloque = []
+
+    # ---------- Signos Vitales ----------
+    sv = getattr(cita, "signosvitales", None)
+
+    if sv:
+        bloque.append(Paragraph("<b>Signos Vitales</b>", bold))
+        signos_table = Table([
+            [Paragraph("Peso:", normal), Paragraph(f"{sv.peso or '—'} kg", normal),
+             Paragraph("Presión:", normal), Paragraph(f"{sv.presion_arterial or '—'}", normal)],
+            [Paragraph("Temperatura:", normal), Paragraph(f"{sv.temperatura or '—'} °C", normal),
+             Paragraph("Frec. Cardiaca:", normal), Paragraph(f"{sv.frecuencia_cardiaca or '—'}", normal)],
+            [Paragraph("Frec. Respiratoria:", normal), Paragraph(f"{sv.frecuencia_respiratoria or '—'}", normal),
+             Paragraph("Saturación O₂:", normal), Paragraph(f"{sv.saturacion_oxigeno or '—'}%", normal)],
+        ], colWidths=[100, 80, 100, 80])
+        signos_table.setStyle(TableStyle([
+            ('VALIGN', (0, 0), (-1, -1), 'TOP'),
+            ('BOTTOMPADDING', (0, 0), (-1, -1), 5),
+        ]))
+        bloque.append(signos_table)
+        bloque.append(Spacer(1, 10))
+
+    # ---------- Diagnóstico ----------
+    diagnostico = cita.nuevo_diagnostico or cita.diagnostico or "No registrado"
+    bloque.append(Paragraph("<b>Diagnóstico</b>", bold))
+    bloque.append(Paragraph(diagnostico, normal))
+    bloque.append(Spacer(1, 10))
+
+    # ---------- Medicamentos e indicaciones ----------
+    receta = getattr(cita, "receta", None)
+
+    meds = (receta.medicamentos if receta else None) or "No registrado"
+    ind = (receta.indicaciones if receta else None) or "No registrado"
+
+    bloque.append(Paragraph("<b>Medicamentos</b>", bold))
+    bloque.append(Paragraph(meds, normal))
+    bloque.append(Spacer(1, 10))
+
+    bloque.append(Paragraph("<b>Indicaciones</b>", bold))
+    bloque.append(Paragraph(ind, normal))
+    bloque.append(Spacer(1, 15))
+
+    # ---------- Estudios del mismo día ----------
+    if cita.estudios_del_dia:
+        bloque.append(Paragraph("<b>Estudios y Análisis</b>", bold))
+
+        for estudio in cita.estudios_del_dia:
+            bloque.append(Paragraph(f"Descripción: {estudio.descripcion or 'Sin descripción'}", normal))
+            bloque.append(Paragraph(f"Texto extraído: {estudio.texto_extraido or '(Sin texto)'}", normal))
+
+            ext = os.path.splitext(estudio.archivo.name)[1].lower()
+
+            if ext in ['.jpg', '.jpeg', '.png']:
+                try:
+                    ruta = ruta_para_pdf(estudio)
+                    bloque.append(Image(ruta, width=280, height=200, kind='proportional'))
+                except Exception:
+                    bloque.append(Paragraph("(No se pudo cargar la imagen)", normal))
+
+            bloque.append(Spacer(1, 15))
+
+    # ===== BLOQUE COMPLETO =====
+    marco = Table([[b] for b in bloque], colWidths=[500])
+    marco.setStyle(TableStyle([
+        ('BOX', (0, 0), (-1, -1), 1, AZUL_MEDIO),
+        ('BACKGROUND', (0, 0), (-1, 0), AZUL_CLARO),
+        ('PADDING', (0, 0), (-1, -1), 8),
+        ('TOPPADDING', (0, 0), (0, 0), 12),
+        ('BOTTOMPADDING', (0, 0), (0, 0), 12),
+    ]))
+
+    story.append(marco)
+    story.append(Spacer(1, 25))
+    return story
+
+
+def render_historial(destino, paciente, citas, cita_actual=None):
+    """
+    Escribe el historial clínico en `destino`. `citas` viene de
+    `services.HistorialPorLotes`. Con `cita_actual` se muestra el doctor de
+    esa cita; sin ella, el total de consultas.
+    """
+    def documento(archivo):
+        return DocumentoPorPartes(
+            archivo,
+            pagesize=letter,
+            topMargin=60,
+            bottomMargin=40,
+            leftMargin=25,
+            rightMargin=25
+        )
+
+    estilos = estilos_historial()
+    bold = estilos.bold
+    info_style = estilos.info
+
+    # Encabezado (logo ya reducido y estilos compartidos, ver pdf_assets.py)
+    story = encabezado_historial()
+
+    # ========== INFORMACIÓN DEL PACIENTE ==========
+    filas = [
+        [Paragraph("<b>PACIENTE:</b>", bold),
+         Paragraph(f"{paciente.nombre} {paciente.apellido_paterno} {paciente.apellido_materno or ''}", info_style)],
+    ]
+    if cita_actual is not None:
+        doctor = cita_actual.doctor.user
+        filas.append([Paragraph("<b>DOCTOR:</b>", bold),
+                      Paragraph(f"Dr. {doctor.nombre} {doctor.apellido_paterno} {doctor.apellido_materno or ''}", info_style)])
+    filas.append([Paragraph("<b>FECHA DE GENERACIÓN:</b>", bold),
+                  Paragraph(f"{date.today().strftime('%d/%m/%Y')}", info_style)])
+    if cita_actual is None:
+        filas.append([Paragraph("<b>TOTAL DE CONSULTAS:</b>", bold),
+                      Paragraph(f"{len(citas)} consulta(s)", info_style)])
+
+    patient_info = Table(filas, colWidths=[120, 380])
+    patient_info.setStyle(TableStyle([
+        ('VALIGN', (0, 0), (-1, -1), 'TOP'),
+        ('BOTTOMPADDING', (0, 0), (-1, -1), 8),
+        ('TOPPADDING', (0, 0), (-1, -1), 8),
+        ('LEFTPADDING', (0, 0), (-1, -1), 5),
+    ]))
+
+    story.append(patient_info)
+    story.append(Spacer(1, 20))
+
+    # ========== HISTORIAL POR BLOQUES ==========
+    def partes():
+        yield story
+        for cita in citas:
+            yield _bloque_cita(cita, estilos)
+
+    # ========== GENERAR PDF ==========
+    construir_por_lotes(destino, documento, partes())
+
+
+# ==========================================
+#      RECETA MÉDICA
+# ==========================================
+class _SinSignos:
+    temperatura = presion_arterial = frecuencia_cardiaca = None
+    frecuencia_respiratoria = saturacion_oxigeno = peso = None
+
+
+def render_receta(destino, cita):
+    """
+    Escribe la receta de `cita` en `destino`. La cita debe traer `receta`;
+    conviene cargarla con select_related('paciente', 'doctor__user',
+    'receta', 'signosvitales').
+    """
+    receta = cita.receta
+    paciente = cita.paciente
+    doctor = cita.doctor
+
+    # SIGNOS VITALES
+    signos = getattr(cita, 'signosvitales', None) or _SinSignos()
+
+    # Márgenes ajustados para mejor uso del espacio
+    doc = SimpleDocTemplate(
+        destino,
+        pagesize=portrait(letter),
+        leftMargin=0.3 * inch,
+        rightMargin=0.3 * inch,
+        topMargin=0.2 * inch,
+        bottomMargin=0.2 * inch
+    )
+
+    elements = []
+    estilos = estilos_receta()
+
+    # Colores
+    azul_oscuro = RECETA_AZUL_OSCURO
+    azul_medio = RECETA_AZUL_MEDIO
+    gris_medio = RECETA_GRIS_MEDIO
+    blanco = BLANCO
+
+    # Datos fijos
+    CEDULA_DEF = "8025534"
+    ESPECIALIDAD_DEF = "Ginecología, Obstetricia, Medicina Materno-Fetal"
+
+    # -----------------------------
+    # ENCABEZADO DISTRIBUIDO (logo y estilos compartidos, ver pdf_assets.py)
+    # -----------------------------
+    elements.append(encabezado_receta(cita.fecha))
+    
+    # Línea separadora
+    elements.append(Spacer(1, 2))
+    linea = Table([['']], colWidths=[7.9*inch], rowHeights=[1])
+    linea.setStyle(TableStyle([
+        ('LINEBELOW', (0, 0), (-1, -1), 1, azul_oscuro),
+        ('LINEABOVE', (0, 0), (-1, -1), 0.5, colors.lightgrey),
+    ]))
+    elements.append(linea)
+    elements.append(Spacer(1, 8))
+
+    # ---------------------------------------
+    # INFORMACIÓN DISTRIBUIDA - COMO EN LA IMAGEN
+    # ---------------------------------------
+    paciente_nombre = f"{paciente.nombre} {paciente.apellido_paterno} {paciente.apellido_materno or ''}"
+    fecha_nac = getattr(paciente, 'fecha_nacimiento', None)
+    fecha_nac_str = fecha_nac.strftime('%d/%m/%Y') if fecha_nac else "---"
+    
+    # Tabla con 2 columnas principales (Paciente y Médico)
+    # Primera fila: Títulos
+    # Segunda fila: Valores alineados
+    
+    info_data = [
+        # Fila 1: Títulos
+        [
+            Paragraph("<font size='8'><b>PACIENTE:</b></font>", 
+                     estilos.label),
+            Paragraph("<font size='8'><b>EDAD:</b></font>", 
+                     estilos.label),
+            Paragraph("<font size='8'><b>FECHA NAC.:</b></font>", 
+                     estilos.label),
+            "",  # Espacio para alinear con la segunda columna
+            Paragraph("<font size='8'><b>MÉDICO:</b></font>", 
+                     estilos.label),
+            Paragraph("<font size='8'><b>ESPECIALIDAD:</b></font>", 
+                     estilos.label),
+            Paragraph("<font size='8'><b>CÉDULA:</b></font>", 
+                     estilos.label),
+        ],
+        # Fila 2: Valores
+        [
+            Paragraph(f"<font size='8'>{paciente_nombre}</font>", 
+                     estilos.value),
+            Paragraph(f"<font size='8'>{paciente.edad} años</font>", 
+                     estilos.value),
+            Paragraph(f"<font size='8'>{fecha_nac_str}</font>", 
+                     estilos.value),
+            Spacer(1, 0.1*inch),  # Espaciador
+            Paragraph(f"<font size='8'>Dr. {doctor.user.get_full_name()}</font>", 
+                     estilos.value),
+            Paragraph(f"<font size='7'>{ESPECIALIDAD_DEF}</font>", 
+                     estilos.value_chico),
+            Paragraph(f"<font size='8'>{CEDULA_DEF}</font>", 
+                     estilos.value),
+        ]
+    ]
+    
+    # Anchos de columna optimizados para distribución
+    col_widths_info = [1.8*inch, 0.7*inch, 1.0*inch, 0.5*inch, 1.8*inch, 1.5*inch, 0.8*inch]
+    
+    info_table = Table(info_data, colWidths=col_widths_info)
+    info_table.setStyle(TableStyle([
+        ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+        ('TOPPADDING', (0, 0), (-1, -1), 6),
+        ('BOTTOMPADDING', (0, 0), (-1, -1), 6),
+        ('LINEBELOW', (0, 0), (2, 0), 0.5, colors.lightgrey),
+        ('LINEBELOW', (4, 0), (-1, 0), 0.5, colors.lightgrey),
+        ('LINEBELOW', (0, 1), (2, 1), 0.5, colors.lightgrey),
+        ('LINEBELOW', (4, 1), (-1, 1), 0.5, colors.lightgrey),
+        ('SPAN', (3, 0), (3, 1)),  # Espaciador ocupa ambas filas
+    ]))
+    
+    elements.append(info_table)
+    elements.append(Spacer(1, 12))
+
+    # ---------------------------------------
+    # SIGNOS VITALES - TABLA COMPACTA
+    # ---------------------------------------
+    signos_header = Table([['SIGNOS VITALES']], colWidths=[7.9*inch])
+    signos_header.setStyle(TableStyle([
+        ('BACKGROUND', (0, 0), (-1, -1), azul_medio),
+        ('TEXTCOLOR', (0, 0), (-1, -1), blanco),
+        ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+        ('FONTSIZE', (0, 0), (-1, -1), 9),
+        ('BOLD', (0, 0), (-1, -1), 1),
+        ('TOPPADDING', (0, 0), (-1, -1), 5),
+        ('BOTTOMPADDING', (0, 0), (-1, -1), 5),
+    ]))
+    elements.append(signos_header)
+    
+    # Tabla de signos vitales en 2 filas compactas
+    signos_data = [
+        [
+            Paragraph("<font size='7'>Temperatura:</font>", estilos.signo_label),
+            Paragraph(f"<font size='8'>{signos.temperatura or '---'} °C</font>", estilos.signo_value),
+            Paragraph("<font size='7'>Presión arterial:</font>", estilos.signo_label),
+            Paragraph(f"<font size='8'>{signos.presion_arterial or '---'}</font>", estilos.signo_value),
+            Paragraph("<font size='7'>F. cardíaca:</font>", estilos.signo_label),
+            Paragraph(f"<font size='8'>{signos.frecuencia_cardiaca or '---'} lpm</font>", estilos.signo_value)
+        ],
+        [
+            Paragraph("<font size='7'>F. respiratoria:</font>", estilos.signo_label),
+            Paragraph(f"<font size='8'>{signos.frecuencia_respiratoria or '---'} rpm</font>", estilos.signo_value),
+            Paragraph("<font size='7'>Sat. O₂:</font>", estilos.signo_label),
+            Paragraph(f"<font size='8'>{signos.saturacion_oxigeno or '---'}%</font>", estilos.signo_value),
+            Paragraph("<font size='7'>Peso:</font>", estilos.signo_label),
+            Paragraph(f"<font size='8'>{signos.peso or '---'} kg</font>", estilos.signo_value)
+        ]
+    ]
+    
+    signos_table = Table(signos_data, colWidths=[1.1*inch, 0.9*inch, 1.1*inch, 0.9*inch, 1.0*inch, 0.9*inch])
+    signos_table.setStyle(TableStyle([
+        ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+        ('TOPPADDING', (0, 0), (-1, -1), 6),
+        ('BOTTOMPADDING', (0, 0), (-1, -1), 6),
+        ('LINEBELOW', (0, 0), (-1, 0), 0.5, colors.lightgrey),
+        ('LINEBELOW', (0, 1), (-1, 1), 0.5, colors.lightgrey),
+    ]))
+    
+    elements.append(signos_table)
+    elements.append(Spacer(1, 12))
+
+    # ---------------------------------------
+    # DIAGNÓSTICO (SI EXISTE)
+    # ---------------------------------------
+        # ---------------------------------------
+    # DIAGNÓSTICO (SI EXISTE) - MISMO TAMAÑO QUE SIGNOS VITALES
+    # ---------------------------------------
+        # ---------------------------------------
+    # DIAGNÓSTICO (SI EXISTE) - ANCHO 7.8 PULGADAS (COMO EN VERSIÓN ANTERIOR)
+    # ---------------------------------------
+    if cita.diagnostico and cita.diagnostico.strip():
+        # Ajustar el espacio después de signos vitales
+        if elements and isinstance(elements[-1], Spacer):
+            elements[-1] = Spacer(1, 2)
+        
+        # Acortar diagnóstico
+        diagnostico_texto = cita.diagnostico
+        if len(diagnostico_texto) > 150:
+            diagnostico_texto = diagnostico_texto[:147] + "..."
+        
+        # ANCHO IGUAL AL DE SIGNOS VITALES EN VERSIÓN ANTERIOR: 7.8 pulgadas
+        diag_width = 7.8 * inch
+        
+        diag_data = [
+            ['DIAGNÓSTICO'],
+            [Paragraph(
+                f"<font size='7'>{diagnostico_texto.replace(chr(10), '<br/>')}</font>", 
+                estilos.diagnostico
+            )]
+        ]
+        
+        diag_table = Table(diag_data, colWidths=[diag_width], rowHeights=[0.25*inch, 0.6*inch])
+        
+        diag_table.setStyle(TableStyle([
+            # Encabezado igual que signos vitales
+            ('BACKGROUND', (0, 0), (-1, 0), azul_medio),
+            ('TEXTCOLOR', (0, 0), (-1, 0), blanco),
+            ('ALIGN', (0, 0), (-1, 0), 'CENTER'),
+            ('FONTSIZE', (0, 0), (-1, 0), 8),
+            ('BOLD', (0, 0), (-1, 0), 1),
+            ('TOPPADDING', (0, 0), (-1, 0), 4),
+            ('BOTTOMPADDING', (0, 0), (-1, 0), 4),
+            
+            # Contenido centrado
+            ('ALIGN', (0, 1), (-1, 1), 'CENTER'),
+            ('VALIGN', (0, 1), (-1, 1), 'MIDDLE'),
+            ('BACKGROUND', (0, 1), (-1, 1), colors.HexColor("#f5f5f5")),
+            ('TOPPADDING', (0, 1), (-1, 1), 8),
+            ('BOTTOMPADDING', (0, 1), (-1, 1), 8),
+            
+            ('BOX', (0, 0), (-1, -1), 0.5, colors.lightgrey),
+        ]))
+        
+        elements.append(diag_table)
+        elements.append(Spacer(1, 6)) # Espacio similar al que sigue a signos vitales
+
+    # ---------------------------------------
+    # MEDICAMENTOS E INDICACIONES (MÁXIMO ESPACIO)
+    # ---------------------------------------
+    medicamentos_texto = (receta.medicamentos or "").replace("\n", "<br/>")
+    indicaciones_texto = (receta.indicaciones or "").replace("\n", "<br/>")
+    
+    # Función para limitar texto
+    def limitar_texto(texto, max_lineas=5):
+        if not texto:
+            return texto
+        lineas = texto.split('<br/>')
+        if len(lineas) <= max_lineas:
+            return texto
+        return '<br/>'.join(lineas[:max_lineas]) + "<br/>..."
+    
+    medicamentos_texto = limitar_texto(medicamentos_texto, 4)
+    indicaciones_texto = limitar_texto(indicaciones_texto, 4)
+    
+    # Tabla pequeña de 2 columnas
+        # Tabla de 2 columnas para medicamentos e indicaciones
+    contenido_data = [
+        [
+            Paragraph("<font size='7'><b>MEDICAMENTOS PRESCRITOS</b></font>", 
+                     estilos.subtitulo),
+            Paragraph("<font size='7'><b>INDICACIONES MÉDICAS</b></font>", 
+                     estilos.subtitulo)
+        ],
+        [
+            Paragraph(medicamentos_texto or "<i><font size='6' color='{gris_medio}'>Sin medicamentos</font></i>".format(gris_medio=gris_medio), 
+                     estilos.contenido),
+            Paragraph(indicaciones_texto or "<i><font size='6' color='{gris_medio}'>Sin indicaciones</font></i>".format(gris_medio=gris_medio), 
+                     estilos.contenido)
+        ]
+    ]
+    
+    # Altura pequeña para cuadros
+    contenido_table = Table(contenido_data, colWidths=[3.4*inch, 3.4*inch], rowHeights=[0.3*inch, 1.0*inch])
+    contenido_table.setStyle(TableStyle([
+        ('VALIGN', (0, 0), (-1, -1), 'TOP'),
+        ('BACKGROUND', (0, 0), (-1, 0), azul_medio),  # Fondo azul como signos vitales
+        ('TEXTCOLOR', (0, 0), (-1, 0), blanco),  # Texto blanco como signos vitales
+        ('ALIGN', (0, 0), (-1, 0), 'CENTER'),
+        ('TOPPADDING', (0, 0), (-1, 0), 4),
+        ('BOTTOMPADDING', (0, 0), (-1, 0), 4),
+        ('TOPPADDING', (0, 1), (-1, 1), 6),
+        ('BOTTOMPADDING', (0, 1), (-1, 1), 6),
+        ('GRID', (0, 0), (-1, -1), 0.5, colors.lightgrey),
+    ]))
+    
+    elements.append(contenido_table)
+    elements.append(Spacer(1, 8))
+
+    # ---------------------------------------
+    # FIRMA
+    # ---------------------------------------
+    # Línea para firma
+        # ---------------------------------------
+    # FIRMA - SEPARADA DE LA TABLA ANTERIOR
+    # ---------------------------------------
+    # Agregar un Spacer para separar la firma de la tabla de arriba
+    elements.append(Spacer(1, 10))  # Aumenta este valor para más separación
+    
+    # Línea para firma (más corta)
+    linea_firma = Table([['']], colWidths=[2.0*inch], rowHeights=[0.3])
+    linea_firma.setStyle(TableStyle([
+        ('LINEABOVE', (0, 0), (-1, -1), 0.8, colors.black),
+    ]))
+    
+    # Contenedor con todo alineado a la derecha
+    firma_contenido = [
+        [linea_firma],
+        [Paragraph(
+            f"<font size='7'><b>Dr. {doctor.user.get_full_name()}</b></font>", 
+            estilos.firma_nom
+        )],
+        
+    ]
+    
+    # Tabla que ocupa todo el ancho pero tiene contenido alineado a la derecha
+    firma_table = Table(firma_contenido, colWidths=[7.4*inch])
+    firma_table.setStyle(TableStyle([
+        ('VALIGN', (0, 0), (-1, -1), 'TOP'),
+        ('ALIGN', (0, 0), (-1, -1), 'RIGHT'),
+        ('TOPPADDING', (0, 0), (-1, -1), 3),
+        ('BOTTOMPADDING', (0, 0), (-1, -1), 3),
+    ]))
+    
+    elements.append(firma_table)
+    elements.append(Spacer(1, 2))  # Pequeño espacio al final si es necesario
+
+    # ---------------------------------------
+    # CONSTRUIR DOCUMENTO
+    # ---------------------------------------
+    doc.build(elements)
+
+
+# Súbelo cuando cambie el diseño de la receta para descartar lo ya cacheado
+VERSION_DISENO_RECETA = 1
+
+
+def huella_receta(cita):
+    """Huella del contenido de la receta de `cita` (cita, receta, signos, paciente y doctor)."""
+    return huella(
+        ('cita', cita.id),
+        ('paciente', cita.paciente_id),
+        ('usuario', cita.doctor.user_id),
+    )
+
+
+def receta_pdf(cita_id, huella_actual):
+    """
+    PDF de la receta para `huella_actual`, desde la caché o generado y
+    guardado. La cita se lee aquí, después de calcular la huella.
+    """
+    clave = f"receta_pdf:{VERSION_DISENO_RECETA}:{huella_actual}"
+    pdf = cache.get(clave)
+    if pdf is None:
+        cita = Cita.objects.select_related(
+            'paciente', 'doctor__user', 'receta', 'signosvitales'
+        ).get(id=cita_id)
+        buffer = io.BytesIO()
+        render_receta(buffer, cita)
+        pdf = buffer.getvalue()
+        cache.set(clave, pdf, settings.RECETA_CACHE_SEGUNDOS)
+    return pdf
+
+
+# ==========================================
+#      REPORTES DE CITAS
+# ==========================================
+_ESTILO_TABLA_REPORTE = TableStyle([
+    ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor("#2d5a8c")),
+    ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+    ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+    ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+    ('FONTSIZE', (0, 0), (-1, 0), 10),
+    ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+    ('BACKGROUND', (0, 1), (-1, -1), colors.HexColor("#f8f9fa")),
+    ('FONTNAME', (0, 1), (-1, -1), 'Helvetica'),
+    ('FONTSIZE', (0, 1), (-1, -1), 9),
+    ('GRID', (0, 0), (-1, -1), 1, colors.HexColor("#dee2e6"))
+])
+
+# Las tablas siguientes no llevan encabezado y continúan a la primera
+_ESTILO_TABLA_CONTINUACION = TableStyle([
+    ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+    ('BACKGROUND', (0, 0), (-1, -1), colors.HexColor("#f8f9fa")),
+    ('FONTNAME', (0, 0), (-1, -1), 'Helvetica'),
+    ('FONTSIZE', (0, 0), (-1, -1), 9),
+    ('GRID', (0, 0), (-1, -1), 1, colors.HexColor("#dee2e6"))
+])
+
+_ENCABEZADO_REPORTE = ["Paciente", "Doctor", "Fecha", "Hora", "Estado"]
+
+
+def _fila_reporte(cita):
+    paciente_nombre = f"{cita.paciente.nombre} {cita.paciente.apellido_paterno} {cita.paciente.apellido_materno or ''}"
+    doctor_nombre = cita.doctor.user.get_full_name() if cita.doctor else "No asignado"
+    return [
+        paciente_nombre,
+        doctor_nombre,
+        cita.fecha.strftime('%d/%m/%Y'),
+        cita.hora.strftime('%H:%M') if hasattr(cita.hora, 'strftime') else str(cita.hora),
+        cita.estado
+    ]
+
+
+def render_reporte(destino, titulo, citas):
+    """
+    Escribe un reporte de citas en `destino`. `citas` puede ser cualquier
+    iterable (p. ej. `queryset.iterator()`): se recorre una sola vez y se
+    maqueta en tablas de `FILAS_POR_TABLA` filas.
+    """
+    estilos = estilos_reporte()
+
+    def partes():
+        yield [Paragraph(titulo, estilos.title), Spacer(1, 20)]
+
+        filas = iter(citas)
+        primera = True
+        while True:
+            bloque = [_fila_reporte(cita) for cita in islice(filas, FILAS_POR_TABLA)]
+            if not bloque:
+                break
+            if primera:
+                table = Table([_ENCABEZADO_REPORTE] + bloque, colWidths=[180, 150, 80, 60, 80])
+                table.setStyle(_ESTILO_TABLA_REPORTE)
+                primera = False
+            else:
+                table = Table(bloque, colWidths=[180, 150, 80, 60, 80])
+                table.setStyle(_ESTILO_TABLA_CONTINUACION)
+            yield [table]
+
+        if primera:
+            # Mensaje cuando no hay citas
+            yield [Paragraph("No hay citas para el período seleccionado.", estilos.no_data)]
+
+    construir_por_lotes(destino, lambda archivo: DocumentoPorPartes(archivo, pagesize=letter), partes())
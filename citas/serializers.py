@@ -84,4 +84,86 @@ class CitaSerializer(serializers.ModelSerializer):
         if signos_vitales_obj:
             # Usamos SignosVitalesSerializer para serializar el objeto
             return SignosVitalesSerializer(signos_vitales_obj).data
-        return None
\ No newline at end of file
+        return None
+
+# ==============================================================================
+# 5. SIGNOS VITALES EN LOTE (SignosVitalesLoteAPIView)
+#    Solo valida cada registro; services.guardar_signos_lote los guarda juntos.
+# ==============================================================================
+class SignosLoteSerializer(serializers.ModelSerializer):
+    clave = serializers.UUIDField()
+    # Id simple: la existencia de todas las citas se revisa en una consulta
+    cita = serializers.IntegerField()
+
+    class Meta:
+        model = SignosVitales
+        fields = [
+            'clave',
+            'cita',
+            'peso',
+            'presion_arterial',
+            'temperatura',
+            'frecuencia_cardiaca',
+            'frecuencia_respiratoria',
+            'saturacion_oxigeno'
+        ]
+
+# ==============================================================================
+# 6. LECTURA RÁPIDA DE CITAS (CitasListAPIView)
+#    Una consulta con values() (paciente y signos vitales en el mismo JOIN) y
+#    diccionarios armados a mano, con el mismo formato que CitaSerializer.
+# ==============================================================================
+CAMPOS_PACIENTE = PacienteSerializer.Meta.fields
+CAMPOS_SIGNOS = [c for c in SignosVitalesSerializer.Meta.fields if c != 'cita']
+CAMPOS_CITA_RAPIDA = (
+    ['id', 'fecha', 'hora', 'estado']
+    + [f'paciente__{c}' for c in CAMPOS_PACIENTE]
+    + [f'signosvitales__{c}' for c in CAMPOS_SIGNOS]
+)
+
+
+def _mismo(valor):
+    return valor
+
+
+def _iso(valor):
+    return valor.isoformat() if valor is not None else None
+
+
+def _decimal(valor):
+    # Como DecimalField de DRF con COERCE_DECIMAL_TO_STRING
+    return f"{valor:f}" if valor is not None else None
+
+
+FORMATO = {
+    'fecha': _iso, 'hora': _iso, 'fecha_nacimiento': _iso,
+    'peso': _decimal, 'temperatura': _decimal,
+}
+
+
+def formatear(campo, valor):
+    """Valor de una fila de values() como lo daría el serializador."""
+    return FORMATO.get(campo, _mismo)(valor)
+
+
+def citas_rapidas(filas):
+    """Diccionarios de `CitaSerializer` a partir de filas de values(*CAMPOS_CITA_RAPIDA)."""
+    resultado = []
+    for fila in filas:
+        paciente = {c: formatear(c, fila[f'paciente__{c}']) for c in CAMPOS_PACIENTE}
+        signos = None
+        if fila['signosvitales__id'] is not None:
+            signos = {'id': fila['signosvitales__id'], 'cita': fila['id']}
+            for c in CAMPOS_SIGNOS:
+                if c == 'id':
+                    continue
+                signos[c] = formatear(c, fila[f'signosvitales__{c}'])
+        resultado.append({
+            'id': fila['id'],
+            'fecha': _iso(fila['fecha']),
+            'hora': _iso(fila['hora']),
+            'estado': fila['estado'],
+            'paciente': paciente,
+            'signosvitales': signos,
+        })
+    return resultado
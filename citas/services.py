@@ -1,25 +1,190 @@
-from datetime import date
-from .models import Cita
+from collections import defaultdict
+from datetime import timedelta
+from itertools import islice
+
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .disponibilidad import ESTADO_CANCELADA, HorarioOcupado, buscar_espacios, reservar_cita
+from .models import CapturaSignos, Cita, Estudio, SignosVitales
+from .signals import invalidar_agenda
+from .versiones import invalidar
+
+# Días (a partir de la fecha original) en los que se busca un nuevo horario
+DIAS_PARA_REAGENDAR = 14
+# Búsquedas si el espacio encontrado se ocupa antes de guardar
+INTENTOS_REAGENDAR = 3
+# Registros por solicitud en /api/signos/lote/
+MAX_SIGNOS_LOTE = 200
+# Campos que la app captura (SignosLoteSerializer)
+CAMPOS_CAPTURA = [
+    'peso', 'presion_arterial', 'temperatura',
+    'frecuencia_cardiaca', 'frecuencia_respiratoria', 'saturacion_oxigeno',
+]
+ESTADO_ATENDIDA = 'Atendida'
+
+
+class LoteInvalido(Exception):
+    """`errores` tiene un diccionario por registro, vacío si ese registro está bien."""
+
+    def __init__(self, errores):
+        super().__init__(errores)
+        self.errores = errores
+
 
 def reagendar_siguiente_disponible(cita: Cita):
-    if cita.estado != 'cancelada':
+    """
+    Mueve una cita cancelada al primer horario libre de su doctor, desde su
+    fecha original (o desde hoy, si ya pasó) y hasta `DIAS_PARA_REAGENDAR`
+    días después.
+    """
+    if cita.estado.lower() != ESTADO_CANCELADA.lower():
         return None
-    # buscar en el mismo día
-    hora_libre = Cita.siguiente_espacio_disponible(cita.fecha)
-    if hora_libre:
-        cita.hora = hora_libre
-        cita.estado = 'programada'
-        cita.save()
-        return cita
-
-    # si no hay el mismo día, busca los próximos 14 días
-    for i in range(1, 15):
-        nueva_fecha = cita.fecha + timedelta(days=i)
-        hora_libre = Cita.siguiente_espacio_disponible(nueva_fecha)
-        if hora_libre:
-            cita.fecha = nueva_fecha
-            cita.hora = hora_libre
-            cita.estado = 'programada'
-            cita.save()
-            return cita
+
+    original = (cita.fecha, cita.hora, cita.estado)
+    inicio = max(cita.fecha, timezone.localdate())
+    for _ in range(INTENTOS_REAGENDAR):
+        espacios = buscar_espacios(
+            inicio, inicio + timedelta(days=DIAS_PARA_REAGENDAR),
+            doctores=[cita.doctor_id], limite=1, excluir=cita.id,
+        )
+        if not espacios:
+            break
+
+        cita.fecha, cita.hora, _ = espacios[0]
+        cita.estado = 'Pendiente'
+        try:
+            return reservar_cita(cita)
+        except HorarioOcupado:
+            # Otra reserva tomó ese espacio; se busca el siguiente
+            continue
+
+    cita.fecha, cita.hora, cita.estado = original
     return None
+
+
+# ---------------------------
+# Historial clínico
+# ---------------------------
+class HistorialPorLotes:
+    """
+    Citas del paciente (más reciente primero) con doctor, signos vitales,
+    receta y los estudios subidos el mismo día ya cargados; cada cita queda
+    con el atributo `estudios_del_dia`. Se leen de `por_lote` en `por_lote`,
+    dos consultas por lote, para que un historial largo no quede completo en
+    memoria. `len()` cuenta las citas en la base.
+    """
+
+    def __init__(self, paciente, por_lote=500):
+        self.paciente = paciente
+        self.por_lote = por_lote
+
+    def __len__(self):
+        return Cita.objects.filter(paciente=self.paciente).count()
+
+    def __iter__(self):
+        citas = (
+            Cita.objects.filter(paciente=self.paciente)
+            .select_related('doctor__user', 'signosvitales', 'receta')
+            .order_by('-fecha', '-id')
+            .iterator(chunk_size=self.por_lote)
+        )
+        for primera in citas:
+            lote = [primera, *islice(citas, self.por_lote - 1)]
+
+            estudios_por_fecha = defaultdict(list)
+            estudios = Estudio.objects.filter(
+                paciente=self.paciente,
+                fecha_subida__date__range=(lote[-1].fecha, lote[0].fecha),
+            )
+            for estudio in estudios.order_by('fecha_subida', 'id'):
+                estudios_por_fecha[timezone.localdate(estudio.fecha_subida)].append(estudio)
+
+            for cita in lote:
+                cita.estudios_del_dia = estudios_por_fecha.get(cita.fecha, [])
+                yield cita
+
+
+# ---------------------------
+# Signos vitales en lote (app de enfermería)
+# ---------------------------
+def guardar_signos_lote(registros):
+    """
+    Crea o actualiza los signos vitales de varias citas en una transacción y
+    marca las citas como atendidas. Cada registro trae `clave` (UUID que
+    genera la app por captura), `cita` y los campos de `CAMPOS_CAPTURA`.
+
+    Las claves aplicadas se guardan en `CapturaSignos`: un registro con una
+    clave ya vista (un reintento, aunque llegue después de una captura más
+    nueva) no se escribe de nuevo. Si algún registro no es válido no se
+    guarda ninguno y se lanza `LoteInvalido`.
+
+    Devuelve, en el orden recibido, {'clave', 'cita', 'id', 'resultado'} con
+    resultado 'creado', 'actualizado' o 'sin cambios'.
+    """
+    cita_ids = [r['cita'] for r in registros]
+    citas = Cita.objects.only('id', 'doctor_id', 'fecha', 'estado').in_bulk(cita_ids)
+
+    errores, vistas, claves = [], set(), set()
+    for registro in registros:
+        error = {}
+        if registro['cita'] not in citas:
+            error['cita'] = ["Cita no encontrada."]
+        elif registro['cita'] in vistas:
+            error['cita'] = ["La cita aparece más de una vez en el lote."]
+        if registro['clave'] in claves:
+            error['clave'] = ["La clave aparece más de una vez en el lote."]
+        vistas.add(registro['cita'])
+        claves.add(registro['clave'])
+        errores.append(error)
+    if any(errores):
+        raise LoteInvalido(errores)
+
+    with transaction.atomic():
+        aplicadas = set(CapturaSignos.objects.filter(clave__in=claves).values_list('clave', flat=True))
+        existentes = dict(SignosVitales.objects.filter(cita_id__in=cita_ids).values_list('cita_id', 'id'))
+        por_aplicar = [r for r in registros if r['clave'] not in aplicadas]
+        nuevos = [
+            SignosVitales(cita_id=r['cita'], **{c: r.get(c) for c in CAMPOS_CAPTURA})
+            for r in por_aplicar
+        ]
+        if nuevos:
+            # Un solo INSERT ... ON CONFLICT (cita_id) DO UPDATE para todo el lote
+            SignosVitales.objects.bulk_create(
+                nuevos,
+                update_conflicts=True,
+                update_fields=[*CAMPOS_CAPTURA, 'updated_at'],
+                unique_fields=['cita'] if connection.features.supports_update_conflicts_with_target else None,
+            )
+            # Una clave que otra solicitud registró al mismo tiempo ya trae los mismos datos
+            CapturaSignos.objects.bulk_create(
+                [CapturaSignos(clave=r['clave'], cita_id=r['cita']) for r in por_aplicar],
+                ignore_conflicts=True,
+            )
+        ids = {s.cita_id: s.pk for s in nuevos}
+        if None in ids.values():
+            # Motores que no devuelven el id de un upsert
+            ids = dict(SignosVitales.objects.filter(cita_id__in=cita_ids).values_list('cita_id', 'id'))
+
+        por_atender = [c for c in {s.cita_id for s in nuevos} if citas[c].estado != ESTADO_ATENDIDA]
+        if por_atender:
+            Cita.objects.filter(id__in=por_atender).update(estado=ESTADO_ATENDIDA, updated_at=timezone.now())
+
+        # bulk_create y update() no mandan señales (ver signals.signos_modificados)
+        for signos in nuevos:
+            cita = citas[signos.cita_id]
+            invalidar('cita', cita.id)
+            invalidar_agenda(cita.doctor_id, cita.fecha)
+
+    resultado = []
+    for r in registros:
+        signos_id = existentes.get(r['cita'])
+        if r['clave'] in aplicadas:
+            estado = 'sin cambios'
+        else:
+            estado = 'actualizado' if signos_id else 'creado'
+        resultado.append({
+            'clave': r['clave'], 'cita': r['cita'],
+            'id': signos_id or ids.get(r['cita']), 'resultado': estado,
+        })
+    return resultado
@@ -0,0 +1,43 @@
+"""
+Renovación de sesiones con pocas escrituras.
+
+Con `SESSION_SAVE_EVERY_REQUEST` cada página (y cada consulta de
+`actualizar_citas`, varias veces por minuto en cada pestaña) reescribía su fila de
+`django_session` solo para correr la expiración. Ahora la sesión vive en
+`cached_db` (se lee de la caché compartida y, si no está, de la base) y
+`RenovarSesionMiddleware` solo la guarda cuando le quedan menos de
+`SESSION_RENOVAR_SI_QUEDAN` segundos de vida. La expiración sigue
+corriendo mientras el usuario usa el sistema, pero con una escritura cada
+`SESSION_COOKIE_AGE - SESSION_RENOVAR_SI_QUEDAN` segundos como máximo.
+
+La sesión guarda en `CLAVE_RENOVADA` cuándo se guardó por última vez; una
+sesión sin ella (creada antes de este cambio) se renueva en la siguiente
+solicitud.
+"""
+import time
+
+from django.conf import settings
+
+CLAVE_RENOVADA = '_renovada'
+
+
+class RenovarSesionMiddleware:
+    """Va después de SessionMiddleware para marcar la sesión antes de que esta la guarde."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        sesion = getattr(request, 'session', None)
+        if sesion is None or (sesion.session_key is None and not sesion.modified):
+            return response
+        if sesion.is_empty() or sesion.get_expire_at_browser_close():
+            return response
+
+        ahora = int(time.time())
+        restante = sesion.get(CLAVE_RENOVADA, 0) + sesion.get_expiry_age() - ahora
+        # Si la sesión ya se va a guardar, se aprovecha la escritura
+        if sesion.modified or restante < settings.SESSION_RENOVAR_SI_QUEDAN:
+            sesion[CLAVE_RENOVADA] = ahora
+        return response
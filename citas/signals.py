@@ -0,0 +1,152 @@
+from datetime import date
+
+from django.db import transaction
+from django.db.models.fields.files import FieldFile
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+
+from . import typeahead
+from .autenticacion import olvidar_token, olvidar_tokens_de
+from .models import Cita, CustomUser, Estudio, ExportacionPDF, Paciente, Receta, SignosVitales
+from .sincronizacion import registrar_eliminacion
+from .storage import liberar_referencia, registrar_referencia
+from .versiones import invalidar
+
+
+# ---------------------------
+# Archivos de estudios (conteo de referencias)
+# ---------------------------
+@receiver(pre_save, sender=Estudio)
+def estudio_por_guardar(sender, instance, **kwargs):
+    # Un archivo subido en este save cuenta su referencia al guardarse (storage._save)
+    instance._archivo_subido = bool(instance.archivo) and not instance.archivo._committed
+
+
+@receiver(post_save, sender=Estudio)
+def estudio_guardado(sender, instance, created, **kwargs):
+    # El archivo con el que se cargó (o None si es nuevo)
+    anterior = None if created else getattr(instance, '_archivo_cargado', None)
+    anterior_nombre = getattr(anterior, 'name', anterior) or None
+    actual_nombre = instance.archivo.name if instance.archivo else None
+    if anterior_nombre != actual_nombre:
+        if actual_nombre and not instance._archivo_subido:
+            registrar_referencia(instance.archivo)
+        if anterior_nombre:
+            liberar_referencia(FieldFile(instance, instance.archivo.field, anterior_nombre))
+    instance._archivo_cargado = actual_nombre
+
+
+@receiver(post_delete, sender=Estudio)
+def estudio_eliminado(sender, instance, **kwargs):
+    if instance.archivo:
+        liberar_referencia(instance.archivo)
+
+
+# ---------------------------
+# Exportaciones PDF
+# ---------------------------
+@receiver(post_delete, sender=ExportacionPDF)
+def exportacion_eliminada(sender, instance, **kwargs):
+    if instance.archivo:
+        archivo = instance.archivo
+        transaction.on_commit(lambda: archivo.storage.delete(archivo.name))
+
+
+# ---------------------------
+# Sincronización de la app (ver sincronizacion.py)
+# ---------------------------
+@receiver(post_delete, sender=Cita)
+@receiver(post_delete, sender=Paciente)
+@receiver(post_delete, sender=SignosVitales)
+def registro_eliminado(sender, instance, **kwargs):
+    registrar_eliminacion(instance)
+
+
+# ---------------------------
+# Versiones de contenido (ver versiones.py)
+# ---------------------------
+def invalidar_agenda(doctor_id, fecha):
+    """Agenda del doctor de ese día (tabla de citas, ver views.actualizar_citas)."""
+    if doctor_id is None or fecha is None:
+        return
+    invalidar('agenda_dia', f"{doctor_id}:{fecha}")
+
+
+def invalidar_historial(paciente_id):
+    """Historial del paciente y reportes de citas (ver exports.HUELLAS)."""
+    invalidar('historial', paciente_id)
+    invalidar('reporte', 'citas')
+
+
+@receiver([post_save, post_delete], sender=Cita)
+def cita_modificada(sender, instance, **kwargs):
+    invalidar('cita', instance.id)
+    invalidar_historial(instance.paciente_id)
+
+    actual = (instance.doctor_id, instance.fecha)
+    invalidar_agenda(*actual)
+    anterior = getattr(instance, '_agenda_cargada', None)
+    if anterior is not None and anterior != actual:
+        invalidar_agenda(*anterior)
+    instance._agenda_cargada = actual
+
+
+@receiver([post_save, post_delete], sender=Receta)
+def receta_modificada(sender, instance, **kwargs):
+    invalidar('cita', instance.cita_id)
+    try:
+        invalidar_historial(instance.cita.paciente_id)
+    except Cita.DoesNotExist:
+        pass  # se borró junto con la cita, que ya avisó al historial
+
+
+@receiver([post_save, post_delete], sender=SignosVitales)
+def signos_modificados(sender, instance, **kwargs):
+    invalidar('cita', instance.cita_id)
+    try:
+        invalidar_historial(instance.cita.paciente_id)
+        invalidar_agenda(instance.cita.doctor_id, instance.cita.fecha)
+    except Cita.DoesNotExist:
+        pass  # se borró junto con la cita, que ya avisó a la agenda
+
+
+@receiver([post_save, post_delete], sender=Estudio)
+def estudio_modificado(sender, instance, **kwargs):
+    invalidar('historial', instance.paciente_id)
+
+
+@receiver([post_save, post_delete], sender=Paciente)
+def paciente_modificado(sender, instance, **kwargs):
+    invalidar('paciente', instance.id)
+    invalidar('reporte', 'citas')
+    typeahead.paciente_cambiado(instance, eliminado=kwargs['signal'] is post_delete)
+
+    # Las agendas muestran el nombre del paciente
+    if kwargs.get('created'):
+        return
+    proximas = Cita.objects.filter(paciente_id=instance.id, fecha__gte=date.today())
+    for doctor_id, fecha in proximas.values_list('doctor_id', 'fecha').distinct():
+        invalidar_agenda(doctor_id, fecha)
+
+
+@receiver([post_save, post_delete], sender=CustomUser)
+def usuario_modificado(sender, instance, update_fields=None, **kwargs):
+    # Cada inicio de sesión guarda last_login; no cambia ningún documento
+    if update_fields is not None and set(update_fields) == {'last_login'}:
+        return
+    invalidar('usuario', instance.id)
+    invalidar('reporte', 'citas')
+    # Contraseña, rol o is_active pudieron cambiar (ver autenticacion.py). Al
+    # borrar al usuario sus tokens se borran en cascada y avisan solos.
+    if kwargs['signal'] is post_save and not kwargs.get('created'):
+        olvidar_tokens_de(instance.id)
+
+
+# ---------------------------
+# Tokens de la API en caché (ver autenticacion.py)
+# ---------------------------
+@receiver(post_delete, sender=Token)
+def token_eliminado(sender, instance, **kwargs):
+    # Cierre de sesión, rotación o usuario borrado (en cascada)
+    olvidar_token(instance.key)
@@ -0,0 +1,149 @@
+"""
+Sincronización por cambios para la app de enfermería.
+
+Cita, Paciente y SignosVitales guardan `updated_at` y cada borrado deja un
+registro en `Eliminacion` (ver signals.py). La app pide
+`/api/sync/?since=<cursor>` y recibe solo lo modificado o borrado desde
+entonces, junto con el cursor para la siguiente vez.
+
+El cursor es la hora del servidor tomada *antes* de leer, así que nunca
+retrocede. Como una transacción puede confirmarse después de que otra
+sincronización ya pasó por su `updated_at`, cada consulta se solapa
+`SYNC_SOLAPE` segundos con la anterior: la app puede recibir de nuevo
+algunos registros (se aplican por id, sin efecto) pero no pierde ninguno.
+Un cursor más viejo que `SYNC_ELIMINACIONES_DIAS`, ausente o que no se
+puede leer pide todo de nuevo y la respuesta lleva `completo: true`: la
+app debe reemplazar sus datos, porque los registros de borrados ya se
+limpiaron.
+
+Cada respuesta trae como máximo `SYNC_POR_PAGINA` registros (pacientes,
+luego citas, luego signos, por id). Si `hay_mas` es verdadero, la app pide
+de nuevo con el `cursor` recibido hasta que sea falso; los borrados van en
+la primera página. Todas las páginas de una sincronización leen desde el
+mismo momento, y el cursor de la última es la hora en que empezó.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .models import Cita, Eliminacion, Paciente, SignosVitales
+from .paginacion import crear_cursor, leer_cursor
+from .serializers import CAMPOS_PACIENTE, CAMPOS_SIGNOS, formatear
+
+# Nombre en la respuesta -> (modelo, campos)
+TABLAS = {
+    'pacientes': (Paciente, CAMPOS_PACIENTE),
+    'citas': (Cita, ['id', 'paciente', 'doctor', 'fecha', 'hora', 'estado']),
+    'signos': (SignosVitales, [*CAMPOS_SIGNOS, 'cita']),
+}
+# Cursor al terminar: [momento]. Cursor entre páginas: [desde o null,
+# momento en que empezó, tabla siguiente, último id leído de esa tabla]
+ORDEN_CURSOR = ('updated_at',)
+ORDEN_PAGINA = ('desde', 'inicio', 'tabla', 'id')
+
+
+def registrar_eliminacion(instancia):
+    for nombre, (modelo, _) in TABLAS.items():
+        if isinstance(instancia, modelo):
+            Eliminacion.objects.create(modelo=nombre, objeto_id=instancia.pk)
+
+
+def _momento(valor):
+    """datetime con zona horaria de un valor del cursor, o None si no lo es."""
+    if not isinstance(valor, str):
+        return None
+    try:
+        momento = parse_datetime(valor)
+    except ValueError:
+        return None
+    if momento is None or timezone.is_naive(momento):
+        return None
+    return momento
+
+
+def leer_cursor_sync(cursor):
+    """
+    (desde, inicio, tabla, ultimo_id) de un cursor; desde None pide todo.
+    Un cursor ausente o inválido empieza una sincronización completa.
+    """
+    if not cursor:
+        return None
+    valores = leer_cursor(cursor, ORDEN_CURSOR)
+    if valores is not None:
+        desde = _momento(valores[0])
+        return (desde, None, 0, 0) if desde else None
+
+    valores = leer_cursor(cursor, ORDEN_PAGINA)
+    if valores is None:
+        return None
+    desde, inicio, tabla, ultimo_id = valores
+    inicio = _momento(inicio)
+    if inicio is None or (desde is not None and _momento(desde) is None):
+        return None
+    if type(tabla) is not int or type(ultimo_id) is not int or not 0 <= tabla < len(TABLAS):
+        return None
+    return (_momento(desde) if desde else None, inicio, tabla, ultimo_id)
+
+
+def _filas(modelo, campos, desde, ultimo_id, cantidad):
+    # Las llaves foráneas salen como id: values('paciente') da paciente_id
+    filas = modelo.objects.filter(id__gt=ultimo_id)
+    if desde is not None:
+        filas = filas.filter(updated_at__gte=desde)
+    return [
+        {c: formatear(c, fila[c]) for c in campos}
+        for fila in filas.order_by('id').values(*campos)[:cantidad]
+    ]
+
+
+def cambios(cursor=None):
+    """Respuesta de /api/sync/ para el cursor dado."""
+    ahora = timezone.now()
+    estado = leer_cursor_sync(cursor)
+    if estado is None:
+        desde, inicio, tabla, ultimo_id = None, ahora, 0, 0
+    else:
+        desde, inicio, tabla, ultimo_id = estado
+        if inicio is None:
+            # Sincronización nueva a partir del cursor final de la anterior
+            inicio = ahora
+            if desde < ahora - timedelta(days=settings.SYNC_ELIMINACIONES_DIAS):
+                desde = None
+            else:
+                desde -= timedelta(seconds=settings.SYNC_SOLAPE)
+    completo = desde is None
+    primera = tabla == 0 and ultimo_id == 0
+
+    respuesta = {'completo': completo}
+    restante = settings.SYNC_POR_PAGINA
+    nombres = list(TABLAS)
+    for i, nombre in enumerate(nombres):
+        modelo, campos = TABLAS[nombre]
+        filas = []
+        if i >= tabla and restante > 0:
+            filas = _filas(modelo, campos, desde, ultimo_id, restante)
+            restante -= len(filas)
+            if restante > 0:
+                # Se leyó hasta el final de esta tabla
+                tabla, ultimo_id = i + 1, 0
+            else:
+                tabla, ultimo_id = i, filas[-1]['id']
+        respuesta[nombre] = filas
+
+    hay_mas = tabla < len(nombres)
+    respuesta['hay_mas'] = hay_mas
+    if hay_mas:
+        respuesta['cursor'] = crear_cursor([desde, inicio, tabla, ultimo_id])
+    else:
+        respuesta['cursor'] = crear_cursor([inicio])
+
+    eliminados = {nombre: [] for nombre in TABLAS}
+    if not completo and primera:
+        borrados = Eliminacion.objects.filter(eliminado_en__gte=desde).values_list('modelo', 'objeto_id')
+        for modelo, objeto_id in borrados:
+            if modelo in eliminados:
+                eliminados[modelo].append(objeto_id)
+    respuesta['eliminados'] = eliminados
+    return respuesta
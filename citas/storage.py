@@ -0,0 +1,114 @@
+"""
+Almacenamiento por contenido para los archivos de estudios.
+
+Cada archivo se guarda como `estudios/<ab>/<sha256><ext>`, así que subir el
+mismo archivo dos veces no ocupa espacio extra. `ContenidoArchivo` lleva la
+cuenta de cuántos estudios usan cada archivo; cuando llega a cero se borra.
+
+La fila de `ContenidoArchivo` es también el candado del archivo: al subir,
+`_save` suma la referencia (bloqueando la fila) antes de ver si el archivo ya
+existe, y el borrado vuelve a bloquear la fila y solo borra si la cuenta
+sigue en cero. Así una subida y un borrado del mismo contenido no se cruzan.
+Por eso el `post_save` del estudio solo llama a `registrar_referencia` cuando
+el archivo no viene de una subida (ver signals.py).
+"""
+import hashlib
+import os
+import re
+import uuid
+
+from django.core.files.storage import FileSystemStorage
+from django.db import transaction
+from django.db.models import F
+from django.utils.deconstruct import deconstructible
+
+PATRON_SHA256 = re.compile(r'^[0-9a-f]{64}$')
+
+
+def sha256_contenido(content):
+    h = hashlib.sha256()
+    for bloque in content.chunks():
+        h.update(bloque)
+    return h.hexdigest()
+
+
+def sha256_de_nombre(nombre):
+    """SHA-256 contenido en un nombre `.../<sha256><ext>`, o None."""
+    base = os.path.splitext(os.path.basename(nombre or ''))[0]
+    return base if PATRON_SHA256.match(base) else None
+
+
+@deconstructible
+class AlmacenamientoPorContenido(FileSystemStorage):
+
+    def get_available_name(self, name, max_length=None):
+        # Mismo contenido = mismo nombre: nunca se le agrega sufijo
+        if sha256_de_nombre(name):
+            return name
+        return super().get_available_name(name, max_length)
+
+    def _save(self, name, content):
+        sha256 = sha256_contenido(content)
+        directorio = os.path.dirname(name)
+        ext = os.path.splitext(name)[1].lower()
+        name = os.path.join(directorio, sha256[:2], f"{sha256}{ext}").replace('\\', '/')
+
+        with transaction.atomic():
+            _sumar_referencia(sha256, name, content.size)
+            if not self.exists(name):
+                # Se escribe aparte y se mueve: si el archivo apareció mientras
+                # tanto (otra subida), se reemplaza por el mismo contenido
+                temporal = super()._save(f"{name}.{uuid.uuid4().hex}.parcial", content)
+                os.replace(self.path(temporal), self.path(name))
+        return name
+
+
+# ---------------------------
+# Conteo de referencias
+# ---------------------------
+def _sumar_referencia(sha256, nombre, tamano):
+    from .models import ContenidoArchivo
+
+    ContenidoArchivo.objects.bulk_create(
+        [ContenidoArchivo(sha256=sha256, nombre=nombre, tamano=tamano)], ignore_conflicts=True,
+    )
+    ContenidoArchivo.objects.filter(sha256=sha256).update(referencias=F('referencias') + 1)
+
+
+def registrar_referencia(archivo):
+    sha256 = sha256_de_nombre(archivo.name)
+    if not sha256:
+        return
+    _sumar_referencia(sha256, archivo.name, archivo.storage.size(archivo.name))
+
+
+def liberar_referencia(archivo):
+    from .models import ContenidoArchivo
+
+    sha256 = sha256_de_nombre(archivo.name)
+    if not sha256:
+        return
+
+    with transaction.atomic():
+        contenido = ContenidoArchivo.objects.select_for_update().filter(sha256=sha256).first()
+        if contenido is None or contenido.referencias == 0:
+            return
+        contenido.referencias -= 1
+        # En cero la fila se queda: es el candado del borrado
+        contenido.save(update_fields=['referencias'])
+    if contenido.referencias == 0:
+        transaction.on_commit(lambda: borrar_sin_referencias(archivo.storage, sha256))
+
+
+def borrar_sin_referencias(storage, sha256):
+    """Borra el archivo (y su derivado) si ningún estudio volvió a usarlo."""
+    from .derivatives import eliminar_derivado
+    from .models import ContenidoArchivo
+
+    with transaction.atomic():
+        contenido = ContenidoArchivo.objects.select_for_update().filter(sha256=sha256, referencias=0).first()
+        if contenido is None:
+            return
+        storage.delete(contenido.nombre)
+        eliminar_derivado(storage, contenido.nombre)
+        contenido.delete()
@@ -0,0 +1,96 @@
+"""
+Ejecución de tareas en segundo plano.
+
+Las vistas encolan trabajo pesado (OCR) aquí para responder de
+inmediato. El estado de cada tarea vive en la base de datos, así que si el
+proceso se reinicia las tareas pendientes se pueden retomar con los comandos
+de administración correspondientes.
+"""
+import logging
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+
+logger = logging.getLogger(__name__)
+
+_lock = threading.Lock()
+_hilos = None
+_procesos = None
+
+
+def _ejecutor_hilos():
+    # Los PDFs no pasan por aquí: los genera su propio worker (ver exports.py)
+    global _hilos
+    with _lock:
+        if _hilos is None:
+            _hilos = ThreadPoolExecutor(
+                max_workers=getattr(settings, 'TAREAS_HILOS', 2),
+                thread_name_prefix='tareas',
+            )
+        return _hilos
+
+
+def pool_procesos():
+    """
+    Pool de procesos para el trabajo que consume CPU (OCR).
+    Se crea la primera vez que se usa, una vez por proceso de gunicorn.
+    """
+    global _procesos
+    with _lock:
+        if _procesos is None:
+            _procesos = ProcessPoolExecutor(
+                max_workers=getattr(settings, 'OCR_PROCESOS', 2),
+                mp_context=multiprocessing.get_context('spawn'),
+            )
+        return _procesos
+
+
+def descartar_pool_procesos(terminar=False):
+    """
+    Descarta el pool si un proceso murió; el siguiente uso crea uno nuevo.
+    Con `terminar` también mata sus procesos (una página que no termina
+    seguiría ocupando uno); las tareas que tenían páginas en curso fallan
+    y se reintentan.
+    """
+    global _procesos
+    with _lock:
+        if _procesos is not None:
+            procesos = list((_procesos._processes or {}).values()) if terminar else []
+            _procesos.shutdown(wait=False, cancel_futures=True)
+            for proceso in procesos:
+                proceso.terminate()
+            _procesos = None
+
+
+def _ejecutar(funcion, *args):
+    close_old_connections()
+    try:
+        funcion(*args)
+    except Exception:
+        logger.exception("Error en la tarea %s%s", funcion.__name__, args)
+    finally:
+        close_old_connections()
+
+
+def encolar(funcion, *args):
+    """
+    Programa `funcion(*args)` en el pool de hilos cuando la transacción
+    actual se confirme, para que la tarea vea los datos ya guardados.
+    """
+    transaction.on_commit(lambda: _ejecutor_hilos().submit(_ejecutar, funcion, *args))
+
+
+def encolar_despues(segundos, funcion, *args):
+    """
+    Como `encolar`, pero la tarea entra a la cola después de `segundos`. La
+    espera corre en un temporizador, no en un hilo de la cola.
+    """
+    def programar():
+        temporizador = threading.Timer(segundos, lambda: _ejecutor_hilos().submit(_ejecutar, funcion, *args))
+        temporizador.daemon = True
+        temporizador.start()
+
+    transaction.on_commit(programar)
@@ -1,3 +1,1026 @@
-from django.test import TestCase
+import base64
+import json
+import shutil
+import tempfile
+from datetime import date, datetime, time, timedelta
+from decimal import Decimal
+from io import BytesIO, StringIO
+from types import SimpleNamespace
+from unittest import mock
+from uuid import uuid4
 
-# Create your tests here.
+from asgiref.sync import async_to_sync, sync_to_async
+from django.conf import settings
+from django.contrib.sessions.models import Session
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import FileSystemStorage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import IntegrityError, connection
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from PIL import Image as PILImage
+from PyPDF2 import PdfReader
+from reportlab.pdfgen import canvas
+from rest_framework.authtoken.models import Token
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+
+from . import ocr, typeahead
+from .autenticacion import _clave
+from .busqueda import buscar_pacientes
+from .derivatives import generar_derivado
+from .disponibilidad import MAX_CITAS_POR_DIA, HorarioOcupado, buscar_espacios, reservar_cita
+from .expedientes import CONSECUTIVO, formato_numero, importar_pacientes
+from .exports import encolar_exportacion, tomar_exportacion
+from .extraction import MAX_INTENTOS, procesar_estudio
+from .forms import CitaForm
+from .models import (
+    CapturaSignos, Cita, Consecutivo, ContenidoArchivo, CustomUser, Doctor, Estudio, ExportacionPDF,
+    Paciente, Receta, SignosVitales,
+)
+from .paginacion import crear_cursor, paginar
+from .pdfs import render_historial, unir_pdfs
+from .serializers import CitaSerializer
+from .services import HistorialPorLotes
+from .sesiones import CLAVE_RENOVADA
+from .storage import sha256_de_nombre
+from .views import ORDEN_CITAS
+
+
+def crear_doctor(n=1):
+    user = CustomUser.objects.create_user(
+        username=f'doctor{n}', password='clave-de-prueba', email=f'doctor{n}@example.com',
+        nombre='Doctor', apellido_paterno=str(n), role='doctor',
+    )
+    return Doctor.objects.create(user=user, especialidad='General')
+
+
+def crear_paciente(n=1):
+    return Paciente.objects.create(
+        nombre='Paciente', apellido_paterno=str(n),
+        fecha_nacimiento=date(1990, 1, 1), telefono=f'{5500000000 + n}',
+    )
+
+
+class MediaTemporal:
+    """Mezcla para pruebas que guardan archivos: MEDIA_ROOT en un directorio temporal."""
+
+    def setUp(self):
+        super().setUp()
+        media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media, ignore_errors=True)
+        configuracion = override_settings(MEDIA_ROOT=media)
+        configuracion.enable()
+        self.addCleanup(configuracion.disable)
+
+    def crear_estudio(self, paciente, contenido=b'%PDF-1.4 estudio', nombre='estudio.pdf'):
+        return Estudio.objects.create(paciente=paciente, archivo=SimpleUploadedFile(nombre, contenido))
+
+
+
+# ---------------------------
+# Índices de las consultas frecuentes
+# ---------------------------
+class IndicesTests(TestCase):
+
+    def test_consultas_frecuentes_usan_su_indice(self):
+        # verificar_indices carga datos, revisa cada plan con EXPLAIN y falla
+        # (CommandError) si una consulta deja de usar su índice
+        salida = StringIO()
+        call_command('verificar_indices', citas=5000, stdout=salida)
+        self.assertNotIn('FALLA', salida.getvalue())
+
+
+# ---------------------------
+# Extracción de texto de estudios
+# ---------------------------
+@mock.patch('citas.extraction.tasks.encolar_despues')
+class ExtraccionTests(MediaTemporal, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.estudio = self.crear_estudio(crear_paciente())
+
+    def recargar(self):
+        self.estudio.refresh_from_db()
+        return self.estudio.estado_extraccion, self.estudio.intentos_extraccion
+
+    def test_completa_al_primer_intento(self, encolar_despues):
+        with mock.patch('citas.extraction.extraer_texto', return_value='Hemoglobina 14'):
+            procesar_estudio(self.estudio.id)
+        self.assertEqual(self.recargar(), ('Completado', 1))
+        self.assertEqual(self.estudio.texto_extraido, 'Hemoglobina 14')
+        encolar_despues.assert_not_called()
+
+    def test_un_fallo_se_reencola_con_espera_sin_dormir(self, encolar_despues):
+        with mock.patch('citas.extraction.extraer_texto', side_effect=RuntimeError('tesseract')), \
+                mock.patch('time.sleep') as dormir, self.assertLogs('citas.extraction', 'ERROR'):
+            procesar_estudio(self.estudio.id)
+        self.assertEqual(self.recargar(), ('Pendiente', 1))
+        encolar_despues.assert_called_once_with(2, procesar_estudio, self.estudio.id)
+        dormir.assert_not_called()
+
+    def test_queda_en_error_tras_max_intentos(self, encolar_despues):
+        with mock.patch('citas.extraction.extraer_texto', side_effect=RuntimeError('tesseract')), \
+                self.assertLogs('citas.extraction', 'ERROR'):
+            for _ in range(MAX_INTENTOS + 1):
+                procesar_estudio(self.estudio.id)
+        self.assertEqual(self.recargar(), ('Error', MAX_INTENTOS))
+        self.assertEqual(encolar_despues.call_count, MAX_INTENTOS - 1)
+
+
+class EstadoEstudioTests(MediaTemporal, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.doctor = crear_doctor(1)
+        paciente = crear_paciente()
+        Cita.objects.create(paciente=paciente, doctor=self.doctor, fecha=timezone.localdate(), hora=time(9, 30))
+        self.estudio = self.crear_estudio(paciente)
+        self.url = reverse('estado_estudio', args=[self.estudio.id])
+
+    def test_el_doctor_del_paciente_ve_el_estado(self):
+        self.client.force_login(self.doctor.user)
+        self.assertEqual(self.client.get(self.url).json()['estado'], 'Pendiente')
+
+    def test_otros_usuarios_no_lo_ven(self):
+        enfermera = CustomUser.objects.create_user(
+            username='enfermera', password='clave-de-prueba', email='enfermera@example.com',
+            nombre='Enfermera', apellido_paterno='1', role='enfermera',
+        )
+        for user, codigo in [(crear_doctor(2).user, 404), (enfermera, 302)]:
+            with self.subTest(role=user.role):
+                self.client.force_login(user)
+                self.assertEqual(self.client.get(self.url).status_code, codigo)
+
+
+# ---------------------------
+# Texto por página
+# ---------------------------
+class PaginasPdfTests(TestCase):
+
+    def test_un_estudio_se_lee_una_vez_por_proceso(self):
+        with tempfile.NamedTemporaryFile(suffix='.pdf') as archivo:
+            lienzo = canvas.Canvas(archivo.name)
+            for n in range(5):
+                lienzo.drawString(100, 700, f"Pagina {n}")
+                lienzo.showPage()
+            lienzo.save()
+
+            ocr._leer_pdf.cache_clear()
+            textos = [ocr.extraer_pagina(archivo.name, n) for n in range(5)]
+        self.assertEqual(textos, [f"Pagina {n}" for n in range(5)])
+        self.assertEqual(ocr._leer_pdf.cache_info().misses, 1)
+
+
+# ---------------------------
+# Archivos por contenido
+# ---------------------------
+class AlmacenamientoTests(MediaTemporal, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.paciente = crear_paciente()
+
+    def referencias(self, estudio):
+        contenido = ContenidoArchivo.objects.filter(sha256=sha256_de_nombre(estudio.archivo.name)).first()
+        return contenido.referencias if contenido else None
+
+    def test_mismo_contenido_un_archivo(self):
+        uno = self.crear_estudio(self.paciente, nombre='a.pdf')
+        dos = self.crear_estudio(self.paciente, nombre='b.pdf')
+        self.assertEqual(uno.archivo.name, dos.archivo.name)
+        self.assertEqual(self.referencias(uno), 2)
+
+    def test_el_archivo_se_borra_con_su_ultima_referencia(self):
+        uno = self.crear_estudio(self.paciente)
+        dos = self.crear_estudio(self.paciente)
+        nombre, storage = uno.archivo.name, uno.archivo.storage
+        with self.captureOnCommitCallbacks(execute=True):
+            uno.delete()
+        self.assertTrue(storage.exists(nombre))
+        with self.captureOnCommitCallbacks(execute=True):
+            dos.delete()
+        self.assertFalse(storage.exists(nombre))
+        self.assertFalse(ContenidoArchivo.objects.exists())
+
+    def test_una_subida_durante_el_borrado_conserva_el_archivo(self):
+        uno = self.crear_estudio(self.paciente)
+        nombre, storage = uno.archivo.name, uno.archivo.storage
+        with self.captureOnCommitCallbacks() as pendientes:
+            uno.delete()
+        # El mismo contenido se sube antes de que corra el borrado
+        dos = self.crear_estudio(self.paciente)
+        for callback in pendientes:
+            callback()
+        self.assertTrue(storage.exists(nombre))
+        self.assertEqual(self.referencias(dos), 1)
+
+    def test_un_archivo_que_ya_existe_no_recibe_sufijo(self):
+        uno = self.crear_estudio(self.paciente)
+        # Como si otra subida lo hubiera escrito sin llegar a contarlo
+        ContenidoArchivo.objects.all().delete()
+        dos = self.crear_estudio(self.paciente)
+        self.assertEqual(dos.archivo.name, uno.archivo.name)
+        self.assertEqual(self.referencias(dos), 1)
+
+    def test_reemplazar_el_archivo_mueve_la_referencia(self):
+        estudio = self.crear_estudio(self.paciente)
+        anterior = estudio.archivo.name
+        estudio.archivo = SimpleUploadedFile('nuevo.pdf', b'%PDF-1.4 otro estudio')
+        with self.captureOnCommitCallbacks(execute=True):
+            estudio.save()
+        self.assertEqual(self.referencias(estudio), 1)
+        self.assertFalse(estudio.archivo.storage.exists(anterior))
+
+
+# ---------------------------
+# Derivados de imágenes
+# ---------------------------
+class DerivadosTests(MediaTemporal, TestCase):
+
+    def guardar_imagen(self, nombre, color, formato):
+        contenido = BytesIO()
+        PILImage.new('RGB', (1200, 900), color).save(contenido, formato)
+        storage = FileSystemStorage()
+        return SimpleNamespace(storage=storage, name=storage.save(nombre, ContentFile(contenido.getvalue())))
+
+    def test_jpg_y_png_con_el_mismo_nombre_tienen_su_propio_derivado(self):
+        jpg = self.guardar_imagen('estudios/x.jpg', 'red', 'JPEG')
+        png = self.guardar_imagen('estudios/x.png', 'blue', 'PNG')
+        rojo, azul = (PILImage.open(generar_derivado(archivo)).getpixel((0, 0)) for archivo in (jpg, png))
+        self.assertGreater(rojo[0], 200)
+        self.assertGreater(azul[2], 200)
+
+
+# ---------------------------
+# PDFs por lotes
+# ---------------------------
+class PdfPorLotesTests(TestCase):
+
+    def setUp(self):
+        self.paciente = crear_paciente()
+        doctor = crear_doctor()
+        for dia in range(1, 8):
+            Cita.objects.create(
+                paciente=self.paciente, doctor=doctor, fecha=date(2024, 1, dia),
+                hora=time(10, 0), estado='Atendida', diagnostico=f"Diagnostico {dia}",
+            )
+
+    def test_el_historial_por_lotes_une_todas_las_citas(self):
+        destino = BytesIO()
+        with mock.patch('citas.pdfs.PARTES_POR_LOTE', 3):
+            render_historial(destino, self.paciente, HistorialPorLotes(self.paciente, por_lote=2))
+
+        destino.seek(0)
+        lector = PdfReader(destino)
+        texto = "".join(pagina.extract_text() for pagina in lector.pages)
+        # 8 partes (encabezado y 7 citas) en lotes de 3: tres PDFs unidos
+        self.assertGreaterEqual(len(lector.pages), 3)
+        self.assertIn("7 consulta(s)", texto)
+        self.assertEqual([dia for dia in range(1, 8) if f"Diagnostico {dia}" in texto], list(range(1, 8)))
+        self.assertLess(texto.index("Diagnostico 7"), texto.index("Diagnostico 1"))
+
+    def test_unir_pdfs_conserva_el_orden_de_las_paginas(self):
+        archivos = []
+        for n in range(3):
+            archivo = BytesIO()
+            lienzo = canvas.Canvas(archivo)
+            for pagina in range(2):
+                lienzo.drawString(100, 700, f"Archivo {n} pagina {pagina}")
+                lienzo.showPage()
+            lienzo.save()
+            archivos.append(archivo)
+
+        destino = BytesIO()
+        unir_pdfs(destino, archivos)
+        destino.seek(0)
+        textos = [pagina.extract_text().strip() for pagina in PdfReader(destino).pages]
+        self.assertEqual(textos, [f"Archivo {n} pagina {p}" for n in range(3) for p in range(2)])
+
+
+# ---------------------------
+# Exportaciones PDF
+# ---------------------------
+class ExportacionesTests(TestCase):
+
+    def setUp(self):
+        self.usuario = crear_doctor().user
+        self.paciente = crear_paciente()
+
+    def encolar(self):
+        return encolar_exportacion(self.usuario, 'historial', 'historial.pdf', paciente_id=self.paciente.id)
+
+    def abandonar(self, exportacion):
+        ExportacionPDF.objects.filter(id=exportacion.id).update(
+            tomada_en=timezone.now() - timedelta(seconds=settings.EXPORTACION_TIMEOUT + 1),
+        )
+
+    def test_una_exportacion_se_toma_una_sola_vez(self):
+        exportacion = self.encolar()
+        tomada = tomar_exportacion()
+        self.assertEqual((tomada.id, tomada.estado, tomada.intentos), (exportacion.id, 'Procesando', 1))
+        self.assertIsNone(tomar_exportacion())
+
+    def test_una_abandonada_se_retoma_hasta_el_limite(self):
+        exportacion = self.encolar()
+        for intento in range(1, settings.EXPORTACION_INTENTOS + 1):
+            self.assertEqual(tomar_exportacion().intentos, intento)
+            self.abandonar(exportacion)
+
+        self.assertIsNone(tomar_exportacion())
+        exportacion.refresh_from_db()
+        self.assertEqual(exportacion.estado, 'Error')
+
+    def test_pedir_el_mismo_documento_no_encola_otro(self):
+        primera = self.encolar()
+        self.assertEqual(self.encolar().id, primera.id)
+        self.assertEqual(ExportacionPDF.objects.count(), 1)
+
+    def test_un_cambio_en_los_datos_encola_otra(self):
+        primera = self.encolar()
+        with self.captureOnCommitCallbacks(execute=True):
+            Cita.objects.create(
+                paciente=self.paciente, doctor=self.usuario.doctor, fecha=date(2024, 1, 1), hora=time(10, 0),
+            )
+        self.assertNotEqual(self.encolar().id, primera.id)
+
+    def test_una_vencida_no_se_reutiliza(self):
+        primera = self.encolar()
+        ExportacionPDF.objects.filter(id=primera.id).update(
+            estado='Completado', expira_en=timezone.now() - timedelta(seconds=1),
+        )
+        self.assertNotEqual(self.encolar().id, primera.id)
+
+
+# ---------------------------
+# Eventos de la agenda
+# ---------------------------
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+@mock.patch('citas.views.EVENTOS_REVISAR_SEGUNDOS', 0.01)
+class EventosCitasTests(TestCase):
+
+    def setUp(self):
+        self.doctor = crear_doctor()
+        self.paciente = crear_paciente()
+
+    async def conectar(self, **extra):
+        await self.async_client.aforce_login(self.doctor.user)
+        respuesta = await self.async_client.get(reverse('eventos_citas'), **extra)
+        self.assertEqual(respuesta['Content-Type'], 'text/event-stream')
+        return respuesta.streaming_content
+
+    async def siguiente_agenda(self, eventos):
+        async for evento in eventos:
+            evento = evento.decode() if isinstance(evento, bytes) else evento
+            if evento.startswith('event: agenda'):
+                return evento.split('id: ')[1].split('\n')[0]
+
+    def test_el_id_del_evento_es_el_etag_de_la_tabla(self):
+        self.client.force_login(self.doctor.user)
+        etag = self.client.get(reverse('actualizar_citas'))['ETag']
+
+        async def primero():
+            eventos = await self.conectar()
+            version = await self.siguiente_agenda(eventos)
+            await eventos.aclose()
+            return version
+
+        self.assertEqual(async_to_sync(primero)(), etag)
+
+    def test_sin_cambios_no_hay_eventos_ni_consultas(self):
+        self.client.force_login(self.doctor.user)
+        etag = self.client.get(reverse('actualizar_citas'))['ETag']
+
+        async def leer(eventos):
+            return [evento async for evento in eventos]
+
+        # La sesión y el usuario se consultan al conectarse; después, nada
+        eventos = async_to_sync(self.conectar)(headers={'Last-Event-ID': etag})
+        with CaptureQueriesContext(connection) as consultas:
+            with mock.patch('citas.views.EVENTOS_DURACION_SEGUNDOS', 0.1):
+                recibidos = async_to_sync(leer)(eventos)
+        self.assertFalse([e for e in recibidos if b'event: agenda' in e])
+        self.assertEqual(len(consultas), 0)
+
+    def test_un_cambio_en_la_agenda_manda_un_evento(self):
+        async def escuchar():
+            eventos = await self.conectar()
+            antes = await self.siguiente_agenda(eventos)
+            await sync_to_async(self.crear_cita)()
+            despues = await self.siguiente_agenda(eventos)
+            await eventos.aclose()
+            return antes, despues
+
+        antes, despues = async_to_sync(escuchar)()
+        self.assertNotEqual(antes, despues)
+
+    def crear_cita(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            Cita.objects.create(paciente=self.paciente, doctor=self.doctor, fecha=date.today(), hora=time(10, 0))
+
+
+# ---------------------------
+# Respuestas condicionales (ETag)
+# ---------------------------
+class RespuestasCondicionalesTests(TestCase):
+
+    def setUp(self):
+        self.doctor = crear_doctor()
+        self.paciente = crear_paciente()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.cita = Cita.objects.create(
+                paciente=self.paciente, doctor=self.doctor, fecha=date.today(), hora=time(10, 0), estado='Atendida',
+            )
+            Receta.objects.create(cita=self.cita, doctor=self.doctor, medicamentos='Paracetamol 500 mg')
+        self.client.force_login(self.doctor.user)
+
+    def test_la_tabla_sin_cambios_responde_304(self):
+        url = reverse('actualizar_citas')
+        etag = self.client.get(url)['ETag']
+        with CaptureQueriesContext(connection) as consultas:
+            self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        self.assertFalse([c for c in consultas if 'citas_cita' in c['sql']])
+
+    def test_la_tabla_se_lee_en_una_consulta(self):
+        for hora in (11, 12, 13):
+            Cita.objects.create(paciente=self.paciente, doctor=self.doctor, fecha=date.today(), hora=time(hora, 0))
+        with CaptureQueriesContext(connection) as consultas:
+            respuesta = self.client.get(reverse('actualizar_citas'))
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertEqual(len([c for c in consultas if 'FROM "citas_cita"' in c['sql']]), 1)
+
+    def test_un_cambio_en_la_agenda_cambia_el_etag(self):
+        url = reverse('actualizar_citas')
+        etag = self.client.get(url)['ETag']
+        with self.captureOnCommitCallbacks(execute=True):
+            SignosVitales.objects.create(cita=self.cita, peso=70)
+        respuesta = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertNotEqual(respuesta['ETag'], etag)
+
+    def test_la_receta_sin_cambios_responde_304(self):
+        url = reverse('generar_receta_pdf', args=[self.cita.id])
+        primera = self.client.get(url)
+        self.assertEqual(primera['Content-Type'], 'application/pdf')
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=primera['ETag']).status_code, 304)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            receta = Receta.objects.get(cita=self.cita)
+            receta.medicamentos = 'Ibuprofeno 400 mg'
+            receta.save()
+        segunda = self.client.get(url, HTTP_IF_NONE_MATCH=primera['ETag'])
+        self.assertEqual(segunda.status_code, 200)
+        self.assertNotEqual(segunda['ETag'], primera['ETag'])
+
+
+# ---------------------------
+# Reservas y búsqueda de espacios
+# ---------------------------
+class ReservaTests(TestCase):
+
+    def setUp(self):
+        self.doctor = crear_doctor()
+        self.paciente = crear_paciente()
+        self.fecha = timezone.localdate() + timedelta(days=1)
+
+    def reservar(self, hora, **extra):
+        cita = Cita(paciente=self.paciente, doctor=self.doctor, fecha=self.fecha, hora=hora, **extra)
+        return reservar_cita(cita)
+
+    def test_rechaza_hora_a_menos_del_intervalo(self):
+        self.reservar(time(9, 30))
+        with self.assertRaises(HorarioOcupado):
+            self.reservar(time(9, 40))
+        self.reservar(time(9, 45))
+        self.assertEqual(Cita.objects.count(), 2)
+
+    def test_cita_cancelada_no_ocupa_su_hora(self):
+        self.reservar(time(9, 30), estado='Cancelada')
+        self.reservar(time(9, 30))
+        self.assertEqual(Cita.objects.count(), 2)
+
+    def test_el_formulario_acepta_la_hora_de_una_cancelada(self):
+        # Antes cualquier cita del día ocupaba su hora, también las canceladas
+        self.reservar(time(9, 30), estado='Cancelada')
+        datos = {'fecha': self.fecha, 'hora': '09:30', 'doctor_user': self.doctor.pk}
+        self.assertTrue(CitaForm(datos, paciente=self.paciente).is_valid())
+
+        self.reservar(time(9, 30))
+        formulario = CitaForm(datos, paciente=self.paciente)
+        self.assertFalse(formulario.is_valid())
+        self.assertIn("09:30", formulario.non_field_errors()[0])
+
+    def test_modificar_una_cita_no_choca_consigo_misma(self):
+        cita = self.reservar(time(9, 30))
+        cita.hora = time(9, 35)
+        reservar_cita(cita)
+        self.assertEqual(Cita.objects.get().hora, time(9, 35))
+
+    def test_rechaza_dia_lleno(self):
+        Cita.objects.bulk_create(
+            Cita(paciente=self.paciente, doctor=self.doctor, fecha=self.fecha, hora=time(9, 30 + i))
+            for i in range(MAX_CITAS_POR_DIA)
+        )
+        with self.assertRaises(HorarioOcupado):
+            self.reservar(time(15, 0))
+
+
+class BuscarEspaciosTests(TestCase):
+
+    def setUp(self):
+        self.doctores = [crear_doctor(1), crear_doctor(2)]
+        self.fecha = timezone.localdate() + timedelta(days=1)
+
+    def test_mezcla_doctores_en_orden_cronologico(self):
+        uno, dos = self.doctores
+        Cita.objects.create(paciente=crear_paciente(), doctor=uno, fecha=self.fecha, hora=time(9, 30))
+        espacios = buscar_espacios(self.fecha, self.fecha, limite=3)
+        self.assertEqual(espacios, [
+            (self.fecha, time(9, 30), dos.pk),
+            (self.fecha, time(9, 45), uno.pk),
+            (self.fecha, time(9, 45), dos.pk),
+        ])
+
+    def test_hoy_solo_cuentan_las_horas_posteriores(self):
+        hoy = self.fecha - timedelta(days=1)
+        ahora = timezone.make_aware(datetime.combine(hoy, time(12, 5)))
+        espacios = buscar_espacios(hoy, hoy, doctores=[self.doctores[0].pk], limite=1, ahora=ahora)
+        self.assertEqual(espacios, [(hoy, time(12, 15), self.doctores[0].pk)])
+
+    def test_no_busca_en_el_pasado(self):
+        ayer = timezone.localdate() - timedelta(days=1)
+        self.assertEqual(buscar_espacios(ayer, ayer), [])
+
+
+# ---------------------------
+# Números de expediente
+# ---------------------------
+class ExpedientesTests(TestCase):
+
+    def siguiente(self):
+        return formato_numero(Consecutivo.objects.get(nombre=CONSECUTIVO).ultimo + 1)
+
+    def test_numeros_consecutivos_sin_consultar_pacientes(self):
+        primero = crear_paciente(1)
+        with CaptureQueriesContext(connection) as consultas:
+            segundo = crear_paciente(2)
+        self.assertEqual(int(segundo.numero[1:]), int(primero.numero[1:]) + 1)
+        self.assertFalse([c for c in consultas if c['sql'].startswith('SELECT') and 'citas_paciente' in c['sql']])
+
+    def test_un_numero_ya_usado_se_salta(self):
+        # Como después de un loaddata: el contador quedó atrás
+        ocupado = self.siguiente()
+        Paciente.objects.bulk_create([Paciente(
+            nombre='Cargado', apellido_paterno='Respaldo', fecha_nacimiento=date(1990, 1, 1),
+            telefono='5599999999', numero=ocupado,
+        )])
+        paciente = crear_paciente()
+        self.assertNotEqual(paciente.numero, ocupado)
+        self.assertEqual(Paciente.objects.filter(numero=paciente.numero).count(), 1)
+        self.assertIn(paciente.numero.lower(), Paciente.objects.get(pk=paciente.pk).busqueda)
+
+    def test_otro_error_de_integridad_no_se_reintenta(self):
+        crear_paciente(1)
+        ultimo = Consecutivo.objects.get(nombre=CONSECUTIVO).ultimo
+        with self.assertRaises(IntegrityError):
+            crear_paciente(1)  # mismo teléfono
+        self.assertEqual(Consecutivo.objects.get(nombre=CONSECUTIVO).ultimo, ultimo + 1)
+
+    def test_importar_salta_numeros_usados(self):
+        ocupado = self.siguiente()
+        Paciente.objects.bulk_create([Paciente(
+            nombre='Cargado', apellido_paterno='Respaldo', fecha_nacimiento=date(1990, 1, 1),
+            telefono='5599999999', numero=ocupado,
+        )])
+        nuevos = [
+            Paciente(nombre='Importado', apellido_paterno=str(n), fecha_nacimiento=date(1990, 1, 1),
+                     telefono=f'{5500000000 + n}')
+            for n in range(3)
+        ]
+        with self.captureOnCommitCallbacks(execute=True):
+            importar_pacientes(nuevos)
+        numeros = list(Paciente.objects.filter(nombre='Importado').values_list('numero', flat=True))
+        self.assertEqual(len(set(numeros)), 3)
+        self.assertNotIn(ocupado, numeros)
+
+
+# ---------------------------
+# Búsqueda de pacientes
+# ---------------------------
+class BusquedaPacientesTests(TestCase):
+
+    def setUp(self):
+        self.pena = Paciente.objects.create(
+            nombre='José', apellido_paterno='Peña', apellido_materno='Ávila',
+            fecha_nacimiento=date(1990, 1, 1), telefono='5511111111',
+        )
+        self.penaloza = Paciente.objects.create(
+            nombre='Ana', apellido_paterno='Peñaloza',
+            fecha_nacimiento=date(1990, 1, 1), telefono='5522222222',
+        )
+
+    def ids(self, texto):
+        return list(buscar_pacientes(texto).values_list('id', flat=True))
+
+    def test_sin_acentos_ni_mayusculas(self):
+        self.assertEqual(self.ids('jose PENA avila'), [self.pena.id])
+        self.assertEqual(self.ids('Peña Ávila'), [self.pena.id])
+
+    def test_la_palabra_completa_va_primero(self):
+        self.assertEqual(self.ids('pena'), [self.pena.id, self.penaloza.id])
+
+    def test_por_id_o_expediente(self):
+        numero = int(self.penaloza.numero[1:])
+        self.assertIn(self.penaloza.id, self.ids(f'P{numero}'))
+        self.assertIn(self.penaloza.id, self.ids(self.penaloza.numero))
+        self.assertEqual(self.ids(str(self.pena.id))[0], self.pena.id)
+
+    def test_guardado_parcial_actualiza_la_busqueda(self):
+        self.pena.nombre = 'Joaquín'
+        self.pena.save(update_fields=['nombre'])
+        self.assertEqual(self.ids('joaquin'), [self.pena.id])
+        self.assertEqual(self.ids('jose'), [])
+
+
+# ---------------------------
+# Paginación por llave
+# ---------------------------
+class PaginacionTests(TestCase):
+
+    def setUp(self):
+        for n in range(7):
+            crear_paciente(n)
+        self.orden = ('nombre', 'apellido_paterno', 'id')
+        self.todos = list(Paciente.objects.order_by(*self.orden).values_list('id', flat=True))
+
+    def ids(self, pagina):
+        return [p.id for p in pagina.objetos]
+
+    def test_recorre_hacia_adelante_y_hacia_atras(self):
+        pacientes = Paciente.objects.all()
+        vistas, pagina = [], paginar(pacientes, self.orden, 3)
+        self.assertIsNone(pagina.anterior)
+        while True:
+            vistas.append(self.ids(pagina))
+            if pagina.siguiente is None:
+                break
+            pagina = paginar(pacientes, self.orden, 3, despues=pagina.siguiente)
+        self.assertEqual(vistas, [self.todos[:3], self.todos[3:6], self.todos[6:]])
+
+        atras = paginar(pacientes, self.orden, 3, antes=pagina.anterior)
+        self.assertEqual(self.ids(atras), self.todos[3:6])
+        self.assertEqual(self.ids(paginar(pacientes, self.orden, 3, antes=atras.anterior)), self.todos[:3])
+
+    def test_un_cursor_invalido_da_la_primera_pagina(self):
+        pagina = paginar(Paciente.objects.all(), self.orden, 3, despues='@@')
+        self.assertEqual(self.ids(pagina), self.todos[:3])
+
+    @mock.patch('citas.views.PACIENTES_POR_PAGINA', 3)
+    def test_la_busqueda_no_hace_una_consulta_por_paciente(self):
+        doctor = crear_doctor()
+        for paciente in Paciente.objects.all():
+            Cita.objects.create(paciente=paciente, doctor=doctor, fecha=date(2024, 1, 1), hora=time(10, 0))
+        self.client.force_login(doctor.user)
+
+        url = reverse('buscar_pacientes_doctor')
+        self.client.get(url)  # sesión y usuario ya en caché para las dos mediciones
+        with CaptureQueriesContext(connection) as primera:
+            respuesta = self.client.get(url, {'q': 'paciente'})
+        self.assertEqual(len(respuesta.context['pacientes']), 3)
+        self.assertTrue(all(p.ultima_cita_id for p in respuesta.context['pacientes']))
+
+        with mock.patch('citas.views.PACIENTES_POR_PAGINA', 6):
+            with CaptureQueriesContext(connection) as doble:
+                self.client.get(url, {'q': 'paciente'})
+        self.assertEqual(len(doble), len(primera))
+
+
+# ---------------------------
+# Autocompletado de pacientes
+# ---------------------------
+class AutocompletadoTests(TestCase):
+    """Un índice construido aparte hace de otro proceso: solo se entera por el token."""
+
+    def setUp(self):
+        self.paciente = crear_paciente(1)
+        self.otro = typeahead.IndicePrefijos()
+        self.otro.construir()
+
+    def encontrados(self, texto):
+        return [r['id'] for r in self.otro.buscar(texto)]
+
+    def test_busca_por_prefijo_sin_acentos(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            pena = Paciente.objects.create(
+                nombre='Ñandú', apellido_paterno='Peña', fecha_nacimiento=date(1990, 1, 1), telefono='5588888888',
+            )
+        self.assertEqual(self.encontrados('pen nan'), [pena.id])
+        self.assertEqual(self.encontrados('55888'), [pena.id])
+
+    def test_otro_proceso_ve_cambios_y_borrados(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.paciente.apellido_paterno = 'Zamudio'
+            self.paciente.save()
+        self.assertEqual(self.encontrados('zamu'), [self.paciente.id])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.paciente.delete()
+        self.assertEqual(self.encontrados('zamu'), [])
+
+    def test_una_importacion_se_ve_al_confirmarse(self):
+        nuevos = [Paciente(nombre='Importado', apellido_paterno='Lote', fecha_nacimiento=date(1990, 1, 1),
+                           telefono='5577777777')]
+        with self.captureOnCommitCallbacks() as pendientes:
+            importar_pacientes(nuevos)
+            # Antes de confirmarse el token no cambia: nadie relee
+            self.assertEqual(self.encontrados('importado'), [])
+        for callback in pendientes:
+            callback()
+        self.assertEqual(self.encontrados('importado'), [nuevos[0].id])
+
+    def test_precargar_construye_en_segundo_plano(self):
+        indice = typeahead.IndicePrefijos()
+        with mock.patch('citas.typeahead.encolar', side_effect=lambda funcion: funcion()):
+            indice.precargar()
+        self.assertIsNotNone(indice.construido_en)
+        self.assertEqual([r['id'] for r in indice.buscar('paciente')], [self.paciente.id])
+
+
+# ---------------------------
+# API de citas
+# ---------------------------
+class ApiCitasTests(TestCase):
+
+    def setUp(self):
+        self.doctor = crear_doctor()
+        paciente = crear_paciente()
+        manana = timezone.localdate() + timedelta(days=1)
+        self.citas = [
+            Cita.objects.create(paciente=paciente, doctor=self.doctor, fecha=manana, hora=time(9, 30 + i))
+            for i in range(5)
+        ]
+        SignosVitales.objects.create(
+            cita=self.citas[0], peso=Decimal('70.50'), temperatura=Decimal('36.6'), frecuencia_cardiaca=72,
+        )
+        self.cliente = APIClient()
+        self.cliente.force_authenticate(self.doctor.user)
+
+    def test_responde_lo_mismo_que_cita_serializer(self):
+        citas = Cita.objects.order_by(*ORDEN_CITAS)
+        esperado = json.loads(JSONRenderer().render(CitaSerializer(citas, many=True).data))
+        respuesta = self.cliente.get('/api/citas/')
+        self.assertEqual(respuesta.json(), esperado)
+
+    def test_sin_limite_ni_cursor_responde_todas(self):
+        respuesta = self.cliente.get('/api/citas/')
+        self.assertEqual(len(respuesta.json()), len(self.citas))
+        self.assertFalse(respuesta.has_header('Link'))
+
+    def test_paginas_con_limite(self):
+        vistos = []
+        respuesta = self.cliente.get('/api/citas/', {'limite': 2})
+        while True:
+            vistos += [cita['id'] for cita in respuesta.json()]
+            if not respuesta.has_header('Link'):
+                break
+            siguiente = respuesta['Link'].split('>')[0].lstrip('<')
+            respuesta = self.cliente.get(siguiente)
+        self.assertEqual(vistos, [cita.pk for cita in self.citas])
+
+    def test_cursor_invalido_responde_400(self):
+        for cursor in ['@@', crear_cursor(['x', 'y', 1]), crear_cursor([None, None, None])]:
+            with self.subTest(cursor=cursor):
+                respuesta = self.cliente.get('/api/citas/', {'cursor': cursor})
+                self.assertEqual(respuesta.status_code, 400)
+
+
+# ---------------------------
+# Sincronización de la app
+# ---------------------------
+def cursor_crudo(valores):
+    return base64.urlsafe_b64encode(json.dumps(valores).encode()).decode().rstrip('=')
+
+
+@override_settings(SYNC_SOLAPE=0)
+class SincronizacionTests(TestCase):
+
+    def setUp(self):
+        self.doctor = crear_doctor()
+        self.pacientes = [crear_paciente(n) for n in range(3)]
+        manana = timezone.localdate() + timedelta(days=1)
+        self.citas = [
+            Cita.objects.create(paciente=paciente, doctor=self.doctor, fecha=manana, hora=time(10, n))
+            for n, paciente in enumerate(self.pacientes)
+        ]
+        self.signos = SignosVitales.objects.create(cita=self.citas[0], frecuencia_cardiaca=80)
+        self.cliente = APIClient()
+        self.cliente.force_authenticate(self.doctor.user)
+
+    def sincronizar(self, cursor=None):
+        """Todas las páginas desde `cursor`: (ids por tabla, respuestas)."""
+        ids = {'pacientes': set(), 'citas': set(), 'signos': set()}
+        paginas = []
+        while True:
+            respuesta = self.cliente.get('/api/sync/', {'since': cursor} if cursor else {})
+            self.assertEqual(respuesta.status_code, 200)
+            pagina = respuesta.json()
+            paginas.append(pagina)
+            for tabla in ids:
+                ids[tabla] |= {fila['id'] for fila in pagina[tabla]}
+            cursor = pagina['cursor']
+            if not pagina['hay_mas']:
+                return ids, paginas
+
+    @override_settings(SYNC_POR_PAGINA=2)
+    def test_completa_por_paginas(self):
+        ids, paginas = self.sincronizar()
+        self.assertEqual(len(paginas), 4)
+        for pagina in paginas:
+            self.assertTrue(pagina['completo'])
+            self.assertLessEqual(sum(len(pagina[t]) for t in ids), 2)
+        self.assertEqual(ids, {
+            'pacientes': {p.pk for p in self.pacientes},
+            'citas': {c.pk for c in self.citas},
+            'signos': {self.signos.pk},
+        })
+
+    def test_delta_trae_solo_cambios_y_eliminaciones(self):
+        _, paginas = self.sincronizar()
+        cursor = paginas[-1]['cursor']
+
+        paciente = self.pacientes[1]
+        paciente.nombre = 'Cambiado'
+        paciente.save()
+        cita_id = self.citas[0].pk
+        self.citas[0].delete()
+
+        ids, paginas = self.sincronizar(cursor)
+        self.assertFalse(paginas[0]['completo'])
+        self.assertEqual(ids, {'pacientes': {paciente.pk}, 'citas': set(), 'signos': set()})
+        self.assertEqual(paginas[0]['eliminados'], {
+            'pacientes': [], 'citas': [cita_id], 'signos': [self.signos.pk],
+        })
+
+    def test_cursor_invalido_pide_todo(self):
+        cursores = [
+            '@@',
+            cursor_crudo(['2025-13-45T00:00']),
+            cursor_crudo(['2025-01-01T00:00']),  # sin zona horaria
+            cursor_crudo([None, '2025-01-01T00:00+00:00', 9, 0]),
+            cursor_crudo(['x', 'y', 'z', 'w']),
+        ]
+        for cursor in cursores:
+            with self.subTest(cursor=cursor):
+                respuesta = self.cliente.get('/api/sync/', {'since': cursor})
+                self.assertEqual(respuesta.status_code, 200)
+                self.assertTrue(respuesta.json()['completo'])
+
+
+# ---------------------------
+# Signos vitales en lote
+# ---------------------------
+class SignosLoteTests(TestCase):
+
+    def setUp(self):
+        self.doctor = crear_doctor()
+        paciente = crear_paciente()
+        manana = timezone.localdate() + timedelta(days=1)
+        self.citas = [
+            Cita.objects.create(paciente=paciente, doctor=self.doctor, fecha=manana, hora=time(11, n))
+            for n in range(2)
+        ]
+        self.cliente = APIClient()
+        self.cliente.force_authenticate(self.doctor.user)
+
+    def enviar(self, *registros):
+        return self.cliente.post('/api/signos/lote/', list(registros), format='json')
+
+    def captura(self, cita, **campos):
+        return {'clave': str(uuid4()), 'cita': cita.pk, **campos}
+
+    def test_crea_y_marca_atendidas(self):
+        respuesta = self.enviar(*(self.captura(cita, frecuencia_cardiaca=70) for cita in self.citas))
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertEqual([r['resultado'] for r in respuesta.json()], ['creado', 'creado'])
+        self.assertEqual(SignosVitales.objects.count(), 2)
+        self.assertEqual(set(Cita.objects.values_list('estado', flat=True)), {'Atendida'})
+
+    def test_reintento_viejo_no_pisa_una_captura_nueva(self):
+        cita = self.citas[0]
+        a = self.captura(cita, peso='70.00')
+        b = self.captura(cita, peso='71.00')
+        resultados = [self.enviar(registro).json()[0]['resultado'] for registro in (a, b, a)]
+        self.assertEqual(resultados, ['creado', 'actualizado', 'sin cambios'])
+        self.assertEqual(SignosVitales.objects.get(cita=cita).peso, Decimal('71.00'))
+        self.assertEqual(CapturaSignos.objects.filter(cita=cita).count(), 2)
+
+    def test_lote_invalido_no_guarda_nada(self):
+        lotes = [
+            [self.captura(self.citas[0], peso='70.00'), {'clave': str(uuid4()), 'cita': 0}],
+            [self.captura(self.citas[0]), self.captura(self.citas[0])],
+        ]
+        clave = str(uuid4())
+        lotes.append([{'clave': clave, 'cita': cita.pk} for cita in self.citas])
+        for lote in lotes:
+            with self.subTest(lote=lote):
+                self.assertEqual(self.enviar(*lote).status_code, 400)
+        self.assertFalse(SignosVitales.objects.exists())
+        self.assertFalse(CapturaSignos.objects.exists())
+
+
+# ---------------------------
+# Tokens de la API en caché
+# ---------------------------
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+class TokenEnCacheTests(TestCase):
+
+    def setUp(self):
+        self.user = crear_doctor().user
+        self.token = Token.objects.create(user=self.user)
+        self.cliente = APIClient()
+        self.cliente.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+
+    def pedir(self):
+        """(código de respuesta, consultas a authtoken_token)."""
+        with CaptureQueriesContext(connection) as consultas:
+            respuesta = self.cliente.get('/api/citas/', {'limite': 1})
+        return respuesta.status_code, sum('authtoken_token' in q['sql'] for q in consultas)
+
+    def test_token_visto_no_consulta_la_base(self):
+        self.assertEqual(self.pedir(), (200, 1))
+        self.assertEqual(self.pedir(), (200, 0))
+
+    def test_token_visto_no_consulta_token_ni_usuario(self):
+        self.pedir()
+        with CaptureQueriesContext(connection) as consultas:
+            self.assertEqual(self.cliente.get('/api/citas/', {'limite': 1}).status_code, 200)
+        tablas = ('authtoken_token', 'citas_customuser', 'citas_cache')
+        self.assertFalse([q['sql'] for q in consultas if any(t in q['sql'] for t in tablas)])
+
+    @override_settings(CACHES={'default': {
+        'BACKEND': 'django.core.cache.backends.db.DatabaseCache', 'LOCATION': 'citas_cache'}})
+    def test_con_cache_en_base_no_guarda_el_token(self):
+        self.assertEqual(self.pedir(), (200, 1))
+        self.assertEqual(self.pedir(), (200, 1))
+        self.assertIsNone(cache.get(_clave(self.token.key)))
+
+    def test_la_cache_solo_guarda_id_y_rol(self):
+        self.pedir()
+        self.assertEqual(cache.get(_clave(self.token.key)), (self.user.pk, 'doctor'))
+
+    def test_desactivar_al_usuario_invalida_su_token(self):
+        self.pedir()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.is_active = False
+            self.user.save()
+        self.assertEqual(self.pedir(), (401, 1))
+
+    def test_cerrar_sesion_invalida_el_token(self):
+        self.pedir()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(self.cliente.post('/api/logout/').status_code, 204)
+        self.assertEqual(self.pedir(), (401, 1))
+
+
+# ---------------------------
+# Renovación de sesiones
+# ---------------------------
+class RenovarSesionTests(TestCase):
+
+    def setUp(self):
+        self.cliente = Client()
+        self.cliente.force_login(crear_doctor().user)
+        # La sesión de force_login no está marcada: la primera solicitud la renueva
+        self.cliente.get(reverse('actualizar_citas'))
+
+    def escrituras(self):
+        """Escrituras en django_session de una consulta a actualizar_citas."""
+        with CaptureQueriesContext(connection) as consultas:
+            self.assertEqual(self.cliente.get(reverse('actualizar_citas')).status_code, 200)
+        return sum(
+            'django_session' in q['sql'] and not q['sql'].lstrip().upper().startswith('SELECT')
+            for q in consultas
+        )
+
+    def test_no_escribe_antes_del_umbral(self):
+        for _ in range(3):
+            self.assertEqual(self.escrituras(), 0)
+
+    def test_renueva_al_pasar_el_umbral(self):
+        renovada = self.cliente.session[CLAVE_RENOVADA]
+        despues = renovada + settings.SESSION_COOKIE_AGE - settings.SESSION_RENOVAR_SI_QUEDAN + 1
+        with mock.patch('citas.sesiones.time.time', return_value=despues):
+            self.assertEqual(self.escrituras(), 1)
+            self.assertEqual(self.cliente.session[CLAVE_RENOVADA], despues)
+            self.assertEqual(self.escrituras(), 0)
+
+    def test_cerrar_sesion_la_borra(self):
+        clave = self.cliente.session.session_key
+        self.cliente.get(reverse('logout'))
+        self.assertFalse(Session.objects.filter(session_key=clave).exists())
+        self.assertNotEqual(self.cliente.get(reverse('actualizar_citas')).status_code, 200)
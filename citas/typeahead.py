@@ -0,0 +1,252 @@
+"""
+Índice en memoria para autocompletar pacientes mientras se escribe.
+
+Cada proceso guarda una lista ordenada de pares (clave, paciente_id): las
+palabras del nombre y apellidos sin acentos (ver busqueda.normalizar), el
+número de expediente y el teléfono. Con `bisect` se llega en O(log n) al
+primer par que empieza con el prefijo y se recorren solo los siguientes;
+una búsqueda no toca la base de datos.
+
+El índice se construye en segundo plano (ver tasks.py) al arrancar cada
+worker de gunicorn (`precargar`, ver gunicorn.conf.py) o, si no, la primera
+vez que se busca; mientras tanto las búsquedas van a la base (busqueda.py).
+
+Las señales de Paciente actualizan el índice del proceso que guarda. Los
+demás procesos se enteran por el token ('typeahead', 'pacientes') de la
+caché compartida: si no coincide con el suyo, aplican solo lo que cambió
+desde su última lectura (`Paciente.updated_at` y los borrados de
+`Eliminacion`, como la sincronización de la app) con un margen de
+`SYNC_SOLAPE` segundos. Por si se pierde algo, el índice se reconstruye
+completo en segundo plano cada `TYPEAHEAD_MAX_EDAD` segundos.
+"""
+import threading
+import time
+import uuid
+from bisect import bisect_left, insort
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.utils import timezone
+
+from .busqueda import buscar_pacientes, normalizar
+from .tasks import encolar
+
+# Token de la versión del índice en la caché compartida
+CLAVE_VERSION = 'version:typeahead:pacientes'
+CAMPOS = ('id', 'nombre', 'apellido_paterno', 'apellido_materno', 'numero', 'telefono')
+# Nombre de los pacientes en Eliminacion (ver sincronizacion.TABLAS)
+MODELO_ELIMINACION = 'pacientes'
+
+
+def _claves(datos):
+    nombre = ' '.join(datos[c] or '' for c in ('nombre', 'apellido_paterno', 'apellido_materno'))
+    claves = set(normalizar(nombre).split())
+    claves.add(normalizar(datos['numero']))
+    claves.add(datos['telefono'] or '')
+    claves.discard('')
+    return claves
+
+
+class IndicePrefijos:
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.pares = []         # (clave, paciente_id), ordenados
+        self.pacientes = {}     # paciente_id -> datos para la respuesta
+        self.claves = {}        # paciente_id -> claves en `pares`
+        self.version = None
+        self.construido_en = None
+        self.leido_hasta = None     # hora del servidor de la última lectura
+        self.reconstruyendo = False
+        self._al_dia_lock = threading.Lock()
+
+    # --- construcción ---
+    def construir(self):
+        # El token y la hora se toman antes que los datos (ver versiones.py)
+        version = self._version_actual()
+        leido_hasta = timezone.now()
+        pares, pacientes, claves = [], {}, {}
+        from .models import Paciente
+        for fila in Paciente.objects.values_list(*CAMPOS).iterator(chunk_size=2000):
+            datos = dict(zip(CAMPOS, fila))
+            claves[datos['id']] = _claves(datos)
+            pacientes[datos['id']] = _respuesta(datos)
+            pares.extend((clave, datos['id']) for clave in claves[datos['id']])
+        pares.sort()
+        with self._lock:
+            self.pares, self.pacientes, self.claves = pares, pacientes, claves
+            self.version = version
+            self.leido_hasta = leido_hasta
+            self.construido_en = time.monotonic()
+            self.reconstruyendo = False
+
+    def ponerse_al_dia(self):
+        """Aplica los pacientes guardados o borrados desde la última lectura."""
+        from .models import Eliminacion, Paciente
+
+        # Una sola actualización a la vez; las demás búsquedas usan el índice actual
+        if not self._al_dia_lock.acquire(blocking=False):
+            return
+        try:
+            version = self._version_actual()
+            ahora = timezone.now()
+            desde = self.leido_hasta - timedelta(seconds=settings.SYNC_SOLAPE)
+            cambiados = [
+                dict(zip(CAMPOS, fila))
+                for fila in Paciente.objects.filter(updated_at__gte=desde).values_list(*CAMPOS)
+            ]
+            borrados = Eliminacion.objects.filter(
+                modelo=MODELO_ELIMINACION, eliminado_en__gte=desde,
+            ).values_list('objeto_id', flat=True)
+            for datos in cambiados:
+                self.actualizar(datos)
+            for paciente_id in borrados:
+                self.quitar(paciente_id)
+            with self._lock:
+                self.version = version
+                self.leido_hasta = ahora
+        finally:
+            self._al_dia_lock.release()
+
+    def precargar(self):
+        """Construye el índice en segundo plano si este proceso aún no lo tiene."""
+        if self.construido_en is None:
+            self._reconstruir_en_segundo_plano()
+
+    def _reconstruir_en_segundo_plano(self):
+        with self._lock:
+            if self.reconstruyendo:
+                return
+            self.reconstruyendo = True
+
+        def reconstruir():
+            try:
+                self.construir()
+            finally:
+                self.reconstruyendo = False
+
+        encolar(reconstruir)
+
+    def _version_actual(self):
+        version = cache.get(CLAVE_VERSION)
+        if version is None:
+            cache.add(CLAVE_VERSION, uuid.uuid4().hex, None)
+            version = cache.get(CLAVE_VERSION)
+        return version
+
+    def _viejo(self):
+        return time.monotonic() - self.construido_en > settings.TYPEAHEAD_MAX_EDAD
+
+    # --- cambios ---
+    def actualizar(self, datos):
+        with self._lock:
+            self._quitar(datos['id'])
+            self.claves[datos['id']] = _claves(datos)
+            self.pacientes[datos['id']] = _respuesta(datos)
+            for clave in self.claves[datos['id']]:
+                insort(self.pares, (clave, datos['id']))
+
+    def quitar(self, paciente_id):
+        with self._lock:
+            self._quitar(paciente_id)
+
+    def _quitar(self, paciente_id):
+        for clave in self.claves.pop(paciente_id, ()):
+            i = bisect_left(self.pares, (clave, paciente_id))
+            if i < len(self.pares) and self.pares[i] == (clave, paciente_id):
+                del self.pares[i]
+        self.pacientes.pop(paciente_id, None)
+
+    def avisar_cambio(self):
+        """
+        Cambia el token para los demás procesos. Si este proceso estaba al
+        día, adopta el token nuevo; si no, se reconstruirá en la siguiente
+        búsqueda.
+        """
+        nuevo = uuid.uuid4().hex
+        al_dia = cache.get(CLAVE_VERSION) == self.version
+        cache.set(CLAVE_VERSION, nuevo, None)
+        if al_dia:
+            self.version = nuevo
+
+    # --- consulta ---
+    def buscar(self, texto, limite=10):
+        """
+        Hasta `limite` pacientes con una clave que empieza con cada palabra
+        de `texto`, en orden alfabético de la clave (una palabra completa
+        antes que las que la continúan).
+        """
+        palabras = normalizar(texto).split()
+        if self.construido_en is None:
+            # Aún no hay índice en este proceso: se arma aparte y, mientras, responde la base
+            self._reconstruir_en_segundo_plano()
+            return _buscar_en_base(texto, limite) if palabras else []
+        if self._viejo():
+            self._reconstruir_en_segundo_plano()
+        elif cache.get(CLAVE_VERSION) != self.version:
+            self.ponerse_al_dia()
+
+        if not palabras:
+            return []
+
+        with self._lock:
+            # Se recorre el rango de la palabra con menos coincidencias
+            rangos = [(self._rango(p), p) for p in palabras]
+            (inicio, fin), _ = min(rangos, key=lambda r: r[0][1] - r[0][0])
+            resultados, vistos = [], set()
+            for i in range(inicio, fin):
+                paciente_id = self.pares[i][1]
+                if paciente_id in vistos:
+                    continue
+                vistos.add(paciente_id)
+                claves = self.claves[paciente_id]
+                if all(any(c.startswith(p) for c in claves) for p in palabras):
+                    resultados.append(self.pacientes[paciente_id])
+                    if len(resultados) >= limite:
+                        break
+            return resultados
+
+    def _rango(self, prefijo):
+        inicio = bisect_left(self.pares, (prefijo,))
+        # '\uffff' va después de cualquier carácter de una clave
+        fin = bisect_left(self.pares, (prefijo + '\uffff',), lo=inicio)
+        return inicio, fin
+
+
+def _respuesta(datos):
+    nombre = ' '.join(datos[c] for c in ('nombre', 'apellido_paterno', 'apellido_materno') if datos[c])
+    return {'id': datos['id'], 'numero': datos['numero'], 'nombre': nombre, 'telefono': datos['telefono']}
+
+
+def _buscar_en_base(texto, limite):
+    filas = buscar_pacientes(texto).values(*CAMPOS)[:limite]
+    return [_respuesta(datos) for datos in filas]
+
+
+indice = IndicePrefijos()
+
+
+def paciente_cambiado(paciente, eliminado=False):
+    """Se llama desde las señales de Paciente; aplica el cambio al confirmarse."""
+    datos = {campo: getattr(paciente, campo) for campo in CAMPOS}
+
+    def aplicar():
+        if indice.construido_en is not None:
+            if eliminado:
+                indice.quitar(datos['id'])
+            else:
+                indice.actualizar(datos)
+        indice.avisar_cambio()
+
+    transaction.on_commit(aplicar)
+
+
+def pacientes_importados():
+    """
+    Se llama desde importar_pacientes (sin señales): al confirmarse, cambia
+    el token para que todos los procesos, este incluido, lean los pacientes
+    nuevos en su siguiente búsqueda.
+    """
+    transaction.on_commit(lambda: cache.set(CLAVE_VERSION, uuid.uuid4().hex, None))
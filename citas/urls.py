@@ -1,7 +1,7 @@
 # citas/urls.py
 from django.urls import path
 from . import views
-from .views import RegisterAPIView, LoginAPIView, CitasListAPIView, SignosVitalesCreateAPIView
+from .views import RegisterAPIView, LoginAPIView, LogoutAPIView, CitasListAPIView, SignosVitalesCreateAPIView, DisponibilidadAPIView, EspaciosLibresAPIView, SincronizacionAPIView, SignosVitalesLoteAPIView
 
 urlpatterns = [
     # --- Autenticación y navegación principal ---
@@ -22,6 +22,7 @@ urlpatterns = [
     path('citas/lista/', views.dashboard_citas, name='dashboard_citas'),
     path('citas/modificar/<int:cita_id>/', views.modificar_cita, name='modificar_cita'),
     path('citas/cancelar/<int:cita_id>/', views.cancelar_cita, name='cancelar_cita'),
+    path('citas/reagendar/<int:cita_id>/', views.reagendar_cita, name='reagendar_cita'),
 
     # --- Enfermera ---
     path('enfermera/signos-vitales/<int:cita_id>/', views.registrar_signos_vitales, name='registrar_signos_vitales'),
@@ -61,8 +62,13 @@ urlpatterns = [
 
     path('api/register/', RegisterAPIView.as_view(), name='api-register'),
     path('api/login/', LoginAPIView.as_view(), name='api-login'),
+    path('api/logout/', LogoutAPIView.as_view(), name='api-logout'),
     path('api/citas/', CitasListAPIView.as_view(), name='api-citas'),
     path('api/signos/', SignosVitalesCreateAPIView.as_view(), name='api-signos'),
+    path('api/signos/lote/', SignosVitalesLoteAPIView.as_view(), name='api-signos-lote'),
+    path('api/disponibilidad/', DisponibilidadAPIView.as_view(), name='api-disponibilidad'),
+    path('api/espacios-libres/', EspaciosLibresAPIView.as_view(), name='api-espacios-libres'),
+    path('api/sync/', SincronizacionAPIView.as_view(), name='api-sync'),
     path('citas/', CitasListAPIView.as_view(), name='citas-list'),
     path('agendar-cita/', views.agendar_cita, name='agendar_cita'),
     path('agendar-paciente/', views.agendar_paciente, name='agendar_paciente'),
@@ -71,12 +77,17 @@ urlpatterns = [
     path('agendar/<int:paciente_id>/', views.agendar_paciente_existente, name='agendar_paciente_existente'),
 
 path('pacientes/buscar/', views.buscar_pacientes_doctor, name='buscar_pacientes_doctor'),
+path('pacientes/autocompletar/', views.autocompletar_pacientes, name='autocompletar_pacientes'),
 
 path('doctor/paciente/<int:paciente_id>/agregar_estudio/', views.agregar_estudio, name='agregar_estudio'),
+path('doctor/estudio/<int:estudio_id>/estado/', views.estado_estudio, name='estado_estudio'),
+path('exportacion/<int:exportacion_id>/estado/', views.estado_exportacion, name='estado_exportacion'),
+path('exportacion/<int:exportacion_id>/descargar/', views.descargar_exportacion, name='descargar_exportacion'),
 path('doctor/cita/<int:cita_id>/imprimir_historial/', views.imprimir_historial, name='imprimir_historial'),
 path('dashboard/doctor/cita/<int:cita_id>/', views.detalle_cita_doctor, name='detalle_cita_doctor'),
  #path('api/citas/<int:doctor_id>/', views.citas_por_doctor),
  path("dashboard/actualizar-citas/", views.actualizar_citas, name="actualizar_citas"),
+ path("dashboard/eventos-citas/", views.eventos_citas, name="eventos_citas"),
       path(
         "historial/paciente/<int:paciente_id>/",
         views.imprimir_historial_paciente,
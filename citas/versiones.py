@@ -0,0 +1,42 @@
+"""
+Versiones de contenido para las cachés de documentos ya generados.
+
+Cada objeto que aparece en un documento tiene un token en la caché
+compartida (`CACHES`). Las señales lo cambian cuando el objeto se guarda o
+se borra, al confirmarse la transacción. La huella de un documento se forma
+con los tokens de todo lo que contiene, así que cambia en cuanto cambia
+cualquiera de ellos y un render viejo no se vuelve a servir. Si la caché
+pierde un token se crea otro: el efecto es un fallo de caché, nunca un dato
+obsoleto.
+
+Quien use una huella debe calcularla *antes* de leer los datos que va a
+cachear; así un cambio que se confirme en medio deja el render bajo una
+huella que ya no se usa.
+"""
+import hashlib
+import uuid
+
+from django.core.cache import cache
+from django.db import transaction
+
+
+def _clave(tipo, objeto_id):
+    return f"version:{tipo}:{objeto_id}"
+
+
+def invalidar(tipo, objeto_id):
+    """Cambia el token de (`tipo`, `objeto_id`) cuando se confirme la transacción."""
+    clave = _clave(tipo, objeto_id)
+    transaction.on_commit(lambda: cache.set(clave, uuid.uuid4().hex, None))
+
+
+def huella(*objetos):
+    """Huella de un documento formado por los pares (tipo, id) de `objetos`."""
+    claves = [_clave(tipo, objeto_id) for tipo, objeto_id in objetos]
+    tokens = cache.get_many(claves)
+    for clave in claves:
+        if clave not in tokens:
+            nuevo = uuid.uuid4().hex
+            cache.add(clave, nuevo, None)
+            tokens[clave] = cache.get(clave) or nuevo
+    return hashlib.sha1("|".join(tokens[clave] for clave in claves).encode()).hexdigest()
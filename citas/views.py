@@ -8,13 +8,6 @@ from .forms import ( RegistroForm, LoginForm, PacienteForm, CitaForm, SignosVita
 from .models import CustomUser, Paciente, Cita, Doctor, SignosVitales, Receta, Estudio
 from datetime import date
 from django.http import HttpResponse
-from reportlab.lib.pagesizes import letter
-from reportlab.pdfgen import canvas
-from reportlab.lib import colors
-import os
-from django.conf import settings
-from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
-from reportlab.lib.styles import getSampleStyleSheet
 from datetime import datetime, date, timedelta
 # ---------------------------
 # --- Funciones de rol ---
@@ -143,12 +136,69 @@ def logout_view(request):
 # --- Dashboards por rol ---
 # ---------------------------
 from datetime import date
-from django.db.models import Q
+from django.db.models import OuterRef, Subquery
+from django.template.loader import render_to_string
+from django.utils.dateparse import parse_date
+
+# Citas por página en los dashboards de recepción; las siguientes se cargan
+# al pedirlas ("Cargar más")
+CITAS_POR_PAGINA = 50
+ORDEN_CITAS = ('fecha', 'hora', 'id')
+VENTANAS_CITAS = {'hoy': 0, 'semana': 6}
+# Pacientes que muestra la búsqueda del dashboard
+RESULTADOS_BUSQUEDA = 50
+
+
+def _ventana_citas(request):
+    """
+    Rango de fechas del dashboard de recepción: 'hoy', 'semana' (hoy y los
+    6 días siguientes) o 'rango' con `desde` y `hasta`.
+    """
+    hoy = date.today()
+    ventana = request.GET.get('ventana', 'semana')
+    if ventana == 'rango':
+        desde = parse_date(request.GET.get('desde') or '') or hoy
+        hasta = parse_date(request.GET.get('hasta') or '') or desde
+        if hasta < desde:
+            desde, hasta = hasta, desde
+        return ventana, desde, hasta
+    if ventana not in VENTANAS_CITAS:
+        ventana = 'semana'
+    return ventana, hoy, hoy + timedelta(days=VENTANAS_CITAS[ventana])
+
+
+def _pagina_citas(request):
+    """Página de citas de la ventana pedida, con paciente y doctor en la misma consulta."""
+    ventana, desde, hasta = _ventana_citas(request)
+    citas = (
+        Cita.objects.filter(fecha__range=(desde, hasta))
+        .select_related('paciente', 'doctor__user')
+    )
+    pagina = paginar(citas, ORDEN_CITAS, CITAS_POR_PAGINA, despues=request.GET.get('despues'))
+    return pagina, {'ventana': ventana, 'desde': desde, 'hasta': hasta}
+
+
+def _contexto_citas(request):
+    pagina, ventana = _pagina_citas(request)
+    return {'citas': pagina.objetos, 'siguiente': pagina.siguiente, **ventana}
+
+
+def _mas_citas(request):
+    """Filas de la página siguiente en JSON, para "Cargar más"."""
+    pagina, _ = _pagina_citas(request)
+    return JsonResponse({
+        'html': render_to_string('recepcion/_filas_citas.html', {'citas': pagina.objetos}, request),
+        'siguiente': pagina.siguiente,
+    })
+
+
 @login_required
 @user_passes_test(is_administradora)
 def dashboard_administradora(request):
+    if request.GET.get('parcial'):
+        return _mas_citas(request)
+
     fecha_actual = date.today()
-    citas = Cita.objects.filter(fecha__gte=fecha_actual).order_by('fecha', 'hora')
     resultado = None
     mensaje = None
     tab_activa = 'citas'
@@ -164,22 +214,15 @@ def dashboard_administradora(request):
 
         # Si se realizó una búsqueda
         if buscar:
-            resultado = Paciente.objects.filter(
-                Q(nombre__icontains=buscar) |
-                Q(apellido_paterno__icontains=buscar) |
-                Q(apellido_materno__icontains=buscar) |
-                Q(telefono__icontains=buscar) |
-                Q(numero__icontains=buscar) |
-                Q(id__icontains=buscar)
-            )
+            resultado = list(buscar_pacientes(buscar)[:RESULTADOS_BUSQUEDA])
 
-            if not resultado.exists():
+            if not resultado:
                 mensaje = "⚠️ No se encontró ningún paciente con ese dato."
 
             tab_activa = 'buscar'
 
     contexto = {
-        'citas': citas,
+        **_contexto_citas(request),
         'fecha_actual': fecha_actual,
         'resultado': resultado,
         'mensaje': mensaje,
@@ -190,65 +233,43 @@ def dashboard_administradora(request):
 
 
 from .forms import EstudioForm
-from PyPDF2 import PdfReader
-import pytesseract
-from PIL import Image as PILImage          # ✔ CORRECTO
-from reportlab.platypus import Image as PDFImage   # ✔ NO interfiere
-import os
-import shutil
-import pytesseract
-from PyPDF2 import PdfReader
-from PIL import Image as PILImage
-
 from django.shortcuts import render, get_object_or_404
-from django.http import HttpResponse
+from django.http import FileResponse, Http404, HttpResponse, HttpResponseGone, JsonResponse
+from django.urls import reverse
+from django.utils.cache import get_conditional_response, patch_cache_control
 from django.contrib import messages
 
-from reportlab.platypus import (
-    SimpleDocTemplate, Table, TableStyle, Spacer,
-    Paragraph, Image, PageBreak
-)
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from reportlab.lib.enums import TA_CENTER, TA_LEFT
-from reportlab.lib.pagesizes import letter
-from reportlab.lib import colors
-
-from .models import Cita, Estudio, SignosVitales
+from .models import Cita, Estudio, ExportacionPDF, SignosVitales
 from .forms import EstudioForm
+from .extraction import encolar_extraccion
+from .derivatives import encolar_derivado
+from .exports import encolar_exportacion, vencida
+from .pdfs import huella_receta, receta_pdf
+from .services import reagendar_siguiente_disponible
+from .versiones import huella
+from .disponibilidad import HorarioOcupado, buscar_espacios, cargar_agenda
+from .busqueda import ORDEN as ORDEN_BUSQUEDA, buscar_pacientes
+from .paginacion import leer_cursor, paginar
+from . import typeahead
+from .sincronizacion import cambios
 
 
 # ------------------------------------------
-# ROUTE FOR TESSERACT (AUTOMATIC)
-# ------------------------------------------
-pytesseract.pytesseract.tesseract_cmd = r"C:\Program Files\Tesseract-OCR\tesseract.exe"
-
-# ------------------------------------------
-# READ PDF
-# ------------------------------------------
-def leer_pdf(ruta):
-    texto = ""
-    with open(ruta, 'rb') as f:
-        reader = PdfReader(f)
-        for page in reader.pages:
-            texto += page.extract_text() or ""
-    return texto.strip()
-
-
-# ------------------------------------------
-# READ IMAGE + OCR
+# ADD STUDY
 # ------------------------------------------
-def leer_imagen(ruta):
-    imagen = PILImage.open(ruta)
-    texto = pytesseract.image_to_string(imagen, lang='spa')
-    return texto.strip()
+def paciente_del_doctor(user, paciente_id):
+    """Los estudios de un paciente solo los ven los doctores que lo han atendido."""
+    return Cita.objects.filter(paciente_id=paciente_id, doctor_id=user.pk).exists()
 
 
-# ------------------------------------------
-# ADD STUDY
-# ------------------------------------------
+@login_required
+@user_passes_test(is_doctor)
 def agregar_estudio(request, paciente_id):
     paciente = get_object_or_404(Paciente, id=paciente_id)
+    if not paciente_del_doctor(request.user, paciente.id):
+        raise Http404("Paciente no encontrado.")
     cita = Cita.objects.filter(paciente=paciente).order_by('-fecha').first()
+    estudio = None
 
     if request.method == 'POST':
         form = EstudioForm(request.POST, request.FILES)
@@ -257,18 +278,9 @@ def agregar_estudio(request, paciente_id):
             estudio.paciente = paciente
             estudio.save()
 
-            ruta = estudio.archivo.path
-            ext = os.path.splitext(ruta)[1].lower()
-
-            if ext == ".pdf":
-                texto = leer_pdf(ruta)
-            elif ext in [".jpg", ".jpeg", ".png"]:
-                texto = leer_imagen(ruta)
-            else:
-                texto = "Tipo de archivo no compatible."
-
-            estudio.texto_extraido = texto
-            estudio.save()
+            # El OCR corre en segundo plano; la página consulta el estado.
+            encolar_extraccion(estudio)
+            encolar_derivado(estudio)
 
             messages.success(request, "✅ Estudio agregado correctamente.")
             form = EstudioForm()
@@ -280,7 +292,25 @@ def agregar_estudio(request, paciente_id):
     return render(request, 'doctor/agregar_estudio.html', {
         'form': form,
         'paciente': paciente,
-        'cita': cita
+        'cita': cita,
+        'estudio': estudio,
+    })
+
+
+# ------------------------------------------
+# ESTADO DE LA EXTRACCIÓN (POLLING)
+# ------------------------------------------
+@login_required
+@user_passes_test(is_doctor)
+def estado_estudio(request, estudio_id):
+    estudio = get_object_or_404(Estudio, id=estudio_id)
+    if not paciente_del_doctor(request.user, estudio.paciente_id):
+        raise Http404("Estudio no encontrado.")
+    return JsonResponse({
+        'id': estudio.id,
+        'estado': estudio.estado_extraccion,
+        'intentos': estudio.intentos_extraccion,
+        'texto_extraido': estudio.texto_extraido if estudio.estado_extraccion == 'Completado' else None,
     })
 
 
@@ -298,485 +328,61 @@ def pie_pagina(canvas, doc):
 # ==========================================
 #      GENERAR HISTORIAL COMPLETO
 # ==========================================
-from reportlab.platypus.flowables import HRFlowable
 @login_required
 @user_passes_test(is_doctor)
 def imprimir_historial(request, cita_id):
-    cita_actual = get_object_or_404(Cita, id=cita_id)
+    cita_actual = get_object_or_404(Cita.objects.select_related('paciente'), id=cita_id)
     paciente = cita_actual.paciente
-    citas = Cita.objects.filter(paciente=paciente).order_by('-fecha')
-
-    response = HttpResponse(content_type='application/pdf')
-    response['Content-Disposition'] = (
-        f'attachment; filename="historial_{paciente.nombre}_{date.today()}.pdf"'
-    )
-
-    pdf = SimpleDocTemplate(
-        response,
-        pagesize=letter,
-        topMargin=60,
-        bottomMargin=40,
-        leftMargin=25,
-        rightMargin=25
-    )
-
-    styles = getSampleStyleSheet()
-
-    azul_oscuro = colors.HexColor("#1a365d")
-    azul_medio = colors.HexColor("#2d5a8c")
-    azul_claro = colors.HexColor("#e6f2ff")
-    gris = colors.HexColor("#4a5568")
-
-    title_style = ParagraphStyle(
-        "title",
-        fontSize=22,
-        fontName="Helvetica-Bold",
-        alignment=TA_CENTER,
-        textColor=azul_oscuro,
-        spaceAfter=14
-    )
-
-    subtitle_style = ParagraphStyle(
-        "subtitle",
-        fontSize=12,
-        fontName="Helvetica",
-        alignment=TA_CENTER,
-        textColor=gris,
-        spaceAfter=20
-    )
-
-    section_style = ParagraphStyle(
-        "section",
-        fontSize=16,
-        fontName="Helvetica-Bold",
-        textColor=azul_medio,
-        spaceBefore=30,
-        spaceAfter=10,
-    )
-
-    normal = ParagraphStyle(
-        "normal",
-        fontSize=10,
-        fontName="Helvetica",
-        textColor=gris
-    )
-
-    bold = ParagraphStyle(
-        "bold",
-        fontSize=10,
-        fontName="Helvetica-Bold",
-        textColor=azul_oscuro
-    )
 
-    info_style = ParagraphStyle(
-        "info",
-        fontSize=11,
-        fontName="Helvetica",
-        textColor=azul_oscuro,
-        spaceAfter=5
+    exportacion = encolar_exportacion(
+        request.user, 'historial', f"historial_{paciente.nombre}_{date.today()}.pdf",
+        paciente_id=paciente.id, cita_id=cita_actual.id,
     )
-
-    story = []
-
-    # ========== ENCABEZADO MEJORADO ==========
-    try:
-        logo = Image("static/citas/img/logo.png", width=70, height=70)
-        # Tabla para organizar logo y texto
-        header_data = [
-            [logo, 
-             Paragraph("<b>HOSPITAL SAN PEDRO</b><br/><font size='10'>Centro Médico Especializado</font>", 
-                      ParagraphStyle(
-                          "hospital_name",
-                          fontSize=18,
-                          fontName="Helvetica-Bold",
-                          textColor=azul_oscuro,
-                          alignment=TA_CENTER,
-                          spaceAfter=0
-                      ))]
-        ]
-        header_table = Table(header_data, colWidths=[80, 450])
-        header_table.setStyle(TableStyle([
-            ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
-            ('ALIGN', (0, 0), (0, 0), 'CENTER'),
-            ('ALIGN', (1, 0), (1, 0), 'CENTER'),
-            ('BOTTOMPADDING', (0, 0), (-1, -1), 5),
-        ]))
-        story.append(header_table)
-    except:
-        story.append(Paragraph("<b>HOSPITAL SAN PEDRO</b>", title_style))
-
-    story.append(Spacer(1, 5))
-    
-    # Línea divisoria
-    story.append(HRFlowable(
-        width="100%",
-        thickness=1,
-        color=azul_medio,
-        spaceBefore=5,
-        spaceAfter=10
-    ))
-    
-    story.append(Paragraph("HISTORIAL CLÍNICO", title_style))
-    story.append(Paragraph("Documento confidencial - Uso médico exclusivo", subtitle_style))
-
-    # ========== INFORMACIÓN DEL PACIENTE Y DOCTOR ==========
-    patient_info = Table([
-        [Paragraph(f"<b>PACIENTE:</b>", bold), 
-         Paragraph(f"{paciente.nombre} {paciente.apellido_paterno} {paciente.apellido_materno or ''}", info_style)],
-        [Paragraph(f"<b>DOCTOR:</b>", bold), 
-         Paragraph(f"Dr. {cita_actual.doctor.user.nombre} {cita_actual.doctor.user.apellido_paterno} {cita_actual.doctor.user.apellido_materno or ''}", info_style)],
-        [Paragraph(f"<b>FECHA DE GENERACIÓN:</b>", bold), 
-         Paragraph(f"{date.today().strftime('%d/%m/%Y')}", info_style)],
-    ], colWidths=[120, 380])
-    
-    patient_info.setStyle(TableStyle([
-        ('VALIGN', (0, 0), (-1, -1), 'TOP'),
-        ('BOTTOMPADDING', (0, 0), (-1, -1), 8),
-        ('TOPPADDING', (0, 0), (-1, -1), 8),
-        ('LEFTPADDING', (0, 0), (-1, -1), 5),
-    ]))
-    
-    story.append(patient_info)
-    story.append(Spacer(1, 20))
-
-    # ========== HISTORIAL POR BLOQUES ==========
-    for c in citas:
-        story.append(Paragraph(f"Cita del {c.fecha.strftime('%d/%m/%Y')}", section_style))
-        
-        # Doctor de esta cita específica
-        story.append(Paragraph(
-            f"<b>Atendió:</b> Dr. {c.doctor.user.nombre} {c.doctor.user.apellido_paterno} {c.doctor.user.apellido_materno or ''}",
-            normal
-        ))
-        story.append(Spacer(1, 10))
-
-        bloque = []
-
-        # ---------- Signos Vitales ----------
-        try:
-            sv = SignosVitales.objects.get(cita=c)
-        except SignosVitales.DoesNotExist:
-            sv = None
-
-        if sv:
-            bloque.append(Paragraph("<b>Signos Vitales</b>", bold))
-            signos_table = Table([
-                [Paragraph("Peso:", normal), Paragraph(f"{sv.peso or '—'} kg", normal),
-                 Paragraph("Presión:", normal), Paragraph(f"{sv.presion_arterial or '—'}", normal)],
-                [Paragraph("Temperatura:", normal), Paragraph(f"{sv.temperatura or '—'} °C", normal),
-                 Paragraph("Frec. Cardiaca:", normal), Paragraph(f"{sv.frecuencia_cardiaca or '—'}", normal)],
-                [Paragraph("Frec. Respiratoria:", normal), Paragraph(f"{sv.frecuencia_respiratoria or '—'}", normal),
-                 Paragraph("Saturación O₂:", normal), Paragraph(f"{sv.saturacion_oxigeno or '—'}%", normal)],
-            ], colWidths=[100, 80, 100, 80])
-            signos_table.setStyle(TableStyle([
-                ('VALIGN', (0, 0), (-1, -1), 'TOP'),
-                ('BOTTOMPADDING', (0, 0), (-1, -1), 5),
-            ]))
-            bloque.append(signos_table)
-            bloque.append(Spacer(1, 10))
-
-        # ---------- Diagnóstico ----------
-        diagnostico = c.nuevo_diagnostico or c.diagnostico or "No registrado"
-        bloque.append(Paragraph("<b>Diagnóstico</b>", bold))
-        bloque.append(Paragraph(diagnostico, normal))
-        bloque.append(Spacer(1, 10))
-
-        # ---------- Medicamentos e indicaciones ----------
-        receta = getattr(c, "receta", None)
-
-        meds = receta.medicamentos if receta else "No registrado"
-        ind = receta.indicaciones if receta else "No registrado"
-
-        bloque.append(Paragraph("<b>Medicamentos</b>", bold))
-        bloque.append(Paragraph(meds, normal))
-        bloque.append(Spacer(1, 10))
-
-        bloque.append(Paragraph("<b>Indicaciones</b>", bold))
-        bloque.append(Paragraph(ind, normal))
-        bloque.append(Spacer(1, 15))
-
-        # ---------- Estudios del mismo día ----------
-        estudios = Estudio.objects.filter(
-            paciente=paciente,
-            fecha_subida__date=c.fecha
-        )
-
-        if estudios.exists():
-            bloque.append(Paragraph("<b>Estudios y Análisis</b>", bold))
-
-            for e in estudios:
-                bloque.append(Paragraph(f"Descripción: {e.descripcion or 'Sin descripción'}", normal))
-                bloque.append(Paragraph(f"Texto extraído: {e.texto_extraido or '(Sin texto)'}", normal))
-
-                ruta = e.archivo.path
-                ext = os.path.splitext(ruta)[1].lower()
-
-                if ext in ['.jpg', '.jpeg', '.png']:
-                    try:
-                        bloque.append(Image(ruta, width=280, height=200, kind='proportional'))
-                    except:
-                        bloque.append(Paragraph("(No se pudo cargar la imagen)", normal))
-
-                bloque.append(Spacer(1, 15))
-
-        # ===== BLOQUE COMPLETO =====
-        marco = Table([[b] for b in bloque], colWidths=[500])
-        marco.setStyle(TableStyle([
-            ('BOX', (0, 0), (-1, -1), 1, azul_medio),
-            ('BACKGROUND', (0, 0), (-1, 0), azul_claro),
-            ('PADDING', (0, 0), (-1, -1), 8),
-            ('TOPPADDING', (0, 0), (0, 0), 12),
-            ('BOTTOMPADDING', (0, 0), (0, 0), 12),
-        ]))
-
-        story.append(marco)
-        story.append(Spacer(1, 25))
-
-    # ========== GENERAR PDF ==========
-    pdf.build(story)
-
-    messages.success(request, "Historial descargado correctamente.")
-    return response
+    return render(request, 'exportacion.html', {'exportacion': exportacion})
 
 
 @login_required
 @user_passes_test(lambda u: u.is_authenticated)
 def imprimir_historial_paciente(request, paciente_id):
     paciente = get_object_or_404(Paciente, id=paciente_id)
-    citas = Cita.objects.filter(paciente=paciente).order_by('-fecha')
-
-    response = HttpResponse(content_type='application/pdf')
-    response['Content-Disposition'] = (
-        f'attachment; filename="historial_{paciente.nombre}_{date.today()}.pdf"'
-    )
-
-    pdf = SimpleDocTemplate(
-        response,
-        pagesize=letter,
-        topMargin=60,
-        bottomMargin=40,
-        leftMargin=25,
-        rightMargin=25
-    )
-
-    styles = getSampleStyleSheet()
 
-    azul_oscuro = colors.HexColor("#1a365d")
-    azul_medio = colors.HexColor("#2d5a8c")
-    azul_claro = colors.HexColor("#e6f2ff")
-    gris = colors.HexColor("#4a5568")
-
-    title_style = ParagraphStyle(
-        "title",
-        fontSize=22,
-        fontName="Helvetica-Bold",
-        alignment=TA_CENTER,
-        textColor=azul_oscuro,
-        spaceAfter=14
+    exportacion = encolar_exportacion(
+        request.user, 'historial', f"historial_{paciente.nombre}_{date.today()}.pdf",
+        paciente_id=paciente.id,
     )
+    return render(request, 'exportacion.html', {'exportacion': exportacion})
 
-    subtitle_style = ParagraphStyle(
-        "subtitle",
-        fontSize=12,
-        fontName="Helvetica",
-        alignment=TA_CENTER,
-        textColor=gris,
-        spaceAfter=20
-    )
 
-    section_style = ParagraphStyle(
-        "section",
-        fontSize=16,
-        fontName="Helvetica-Bold",
-        textColor=azul_medio,
-        spaceBefore=30,
-        spaceAfter=10,
-    )
+# ------------------------------------------
+# EXPORTACIONES PDF (POLLING Y DESCARGA)
+# ------------------------------------------
+@login_required
+def estado_exportacion(request, exportacion_id):
+    exportacion = get_object_or_404(ExportacionPDF, id=exportacion_id, usuario=request.user)
+    return JsonResponse({
+        'id': exportacion.id,
+        'estado': exportacion.estado,
+        'descarga': (
+            reverse('descargar_exportacion', args=[exportacion.id])
+            if exportacion.estado == 'Completado' else None
+        ),
+    })
 
-    normal = ParagraphStyle(
-        "normal",
-        fontSize=10,
-        fontName="Helvetica",
-        textColor=gris
-    )
 
-    bold = ParagraphStyle(
-        "bold",
-        fontSize=10,
-        fontName="Helvetica-Bold",
-        textColor=azul_oscuro
+@login_required
+def descargar_exportacion(request, exportacion_id):
+    exportacion = get_object_or_404(
+        ExportacionPDF, id=exportacion_id, usuario=request.user, estado='Completado'
     )
+    if vencida(exportacion):
+        exportacion.delete()
+        return HttpResponseGone("La descarga expiró. Vuelve a generar el PDF.")
 
-    info_style = ParagraphStyle(
-        "info",
-        fontSize=11,
-        fontName="Helvetica",
-        textColor=azul_oscuro,
-        spaceAfter=5
+    return FileResponse(
+        exportacion.archivo.open('rb'), as_attachment=True, content_type='application/pdf',
+        filename=exportacion.nombre_descarga,
     )
 
-    story = []
-
-    # ========== ENCABEZADO MEJORADO ==========
-    try:
-        logo = Image("static/citas/img/logo.png", width=70, height=70)
-        # Tabla para organizar logo y texto
-        header_data = [
-            [logo, 
-             Paragraph("<b>HOSPITAL SAN PEDRO</b><br/><font size='10'>Centro Médico Especializado</font>", 
-                      ParagraphStyle(
-                          "hospital_name",
-                          fontSize=18,
-                          fontName="Helvetica-Bold",
-                          textColor=azul_oscuro,
-                          alignment=TA_CENTER,
-                          spaceAfter=0
-                      ))]
-        ]
-        header_table = Table(header_data, colWidths=[80, 450])
-        header_table.setStyle(TableStyle([
-            ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
-            ('ALIGN', (0, 0), (0, 0), 'CENTER'),
-            ('ALIGN', (1, 0), (1, 0), 'CENTER'),
-            ('BOTTOMPADDING', (0, 0), (-1, -1), 5),
-        ]))
-        story.append(header_table)
-    except:
-        story.append(Paragraph("<b>HOSPITAL SAN PEDRO</b>", title_style))
-
-    story.append(Spacer(1, 5))
-    
-    # Línea divisoria
-    story.append(HRFlowable(
-        width="100%",
-        thickness=1,
-        color=azul_medio,
-        spaceBefore=5,
-        spaceAfter=10
-    ))
-    
-    story.append(Paragraph("HISTORIAL CLÍNICO", title_style))
-    story.append(Paragraph("Documento confidencial - Uso médico exclusivo", subtitle_style))
-
-    # ========== INFORMACIÓN DEL PACIENTE ==========
-    patient_info = Table([
-        [Paragraph(f"<b>PACIENTE:</b>", bold), 
-         Paragraph(f"{paciente.nombre} {paciente.apellido_paterno} {paciente.apellido_materno or ''}", info_style)],
-        [Paragraph(f"<b>FECHA DE GENERACIÓN:</b>", bold), 
-         Paragraph(f"{date.today().strftime('%d/%m/%Y')}", info_style)],
-        [Paragraph(f"<b>TOTAL DE CONSULTAS:</b>", bold), 
-         Paragraph(f"{citas.count()} consulta(s)", info_style)],
-    ], colWidths=[120, 380])
-    
-    patient_info.setStyle(TableStyle([
-        ('VALIGN', (0, 0), (-1, -1), 'TOP'),
-        ('BOTTOMPADDING', (0, 0), (-1, -1), 8),
-        ('TOPPADDING', (0, 0), (-1, -1), 8),
-        ('LEFTPADDING', (0, 0), (-1, -1), 5),
-    ]))
-    
-    story.append(patient_info)
-    story.append(Spacer(1, 20))
-
-    # ========== HISTORIAL POR BLOQUES ==========
-    for cita in citas:
-        story.append(Paragraph(f"Cita del {cita.fecha.strftime('%d/%m/%Y')}", section_style))
-        
-        # Doctor de esta cita específica
-        story.append(Paragraph(
-            f"<b>Atendió:</b> Dr. {cita.doctor.user.nombre} {cita.doctor.user.apellido_paterno} {cita.doctor.user.apellido_materno or ''}",
-            normal
-        ))
-        story.append(Spacer(1, 10))
-
-        bloque = []
-
-        # ---------- Signos Vitales ----------
-        try:
-            sv = SignosVitales.objects.get(cita=cita)
-        except SignosVitales.DoesNotExist:
-            sv = None
-
-        if sv:
-            bloque.append(Paragraph("<b>Signos Vitales</b>", bold))
-            signos_table = Table([
-                [Paragraph("Peso:", normal), Paragraph(f"{sv.peso or '—'} kg", normal),
-                 Paragraph("Presión:", normal), Paragraph(f"{sv.presion_arterial or '—'}", normal)],
-                [Paragraph("Temperatura:", normal), Paragraph(f"{sv.temperatura or '—'} °C", normal),
-                 Paragraph("Frec. Cardiaca:", normal), Paragraph(f"{sv.frecuencia_cardiaca or '—'}", normal)],
-                [Paragraph("Frec. Respiratoria:", normal), Paragraph(f"{sv.frecuencia_respiratoria or '—'}", normal),
-                 Paragraph("Saturación O₂:", normal), Paragraph(f"{sv.saturacion_oxigeno or '—'}%", normal)],
-            ], colWidths=[100, 80, 100, 80])
-            signos_table.setStyle(TableStyle([
-                ('VALIGN', (0, 0), (-1, -1), 'TOP'),
-                ('BOTTOMPADDING', (0, 0), (-1, -1), 5),
-            ]))
-            bloque.append(signos_table)
-            bloque.append(Spacer(1, 10))
-
-        # ---------- Diagnóstico ----------
-        diagnostico = cita.nuevo_diagnostico or cita.diagnostico or "No registrado"
-        bloque.append(Paragraph("<b>Diagnóstico</b>", bold))
-        bloque.append(Paragraph(diagnostico, normal))
-        bloque.append(Spacer(1, 10))
-
-        # ---------- Medicamentos e indicaciones ----------
-        receta = getattr(cita, "receta", None)
-
-        meds = receta.medicamentos if receta else "No registrado"
-        ind = receta.indicaciones if receta else "No registrado"
-
-        bloque.append(Paragraph("<b>Medicamentos</b>", bold))
-        bloque.append(Paragraph(meds, normal))
-        bloque.append(Spacer(1, 10))
-
-        bloque.append(Paragraph("<b>Indicaciones</b>", bold))
-        bloque.append(Paragraph(ind, normal))
-        bloque.append(Spacer(1, 15))
-
-        # ---------- Estudios del mismo día ----------
-        estudios = Estudio.objects.filter(
-            paciente=paciente,
-            fecha_subida__date=cita.fecha
-        )
-
-        if estudios.exists():
-            bloque.append(Paragraph("<b>Estudios y Análisis</b>", bold))
-
-            for estudio in estudios:
-                bloque.append(Paragraph(f"Descripción: {estudio.descripcion or 'Sin descripción'}", normal))
-                bloque.append(Paragraph(f"Texto extraído: {estudio.texto_extraido or '(Sin texto)'}", normal))
-
-                ruta = estudio.archivo.path
-                ext = os.path.splitext(ruta)[1].lower()
-
-                if ext in ['.jpg', '.jpeg', '.png']:
-                    try:
-                        bloque.append(Image(ruta, width=280, height=200, kind='proportional'))
-                    except:
-                        bloque.append(Paragraph("(No se pudo cargar la imagen)", normal))
-
-                bloque.append(Spacer(1, 15))
-
-        # ===== BLOQUE COMPLETO =====
-        marco = Table([[b] for b in bloque], colWidths=[500])
-        marco.setStyle(TableStyle([
-            ('BOX', (0, 0), (-1, -1), 1, azul_medio),
-            ('BACKGROUND', (0, 0), (-1, 0), azul_claro),
-            ('PADDING', (0, 0), (-1, -1), 8),
-            ('TOPPADDING', (0, 0), (0, 0), 12),
-            ('BOTTOMPADDING', (0, 0), (0, 0), 12),
-        ]))
-
-        story.append(marco)
-        story.append(Spacer(1, 25))
-
-    # ========== GENERAR PDF ==========
-    pdf.build(story)
-    
-    messages.success(request, "Historial descargado correctamente.")
-    return response
-
 # ---------------------------
 # --- Gestión de Pacientes y Citas ---
 # ---------------------------
@@ -856,19 +462,24 @@ def agendar_cita(request):
         form.fields['doctor_user'].queryset = doctores
 
         if form.is_valid():
-            form.save()
-            messages.success(request, '✅ La cita ha sido agendada con éxito.')
+            try:
+                form.save()
+            except HorarioOcupado as e:
+                # Otra reserva ocupó la hora entre la validación y el guardado
+                form.add_error(None, str(e))
+            else:
+                messages.success(request, '✅ La cita ha sido agendada con éxito.')
 
-            # Limpiar sesión
-            request.session.pop('paciente_id', None)
+                # Limpiar sesión
+                request.session.pop('paciente_id', None)
 
-            # 🔁 REDIRECCIÓN SEGÚN ROL
-            if request.user.role == 'doctor':
-                return redirect('dashboard_doctor')
-            else:
-                return redirect('dashboard_administradora')
+                # 🔁 REDIRECCIÓN SEGÚN ROL
+                if request.user.role == 'doctor':
+                    return redirect('dashboard_doctor')
+                else:
+                    return redirect('dashboard_administradora')
 
-        else:
+        if form.errors:
             messages.error(request, '❌ Revisa los datos del formulario')
 
     else:
@@ -894,8 +505,9 @@ def agendar_cita(request):
 @login_required
 @user_passes_test(is_administradora)
 def dashboard_citas(request):
-    citas = Cita.objects.all().order_by('fecha', 'hora')
-    return render(request, 'recepcion/dashboard.html', {'citas': citas})
+    if request.GET.get('parcial'):
+        return _mas_citas(request)
+    return render(request, 'recepcion/dashboard.html', _contexto_citas(request))
 
 @login_required
 @user_passes_test(is_administradora)
@@ -904,10 +516,14 @@ def modificar_cita(request, cita_id):
     if request.method == 'POST':
         form = CitaForm(request.POST, instance=cita)
         if form.is_valid():
-            form.save()
-            messages.success(request, "✅ Cita modificada exitosamente.")
-            return redirect('dashboard_administradora')
-        else:
+            try:
+                form.save()
+            except HorarioOcupado as e:
+                form.add_error(None, str(e))
+            else:
+                messages.success(request, "✅ Cita modificada exitosamente.")
+                return redirect('dashboard_administradora')
+        if form.errors:
             messages.error(request, "❌ Error al modificar la cita. Revisa los datos.")
     else:
         form = CitaForm(instance=cita)
@@ -927,6 +543,22 @@ def cancelar_cita(request, cita_id):
         messages.info(request, "ℹ️ Esta cita ya estaba cancelada.")
     return redirect('dashboard_citas')
 
+
+@login_required
+@user_passes_test(is_administradora)
+def reagendar_cita(request, cita_id):
+    cita = get_object_or_404(Cita, id=cita_id)
+    if cita.estado != 'Cancelada':
+        messages.info(request, "ℹ️ Solo se pueden reagendar citas canceladas.")
+    elif reagendar_siguiente_disponible(cita):
+        messages.success(
+            request,
+            f"✅ Cita reagendada para el {cita.fecha.strftime('%d/%m/%Y')} a las {cita.hora.strftime('%H:%M')}."
+        )
+    else:
+        messages.error(request, "❌ No hay horarios libres con este doctor en las próximas dos semanas.")
+    return redirect('dashboard_citas')
+
 # ---------------------------
 # --- Gestión de Signos Vitales ---
 # ---------------------------
@@ -1081,8 +713,6 @@ def realizar_diagnostico(request, cita_id):
 # ---------------------------
 # Agregar o editar receta
 # ---------------------------
-from reportlab.platypus import Image
-
 @login_required
 @user_passes_test(is_doctor)
 def agregar_receta(request, cita_id):
@@ -1122,404 +752,28 @@ def agregar_receta(request, cita_id):
 @login_required
 @user_passes_test(lambda u: hasattr(u, 'doctor'))
 def generar_receta_pdf(request, cita_id):
-    import os
-    from io import BytesIO
-    from django.shortcuts import get_object_or_404, redirect
-    from django.http import HttpResponse
-    from django.contrib import messages
-    from reportlab.lib.pagesizes import portrait, letter
-    from reportlab.lib.styles import ParagraphStyle, getSampleStyleSheet
-    from reportlab.lib.enums import TA_CENTER, TA_RIGHT, TA_LEFT, TA_JUSTIFY
-    from reportlab.platypus import (
-        SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle, Image
-    )
-    from reportlab.lib import colors
-    from reportlab.lib.units import inch
-
-    cita = get_object_or_404(Cita, id=cita_id)
-    receta = getattr(cita, 'receta', None)
-
-    if not receta:
+    cita = get_object_or_404(Cita.objects.select_related('paciente', 'doctor'), id=cita_id)
+    if not Receta.objects.filter(cita=cita).exists():
         messages.error(request, "❌ No hay receta para esta cita.")
         return redirect('detalle_cita_doctor', cita_id=cita.id)
 
-    paciente = cita.paciente
-    doctor = cita.doctor
-
-    cita.estado = "Atendida"
-    cita.save()
-
-    # SIGNOS VITALES
-    from .models import SignosVitales
-    signos = SignosVitales.objects.filter(cita=cita).first()
-
-    if not signos:
-        class Empty:
-            temperatura = presion_arterial = frecuencia_cardiaca = None
-            frecuencia_respiratoria = saturacion_oxigeno = peso = None
-        signos = Empty()
-
-    # PDF SETUP
-    buffer = BytesIO()
-    
-    # Márgenes ajustados para mejor uso del espacio
-    doc = SimpleDocTemplate(
-        buffer,
-        pagesize=portrait(letter),
-        leftMargin=0.3 * inch,
-        rightMargin=0.3 * inch,
-        topMargin=0.2 * inch,
-        bottomMargin=0.2 * inch
-    )
-
-    elements = []
-    styles = getSampleStyleSheet()
-
-    # Colores
-    azul_oscuro = colors.HexColor("#0d47a1")
-    azul_medio = colors.HexColor("#1976d2")
-    gris_medio = colors.HexColor("#424242")
-    gris_claro = colors.HexColor("#757575")
-    blanco = colors.HexColor("#ffffff")
-
-    # Datos fijos
-    CEDULA_DEF = "8025534"
-    ESPECIALIDAD_DEF = "Ginecología, Obstetricia, Medicina Materno-Fetal"
-    HOSPITAL_NOMBRE = "Hospital San Pedro"
-
-    # -----------------------------
-    # ENCABEZADO DISTRIBUIDO
-    # -----------------------------
-    from django.conf import settings
-    logo_path = os.path.join(settings.BASE_DIR, "static", "citas", "img", "logo.png")
-    
-    # Encabezado en 3 columnas: logo, título, contacto
-    header_data = []
-    
-    if os.path.exists(logo_path):
-        logo = Image(logo_path, width=35, height=35)  # Logo un poco más grande
-        fila = [
-            logo,
-            Paragraph(
-                f"<font size='11'><b>{HOSPITAL_NOMBRE}</b></font><br/>"
-                f"<font size='9' color='#1976d2'><b>RECETA MÉDICA</b></font>",
-                ParagraphStyle("titulo", fontSize=11, textColor=azul_oscuro, alignment=TA_CENTER)
-            ),
-            Paragraph(
-                f"<font size='7'><b>Av. 5 de Mayo Sur Nº 29</b></font><br/>"
-                f"<font size='7'>Zacapoaxtla, Pue.</font><br/>"
-                f"<font size='7'><b>Tel:</b> 233 314 3084</font><br/>"
-                f"<font size='7'><b>Fecha:</b> {cita.fecha.strftime('%d/%m/%Y')}</font>",
-                ParagraphStyle('contacto', fontSize=7, alignment=TA_RIGHT)
-            )
-        ]
-        col_widths = [0.7*inch, 5.0*inch, 2.3*inch]
-    else:
-        fila = [
-            Paragraph(
-                f"<font size='12'><b>{HOSPITAL_NOMBRE}</b></font><br/>"
-                f"<font size='10' color='#1976d2'><b>RECETA MÉDICA</b></font>",
-                ParagraphStyle("titulo", fontSize=12, textColor=azul_oscuro, alignment=TA_CENTER)
-            ),
-            "",
-            Paragraph(
-                f"<font size='7'><b>Av. 5 de Mayo Sur Nº 29</b></font><br/>"
-                f"<font size='7'>Zacapoaxtla, Pue.</font><br/>"
-                f"<font size='7'><b>Tel:</b> 233 314 3084</font><br/>"
-                f"<font size='7'><b>Fecha:</b> {cita.fecha.strftime('%d/%m/%Y')}</font>",
-                ParagraphStyle('contacto', fontSize=7, alignment=TA_RIGHT)
-            )
-        ]
-        col_widths = [4.0*inch, 1.0*inch, 3.0*inch]
-    
-    header_data.append(fila)
-    
-    header_table = Table(header_data, colWidths=col_widths)
-    header_table.setStyle(TableStyle([
-        ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
-        ('TOPPADDING', (0, 0), (-1, -1), 2),
-        ('BOTTOMPADDING', (0, 0), (-1, -1), 4),
-    ]))
-    
-    elements.append(header_table)
-    
-    # Línea separadora
-    elements.append(Spacer(1, 2))
-    linea = Table([['']], colWidths=[7.9*inch], rowHeights=[1])
-    linea.setStyle(TableStyle([
-        ('LINEBELOW', (0, 0), (-1, -1), 1, azul_oscuro),
-        ('LINEABOVE', (0, 0), (-1, -1), 0.5, colors.lightgrey),
-    ]))
-    elements.append(linea)
-    elements.append(Spacer(1, 8))
-
-    # ---------------------------------------
-    # INFORMACIÓN DISTRIBUIDA - COMO EN LA IMAGEN
-    # ---------------------------------------
-    paciente_nombre = f"{paciente.nombre} {paciente.apellido_paterno} {paciente.apellido_materno or ''}"
-    fecha_nac = getattr(paciente, 'fecha_nacimiento', None)
-    fecha_nac_str = fecha_nac.strftime('%d/%m/%Y') if fecha_nac else "---"
-    
-    # Tabla con 2 columnas principales (Paciente y Médico)
-    # Primera fila: Títulos
-    # Segunda fila: Valores alineados
-    
-    info_data = [
-        # Fila 1: Títulos
-        [
-            Paragraph("<font size='8'><b>PACIENTE:</b></font>", 
-                     ParagraphStyle('label', fontSize=8, textColor=azul_oscuro, alignment=TA_LEFT)),
-            Paragraph("<font size='8'><b>EDAD:</b></font>", 
-                     ParagraphStyle('label', fontSize=8, textColor=azul_oscuro, alignment=TA_LEFT)),
-            Paragraph("<font size='8'><b>FECHA NAC.:</b></font>", 
-                     ParagraphStyle('label', fontSize=8, textColor=azul_oscuro, alignment=TA_LEFT)),
-            "",  # Espacio para alinear con la segunda columna
-            Paragraph("<font size='8'><b>MÉDICO:</b></font>", 
-                     ParagraphStyle('label', fontSize=8, textColor=azul_oscuro, alignment=TA_LEFT)),
-            Paragraph("<font size='8'><b>ESPECIALIDAD:</b></font>", 
-                     ParagraphStyle('label', fontSize=8, textColor=azul_oscuro, alignment=TA_LEFT)),
-            Paragraph("<font size='8'><b>CÉDULA:</b></font>", 
-                     ParagraphStyle('label', fontSize=8, textColor=azul_oscuro, alignment=TA_LEFT)),
-        ],
-        # Fila 2: Valores
-        [
-            Paragraph(f"<font size='8'>{paciente_nombre}</font>", 
-                     ParagraphStyle('value', fontSize=8, textColor=gris_medio, alignment=TA_LEFT)),
-            Paragraph(f"<font size='8'>{paciente.edad} años</font>", 
-                     ParagraphStyle('value', fontSize=8, textColor=gris_medio, alignment=TA_LEFT)),
-            Paragraph(f"<font size='8'>{fecha_nac_str}</font>", 
-                     ParagraphStyle('value', fontSize=8, textColor=gris_medio, alignment=TA_LEFT)),
-            Spacer(1, 0.1*inch),  # Espaciador
-            Paragraph(f"<font size='8'>Dr. {doctor.user.get_full_name()}</font>", 
-                     ParagraphStyle('value', fontSize=8, textColor=gris_medio, alignment=TA_LEFT)),
-            Paragraph(f"<font size='7'>{ESPECIALIDAD_DEF}</font>", 
-                     ParagraphStyle('value', fontSize=7, textColor=gris_medio, alignment=TA_LEFT)),
-            Paragraph(f"<font size='8'>{CEDULA_DEF}</font>", 
-                     ParagraphStyle('value', fontSize=8, textColor=gris_medio, alignment=TA_LEFT)),
-        ]
-    ]
-    
-    # Anchos de columna optimizados para distribución
-    col_widths_info = [1.8*inch, 0.7*inch, 1.0*inch, 0.5*inch, 1.8*inch, 1.5*inch, 0.8*inch]
-    
-    info_table = Table(info_data, colWidths=col_widths_info)
-    info_table.setStyle(TableStyle([
-        ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
-        ('TOPPADDING', (0, 0), (-1, -1), 6),
-        ('BOTTOMPADDING', (0, 0), (-1, -1), 6),
-        ('LINEBELOW', (0, 0), (2, 0), 0.5, colors.lightgrey),
-        ('LINEBELOW', (4, 0), (-1, 0), 0.5, colors.lightgrey),
-        ('LINEBELOW', (0, 1), (2, 1), 0.5, colors.lightgrey),
-        ('LINEBELOW', (4, 1), (-1, 1), 0.5, colors.lightgrey),
-        ('SPAN', (3, 0), (3, 1)),  # Espaciador ocupa ambas filas
-    ]))
-    
-    elements.append(info_table)
-    elements.append(Spacer(1, 12))
-
-    # ---------------------------------------
-    # SIGNOS VITALES - TABLA COMPACTA
-    # ---------------------------------------
-    signos_header = Table([['SIGNOS VITALES']], colWidths=[7.9*inch])
-    signos_header.setStyle(TableStyle([
-        ('BACKGROUND', (0, 0), (-1, -1), azul_medio),
-        ('TEXTCOLOR', (0, 0), (-1, -1), blanco),
-        ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-        ('FONTSIZE', (0, 0), (-1, -1), 9),
-        ('BOLD', (0, 0), (-1, -1), 1),
-        ('TOPPADDING', (0, 0), (-1, -1), 5),
-        ('BOTTOMPADDING', (0, 0), (-1, -1), 5),
-    ]))
-    elements.append(signos_header)
-    
-    # Tabla de signos vitales en 2 filas compactas
-    signos_data = [
-        [
-            Paragraph("<font size='7'>Temperatura:</font>", ParagraphStyle('label', fontSize=7, textColor=gris_claro)),
-            Paragraph(f"<font size='8'>{signos.temperatura or '---'} °C</font>", ParagraphStyle('value', fontSize=8, textColor=gris_medio)),
-            Paragraph("<font size='7'>Presión arterial:</font>", ParagraphStyle('label', fontSize=7, textColor=gris_claro)),
-            Paragraph(f"<font size='8'>{signos.presion_arterial or '---'}</font>", ParagraphStyle('value', fontSize=8, textColor=gris_medio)),
-            Paragraph("<font size='7'>F. cardíaca:</font>", ParagraphStyle('label', fontSize=7, textColor=gris_claro)),
-            Paragraph(f"<font size='8'>{signos.frecuencia_cardiaca or '---'} lpm</font>", ParagraphStyle('value', fontSize=8, textColor=gris_medio))
-        ],
-        [
-            Paragraph("<font size='7'>F. respiratoria:</font>", ParagraphStyle('label', fontSize=7, textColor=gris_claro)),
-            Paragraph(f"<font size='8'>{signos.frecuencia_respiratoria or '---'} rpm</font>", ParagraphStyle('value', fontSize=8, textColor=gris_medio)),
-            Paragraph("<font size='7'>Sat. O₂:</font>", ParagraphStyle('label', fontSize=7, textColor=gris_claro)),
-            Paragraph(f"<font size='8'>{signos.saturacion_oxigeno or '---'}%</font>", ParagraphStyle('value', fontSize=8, textColor=gris_medio)),
-            Paragraph("<font size='7'>Peso:</font>", ParagraphStyle('label', fontSize=7, textColor=gris_claro)),
-            Paragraph(f"<font size='8'>{signos.peso or '---'} kg</font>", ParagraphStyle('value', fontSize=8, textColor=gris_medio))
-        ]
-    ]
-    
-    signos_table = Table(signos_data, colWidths=[1.1*inch, 0.9*inch, 1.1*inch, 0.9*inch, 1.0*inch, 0.9*inch])
-    signos_table.setStyle(TableStyle([
-        ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
-        ('TOPPADDING', (0, 0), (-1, -1), 6),
-        ('BOTTOMPADDING', (0, 0), (-1, -1), 6),
-        ('LINEBELOW', (0, 0), (-1, 0), 0.5, colors.lightgrey),
-        ('LINEBELOW', (0, 1), (-1, 1), 0.5, colors.lightgrey),
-    ]))
-    
-    elements.append(signos_table)
-    elements.append(Spacer(1, 12))
-
-    # ---------------------------------------
-    # DIAGNÓSTICO (SI EXISTE)
-    # ---------------------------------------
-        # ---------------------------------------
-    # DIAGNÓSTICO (SI EXISTE) - MISMO TAMAÑO QUE SIGNOS VITALES
-    # ---------------------------------------
-        # ---------------------------------------
-    # DIAGNÓSTICO (SI EXISTE) - ANCHO 7.8 PULGADAS (COMO EN VERSIÓN ANTERIOR)
-    # ---------------------------------------
-    if cita.diagnostico and cita.diagnostico.strip():
-        # Ajustar el espacio después de signos vitales
-        if elements and isinstance(elements[-1], Spacer):
-            elements[-1] = Spacer(1, 2)
-        
-        # Acortar diagnóstico
-        diagnostico_texto = cita.diagnostico
-        if len(diagnostico_texto) > 150:
-            diagnostico_texto = diagnostico_texto[:147] + "..."
-        
-        # ANCHO IGUAL AL DE SIGNOS VITALES EN VERSIÓN ANTERIOR: 7.8 pulgadas
-        diag_width = 7.8 * inch
-        
-        diag_data = [
-            ['DIAGNÓSTICO'],
-            [Paragraph(
-                f"<font size='7'>{diagnostico_texto.replace(chr(10), '<br/>')}</font>", 
-                ParagraphStyle('diagnostico', fontSize=7, textColor=gris_medio, leading=9, alignment=TA_CENTER)
-            )]
-        ]
-        
-        diag_table = Table(diag_data, colWidths=[diag_width], rowHeights=[0.25*inch, 0.6*inch])
-        
-        diag_table.setStyle(TableStyle([
-            # Encabezado igual que signos vitales
-            ('BACKGROUND', (0, 0), (-1, 0), azul_medio),
-            ('TEXTCOLOR', (0, 0), (-1, 0), blanco),
-            ('ALIGN', (0, 0), (-1, 0), 'CENTER'),
-            ('FONTSIZE', (0, 0), (-1, 0), 8),
-            ('BOLD', (0, 0), (-1, 0), 1),
-            ('TOPPADDING', (0, 0), (-1, 0), 4),
-            ('BOTTOMPADDING', (0, 0), (-1, 0), 4),
-            
-            # Contenido centrado
-            ('ALIGN', (0, 1), (-1, 1), 'CENTER'),
-            ('VALIGN', (0, 1), (-1, 1), 'MIDDLE'),
-            ('BACKGROUND', (0, 1), (-1, 1), colors.HexColor("#f5f5f5")),
-            ('TOPPADDING', (0, 1), (-1, 1), 8),
-            ('BOTTOMPADDING', (0, 1), (-1, 1), 8),
-            
-            ('BOX', (0, 0), (-1, -1), 0.5, colors.lightgrey),
-        ]))
-        
-        elements.append(diag_table)
-        elements.append(Spacer(1, 6)) # Espacio similar al que sigue a signos vitales
-
-    # ---------------------------------------
-    # MEDICAMENTOS E INDICACIONES (MÁXIMO ESPACIO)
-    # ---------------------------------------
-    medicamentos_texto = (receta.medicamentos or "").replace("\n", "<br/>")
-    indicaciones_texto = (receta.indicaciones or "").replace("\n", "<br/>")
-    
-    # Función para limitar texto
-    def limitar_texto(texto, max_lineas=5):
-        if not texto:
-            return texto
-        lineas = texto.split('<br/>')
-        if len(lineas) <= max_lineas:
-            return texto
-        return '<br/>'.join(lineas[:max_lineas]) + "<br/>..."
-    
-    medicamentos_texto = limitar_texto(medicamentos_texto, 4)
-    indicaciones_texto = limitar_texto(indicaciones_texto, 4)
-    
-    # Tabla pequeña de 2 columnas
-        # Tabla de 2 columnas para medicamentos e indicaciones
-    contenido_data = [
-        [
-            Paragraph("<font size='7'><b>MEDICAMENTOS PRESCRITOS</b></font>", 
-                     ParagraphStyle('subtitulo', fontSize=7, textColor=blanco, alignment=TA_CENTER)),
-            Paragraph("<font size='7'><b>INDICACIONES MÉDICAS</b></font>", 
-                     ParagraphStyle('subtitulo', fontSize=7, textColor=blanco, alignment=TA_CENTER))
-        ],
-        [
-            Paragraph(medicamentos_texto or "<i><font size='6' color='{gris_medio}'>Sin medicamentos</font></i>".format(gris_medio=gris_medio), 
-                     ParagraphStyle('contenido', fontSize=6, textColor=gris_medio, leading=8, alignment=TA_JUSTIFY)),
-            Paragraph(indicaciones_texto or "<i><font size='6' color='{gris_medio}'>Sin indicaciones</font></i>".format(gris_medio=gris_medio), 
-                     ParagraphStyle('contenido', fontSize=6, textColor=gris_medio, leading=8, alignment=TA_JUSTIFY))
-        ]
-    ]
-    
-    # Altura pequeña para cuadros
-    contenido_table = Table(contenido_data, colWidths=[3.4*inch, 3.4*inch], rowHeights=[0.3*inch, 1.0*inch])
-    contenido_table.setStyle(TableStyle([
-        ('VALIGN', (0, 0), (-1, -1), 'TOP'),
-        ('BACKGROUND', (0, 0), (-1, 0), azul_medio),  # Fondo azul como signos vitales
-        ('TEXTCOLOR', (0, 0), (-1, 0), blanco),  # Texto blanco como signos vitales
-        ('ALIGN', (0, 0), (-1, 0), 'CENTER'),
-        ('TOPPADDING', (0, 0), (-1, 0), 4),
-        ('BOTTOMPADDING', (0, 0), (-1, 0), 4),
-        ('TOPPADDING', (0, 1), (-1, 1), 6),
-        ('BOTTOMPADDING', (0, 1), (-1, 1), 6),
-        ('GRID', (0, 0), (-1, -1), 0.5, colors.lightgrey),
-    ]))
-    
-    elements.append(contenido_table)
-    elements.append(Spacer(1, 8))
-
-    # ---------------------------------------
-    # FIRMA
-    # ---------------------------------------
-    # Línea para firma
-        # ---------------------------------------
-    # FIRMA - SEPARADA DE LA TABLA ANTERIOR
-    # ---------------------------------------
-    # Agregar un Spacer para separar la firma de la tabla de arriba
-    elements.append(Spacer(1, 10))  # Aumenta este valor para más separación
-    
-    # Línea para firma (más corta)
-    linea_firma = Table([['']], colWidths=[2.0*inch], rowHeights=[0.3])
-    linea_firma.setStyle(TableStyle([
-        ('LINEABOVE', (0, 0), (-1, -1), 0.8, colors.black),
-    ]))
-    
-    # Contenedor con todo alineado a la derecha
-    firma_contenido = [
-        [linea_firma],
-        [Paragraph(
-            f"<font size='7'><b>Dr. {doctor.user.get_full_name()}</b></font>", 
-            ParagraphStyle("firma_nom", fontSize=7, alignment=TA_RIGHT)
-        )],
-        
-    ]
-    
-    # Tabla que ocupa todo el ancho pero tiene contenido alineado a la derecha
-    firma_table = Table(firma_contenido, colWidths=[7.4*inch])
-    firma_table.setStyle(TableStyle([
-        ('VALIGN', (0, 0), (-1, -1), 'TOP'),
-        ('ALIGN', (0, 0), (-1, -1), 'RIGHT'),
-        ('TOPPADDING', (0, 0), (-1, -1), 3),
-        ('BOTTOMPADDING', (0, 0), (-1, -1), 3),
-    ]))
-    
-    elements.append(firma_table)
-    elements.append(Spacer(1, 2))  # Pequeño espacio al final si es necesario
-
-    # ---------------------------------------
-    # CONSTRUIR DOCUMENTO
-    # ---------------------------------------
-    doc.build(elements)
+    if cita.estado != "Atendida":
+        cita.estado = "Atendida"
+        cita.save()
 
-    pdf = buffer.getvalue()
-    buffer.close()
+    # El PDF se sirve de caché mientras no cambie nada de lo que contiene
+    # (ver versiones.py); el navegador lo revalida con If-None-Match.
+    huella_actual = huella_receta(cita)
+    etag = f'"{huella_actual}"'
+    no_modificado = get_conditional_response(request, etag=etag)
+    if no_modificado is not None:
+        return no_modificado
 
-    response = HttpResponse(pdf, content_type="application/pdf")
+    response = HttpResponse(receta_pdf(cita.id, huella_actual), content_type="application/pdf")
     response['Content-Disposition'] = (
-        f'attachment; filename="receta_medica_{paciente.nombre}_{cita.fecha.strftime("%Y%m%d")}.pdf"')
+        f'attachment; filename="receta_medica_{cita.paciente.nombre}_{cita.fecha.strftime("%Y%m%d")}.pdf"')
+    response['ETag'] = etag
+    patch_cache_control(response, private=True, no_cache=True)
     return response
 
 
@@ -1532,32 +786,50 @@ def detalle_paciente(request, paciente_id):
     return render(request, 'recepcion/detalle_paciente.html', {'paciente': paciente})
 
 
+# Pacientes por página en la búsqueda del doctor
+PACIENTES_POR_PAGINA = 25
+# Máximo de sugerencias por consulta de autocompletado
+MAX_AUTOCOMPLETAR = 20
+
+
+@login_required
+def autocompletar_pacientes(request):
+    """Pacientes cuyo nombre, teléfono o número empieza con `q` (ver typeahead.py)."""
+    if request.user.role not in ['doctor', 'administradora']:
+        return JsonResponse({'error': 'No autorizado'}, status=403)
+
+    try:
+        limite = min(max(int(request.GET.get('k', 10)), 1), MAX_AUTOCOMPLETAR)
+    except ValueError:
+        limite = 10
+    return JsonResponse({'resultados': typeahead.indice.buscar(request.GET.get('q', ''), limite)})
+
+
 @login_required
 def buscar_pacientes_doctor(request):
     query = request.GET.get('q', '').strip()
 
     if query:
-        pacientes = Paciente.objects.filter(
-            Q(nombre__icontains=query) |
-            Q(apellido_paterno__icontains=query) |
-            Q(apellido_materno__icontains=query) |
-            Q(numero__icontains=query) |
-            Q(telefono__icontains=query)        # ← ✔️ Busca por teléfono
-        ).order_by('nombre')
+        # Sin acentos y por relevancia (ver busqueda.py)
+        pacientes = buscar_pacientes(query)
+        orden = ORDEN_BUSQUEDA
     else:
-        pacientes = Paciente.objects.all().order_by('nombre')
+        pacientes = Paciente.objects.all()
+        orden = ('nombre', 'id')
 
-    # 🔥 Agregar la última cita de cada paciente
-    pacientes_con_cita = []
-    for p in pacientes:
-        ultima_cita = Cita.objects.filter(paciente=p).order_by('-fecha', '-hora').first()
-        pacientes_con_cita.append({
-            'paciente': p,
-            'ultima_cita': ultima_cita
-        })
+    # Última cita de cada paciente en la misma consulta
+    ultima_cita = Cita.objects.filter(paciente=OuterRef('pk')).order_by('-fecha', '-hora').values('id')[:1]
+    pacientes = pacientes.annotate(ultima_cita_id=Subquery(ultima_cita))
+
+    # Solo la página visible (ver paginacion.py)
+    pagina = paginar(
+        pacientes, orden, PACIENTES_POR_PAGINA,
+        despues=request.GET.get('despues'), antes=request.GET.get('antes'),
+    )
 
     return render(request, 'doctor/buscar_pacientes.html', {
-        'pacientes_con_cita': pacientes_con_cita,
+        'pacientes': pagina.objetos,
+        'pagina': pagina,
         'query': query,
     })
 
@@ -1568,7 +840,6 @@ def buscar_pacientes_doctor(request):
 # --- Reportes en PDF ---
 # ---------------------------
 
-import io
 from django.http import FileResponse, HttpResponse
 from datetime import datetime, date, timedelta
 from django.utils import timezone
@@ -1580,80 +851,12 @@ def is_administradora(user):
     return user.is_authenticated and user.role.lower() == 'administradora'
 
 # 📄 Función general para crear el PDF
-def generar_pdf_reporte(titulo, citas):
-    from reportlab.lib.pagesizes import letter
-    from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
-    from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-    from reportlab.lib import colors
-    
-    buffer = io.BytesIO()
-    doc = SimpleDocTemplate(buffer, pagesize=letter)
-    styles = getSampleStyleSheet()
-
-    # Estilos
-    title_style = ParagraphStyle(
-        'Title',
-        parent=styles['Heading1'],
-        fontSize=16,
-        spaceAfter=30,
-        textColor=colors.HexColor("#1a365d"),
-        alignment=1
+def generar_pdf_reporte(request, titulo, inicio, fin):
+    exportacion = encolar_exportacion(
+        request.user, 'reporte', f'{titulo.replace(" ", "_")}.pdf',
+        titulo=titulo, inicio=inicio.isoformat(), fin=fin.isoformat(),
     )
-    
-    story = []
-    
-    # Título
-    story.append(Paragraph(titulo, title_style))
-    story.append(Spacer(1, 20))
-    
-    if citas.exists():
-        # Encabezados de tabla
-        data = [["Paciente", "Doctor", "Fecha", "Hora", "Estado"]]
-        
-        for cita in citas:
-            paciente_nombre = f"{cita.paciente.nombre} {cita.paciente.apellido_paterno} {cita.paciente.apellido_materno or ''}"
-            doctor_nombre = cita.doctor.user.get_full_name() if cita.doctor else "No asignado"
-            
-            data.append([
-                paciente_nombre,
-                doctor_nombre,
-                cita.fecha.strftime('%d/%m/%Y'),
-                cita.hora.strftime('%H:%M') if hasattr(cita.hora, 'strftime') else str(cita.hora),
-                cita.estado
-            ])
-        
-        # Crear tabla
-        table = Table(data, colWidths=[180, 150, 80, 60, 80])
-        table.setStyle(TableStyle([
-            ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor("#2d5a8c")),
-            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-            ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-            ('FONTSIZE', (0, 0), (-1, 0), 10),
-            ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-            ('BACKGROUND', (0, 1), (-1, -1), colors.HexColor("#f8f9fa")),
-            ('FONTNAME', (0, 1), (-1, -1), 'Helvetica'),
-            ('FONTSIZE', (0, 1), (-1, -1), 9),
-            ('GRID', (0, 0), (-1, -1), 1, colors.HexColor("#dee2e6"))
-        ]))
-        story.append(table)
-    else:
-        # Mensaje cuando no hay citas
-        no_data_style = ParagraphStyle(
-            'NoData',
-            parent=styles['BodyText'],
-            fontSize=12,
-            textColor=colors.gray,
-            alignment=1
-        )
-        story.append(Paragraph("No hay citas para el período seleccionado.", no_data_style))
-    
-    doc.build(story)
-    buffer.seek(0)
-    
-    response = HttpResponse(buffer, content_type='application/pdf')
-    response['Content-Disposition'] = f'attachment; filename="{titulo.replace(" ", "_")}.pdf"'
-    return response
+    return render(request, 'exportacion.html', {'exportacion': exportacion})
 
 # 📆 Reporte Diario
 @login_required
@@ -1666,8 +869,7 @@ def reporte_dia(request):
     else:
         fecha = date.today()
 
-    citas = Cita.objects.filter(fecha=fecha)
-    return generar_pdf_reporte(f"Reporte Diario - {fecha}", citas)
+    return generar_pdf_reporte(request, f"Reporte Diario - {fecha}", fecha, fecha)
 
 # 📅 Reporte Semanal
 @login_required
@@ -1683,8 +885,9 @@ def reporte_semana(request):
     inicio_semana = fecha - timedelta(days=fecha.weekday())
     fin_semana = inicio_semana + timedelta(days=6)
 
-    citas = Cita.objects.filter(fecha__range=(inicio_semana, fin_semana))
-    return generar_pdf_reporte(f"Reporte Semanal - {inicio_semana} a {fin_semana}", citas)
+    return generar_pdf_reporte(
+        request, f"Reporte Semanal - {inicio_semana} a {fin_semana}", inicio_semana, fin_semana
+    )
 
 # 🗓️ Reporte Mensual
 @login_required
@@ -1703,8 +906,9 @@ def reporte_mes(request):
     else:
         fin_mes = fecha.replace(month=fecha.month + 1, day=1) - timedelta(days=1)
 
-    citas = Cita.objects.filter(fecha__range=(inicio_mes, fin_mes))
-    return generar_pdf_reporte(f"Reporte Mensual - {fecha.strftime('%B %Y')}", citas)
+    return generar_pdf_reporte(
+        request, f"Reporte Mensual - {fecha.strftime('%B %Y')}", inicio_mes, fin_mes
+    )
 
 
 
@@ -1713,17 +917,92 @@ def detalle_paciente(request, paciente_id):
     return render(request, 'doctor/detalle_paciente.html', {'paciente': paciente})
 
 
+def version_agenda(doctor_id, dia):
+    """
+    Versión de la agenda del doctor ese día: cambia con cualquier cita o
+    signos vitales de ese día (ver signals.py). Solo lee la caché.
+    """
+    return f'"{huella(("agenda_dia", f"{doctor_id}:{dia.isoformat()}"))}"'
+
+
+@login_required
+@user_passes_test(is_doctor)
 def actualizar_citas(request):
-    doctor = request.user.doctor
+    doctor_id = request.user.pk  # Doctor usa al usuario como llave primaria
     hoy = date.today()
 
+    # Si el navegador ya tiene esta versión de la agenda se responde 304 sin
+    # leer las citas
+    etag = version_agenda(doctor_id, hoy)
+    no_modificado = get_conditional_response(request, etag=etag)
+    if no_modificado is not None:
+        return no_modificado
+
     citas = Cita.objects.filter(
-        doctor=doctor,
+        doctor_id=doctor_id,
         fecha=hoy  # ← SOLO citas del día actual
-    ).order_by("hora")
+    ).select_related('paciente', 'signosvitales').order_by("hora")
+
+    response = render(request, "doctor/partials/tabla_citas.html", {"citas": citas})
+    response['ETag'] = etag
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
+
+
+# ------------------------------------------
+# EVENTOS DE LA AGENDA (SERVER-SENT EVENTS)
+# ------------------------------------------
+import asyncio
+import time
+
+from asgiref.sync import sync_to_async
+from django.http import StreamingHttpResponse
+
+# Cada cuánto se revisa la versión de la agenda (una lectura de la caché,
+# ninguna consulta a la base)
+EVENTOS_REVISAR_SEGUNDOS = 1
+# Comentario vacío para que los proxies no cierren una conexión sin eventos
+EVENTOS_LATIDO_SEGUNDOS = 20
+# Duración de cada conexión; el navegador (EventSource) se reconecta solo
+EVENTOS_DURACION_SEGUNDOS = 5 * 60
+
+
+async def _eventos_agenda(doctor_id, ultima):
+    """
+    Manda un evento 'agenda' (con la versión como id) cada vez que cambia la
+    versión de la agenda del día, empezando por la actual si no es `ultima`.
+    """
+    yield "retry: 3000\n\n"
+    inicio = latido = time.monotonic()
+    while time.monotonic() - inicio < EVENTOS_DURACION_SEGUNDOS:
+        version = await sync_to_async(version_agenda)(doctor_id, date.today())
+        if version != ultima:
+            ultima = version
+            yield f"event: agenda\nid: {version}\ndata: \n\n"
+            latido = time.monotonic()
+        elif time.monotonic() - latido >= EVENTOS_LATIDO_SEGUNDOS:
+            yield ": latido\n\n"
+            latido = time.monotonic()
+        await asyncio.sleep(EVENTOS_REVISAR_SEGUNDOS)
 
-    return render(request, "doctor/partials/tabla_citas.html", {"citas": citas})
 
+@login_required
+@user_passes_test(is_doctor)
+async def eventos_citas(request):
+    """
+    Canal de eventos del dashboard del doctor: avisa cuando cambia su agenda
+    del día para que el navegador pida `actualizar_citas`. Solo consulta la
+    base al conectarse (sesión y usuario); mientras no hay cambios solo lee
+    la versión de la caché. Necesita el servidor ASGI (ver Procfile).
+    """
+    user = await request.auser()
+    response = StreamingHttpResponse(
+        _eventos_agenda(user.pk, request.headers.get('Last-Event-ID')),
+        content_type='text/event-stream',
+    )
+    response['X-Accel-Buffering'] = 'no'
+    patch_cache_control(response, no_cache=True)
+    return response
 
 
 # ---------------------------
@@ -1733,7 +1012,8 @@ from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status, permissions
 from rest_framework.authtoken.models import Token   
-from .serializers import RegisterSerializer, CitaSerializer, SignosVitalesSerializer
+from .serializers import RegisterSerializer, CitaSerializer, SignosVitalesSerializer, SignosLoteSerializer, CAMPOS_CITA_RAPIDA, citas_rapidas
+from .services import MAX_SIGNOS_LOTE, LoteInvalido, guardar_signos_lote
 from django.contrib.auth import get_user_model
 CustomUser = get_user_model()
 from django.db import IntegrityError # <-- ¡Importa esto!
@@ -1799,41 +1079,66 @@ class LoginAPIView(APIView):
             return Response({'token': token.key, 'username': user.username})
 
         return Response({'detail':'Credenciales inválidas o no eres enfermera'}, status=status.HTTP_401_UNAUTHORIZED)
+
+
+class LogoutAPIView(APIView):
+    """Cierra la sesión de la app: borra el token (y su usuario en caché, ver autenticacion.py)."""
+    permission_classes = [permissions.IsAuthenticated]
+    def post(self, request):
+        Token.objects.filter(user=request.user).delete()
+        return Response(status=status.HTTP_204_NO_CONTENT)
     
 from datetime import datetime, timedelta
 
 class CitasListAPIView(APIView):
+    """
+    Citas con paciente y signos vitales, en orden de fecha y hora:
+    GET /api/citas/[?date=AAAA-MM-DD | ?desde=AAAA-MM-DD&hasta=AAAA-MM-DD][&limite=N][&cursor=...]
+    Sin `limite` ni `cursor` responde todas las citas del rango, como antes.
+    Con alguno de los dos responde una página; si hay más, el encabezado
+    `Link` trae la URL de la siguiente (rel="next").
+    """
     permission_classes = [permissions.IsAuthenticated]
+    POR_PAGINA = 500
+    MAX_LIMITE = 1000
 
     def get(self, request):
-        # CAMBIO: Usar __iexact para ignorar mayúsculas/minúsculas.
-        citas = Cita.objects.all().select_related('paciente').order_by('fecha', 'hora') 
-        # 1. Consulta base
-        citas = Cita.objects.all().select_related('paciente').order_by('fecha', 'hora')
+        params = request.query_params
+        try:
+            desde = params.get('desde') or params.get('date')
+            hasta = params.get('hasta') or params.get('date')
+            desde = date.fromisoformat(desde) if desde else None
+            hasta = date.fromisoformat(hasta) if hasta else None
+            limite = min(max(int(params.get('limite', self.POR_PAGINA)), 1), self.MAX_LIMITE)
+        except ValueError:
+            return Response(
+                {'detail': 'Parámetros: date=AAAA-MM-DD o desde/hasta=AAAA-MM-DD, limite=N y cursor.'},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
 
-        # 2. Obtener el parámetro 'date' de la URL (Ej: '2025-10-17')
-        target_date_str = request.query_params.get('date') 
+        citas = Cita.objects.all()
+        if desde:
+            citas = citas.filter(fecha__gte=desde)
+        if hasta:
+            citas = citas.filter(fecha__lte=hasta)
+
+        # Una consulta (por página), sin instanciar modelos ni serializadores
+        # (ver citas_rapidas en serializers.py)
+        filas = citas.values(*CAMPOS_CITA_RAPIDA)
+        if 'limite' not in params and 'cursor' not in params:
+            return Response(citas_rapidas(filas.order_by(*ORDEN_CITAS).iterator(chunk_size=2000)))
+
+        cursor = params.get('cursor')
+        if cursor and leer_cursor(cursor, ORDEN_CITAS, filas) is None:
+            return Response({'detail': 'Cursor inválido.'}, status=status.HTTP_400_BAD_REQUEST)
+        pagina = paginar(filas, ORDEN_CITAS, limite, despues=cursor)
+        respuesta = Response(citas_rapidas(pagina.objetos))
+        if pagina.siguiente:
+            siguiente = params.copy()
+            siguiente['cursor'] = pagina.siguiente
+            respuesta['Link'] = f'<{request.build_absolute_uri(request.path)}?{siguiente.urlencode()}>; rel="next"'
+        return respuesta
 
-        if target_date_str:
-            try:
-                # 3. FILTRADO CORREGIDO: Usamos el campo 'fecha' que sí existe.
-                
-                # Si 'fecha' es un DateField, Django puede filtrar por el string directo.
-                # Utilizamos 'fecha__exact' o simplemente 'fecha'
-                citas = citas.filter(fecha=target_date_str)
-                
-                # NOTA: La línea original de ordenación ya usa 'fecha' y 'hora', 
-                # lo que confirma que son campos separados.
-                
-            except Exception:
-                # Manejar cualquier error de conversión de fecha si fuera necesario, 
-                # aunque 'fecha=target_date_str' debería ser robusto si el formato es 'YYYY-MM-DD'.
-                pass 
-                
-        # 4. Serializar y devolver los datos
-        ser = CitaSerializer(citas, many=True)
-        return Response(ser.data)
-    
 class SignosVitalesCreateAPIView(APIView):
     permission_classes = [permissions.IsAuthenticated]
     def post(self, request):
@@ -1863,6 +1168,26 @@ class SignosVitalesCreateAPIView(APIView):
         return Response(ser.errors, status=status.HTTP_400_BAD_REQUEST)
     
     
+class SignosVitalesLoteAPIView(APIView):
+    """
+    Signos vitales de varias citas en una solicitud:
+    POST /api/signos/lote/ con una lista de {clave, cita, peso, ...}.
+    `clave` es un UUID que la app genera por captura; reenviar el mismo
+    lote no vuelve a escribir nada. Ver services.guardar_signos_lote.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+
+    def post(self, request):
+        ser = SignosLoteSerializer(data=request.data, many=True, allow_empty=False, max_length=MAX_SIGNOS_LOTE)
+        if not ser.is_valid():
+            return Response(ser.errors, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            resultado = guardar_signos_lote(ser.validated_data)
+        except LoteInvalido as e:
+            return Response(e.errores, status=status.HTTP_400_BAD_REQUEST)
+        return Response(resultado, status=status.HTTP_200_OK)
+
+
     # views.py (Ejemplo de la vista de detalle de cita)
 
 class CitaDetailAPIView(APIView):
@@ -1888,6 +1213,99 @@ class CitaDetailAPIView(APIView):
         from django.db.models import F
 
 
+class SincronizacionAPIView(APIView):
+    """
+    Cambios desde la última sincronización de la app:
+    GET /api/sync/[?since=<cursor>]
+    Sin `since` (o con uno muy viejo o inválido) responde todo con
+    `completo: true`. Con `hay_mas: true` se pide de nuevo con el `cursor`
+    recibido. Ver sincronizacion.py.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request):
+        return Response(cambios(request.query_params.get('since')))
+
+
+class DisponibilidadAPIView(APIView):
+    """
+    Horas libres de un doctor en un día:
+    GET /api/disponibilidad/?doctor=<id>&fecha=AAAA-MM-DD[&hora=HH:MM]
+    """
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request):
+        try:
+            doctor_id = int(request.query_params['doctor'])
+            fecha = date.fromisoformat(request.query_params['fecha'])
+            hora = request.query_params.get('hora')
+            hora = datetime.strptime(hora, '%H:%M').time() if hora else None
+        except (KeyError, ValueError):
+            return Response(
+                {'detail': 'Parámetros: doctor=<id>, fecha=AAAA-MM-DD y opcionalmente hora=HH:MM.'},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        agenda = cargar_agenda(doctor_id, fecha)
+        datos = {
+            'doctor': doctor_id,
+            'fecha': fecha.isoformat(),
+            'citas': len(agenda),
+            'llena': agenda.llena,
+            'horas_libres': [] if agenda.llena else [h.strftime('%H:%M') for h in agenda.horas_libres()],
+        }
+        if hora is not None:
+            datos['hora'] = hora.strftime('%H:%M')
+            datos['libre'] = agenda.libre(hora)
+        return Response(datos)
+
+
+class EspaciosLibresAPIView(APIView):
+    """
+    Primeros espacios libres de uno o varios doctores en un rango de fechas:
+    GET /api/espacios-libres/?desde=AAAA-MM-DD[&hasta=AAAA-MM-DD][&doctor=<id>...][&limite=N]
+    Sin `doctor` se busca en todos; `hasta` es `desde` + 14 días por defecto.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+    MAX_DIAS = 60
+    MAX_LIMITE = 100
+
+    def get(self, request):
+        try:
+            desde = date.fromisoformat(request.query_params.get('desde') or timezone.localdate().isoformat())
+            hasta = request.query_params.get('hasta')
+            hasta = date.fromisoformat(hasta) if hasta else desde + timedelta(days=14)
+            doctores = [int(d) for d in request.query_params.getlist('doctor')] or None
+            limite = min(int(request.query_params.get('limite', 10)), self.MAX_LIMITE)
+        except ValueError:
+            return Response(
+                {'detail': 'Parámetros: desde/hasta=AAAA-MM-DD, doctor=<id> (repetible), limite=N.'},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        if (hasta - desde).days > self.MAX_DIAS:
+            return Response(
+                {'detail': f'El rango no puede pasar de {self.MAX_DIAS} días.'},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        espacios = buscar_espacios(desde, hasta, doctores=doctores, limite=limite)
+        nombres = {
+            pk: f"Dr. {nombre} {apellido}"
+            for pk, nombre, apellido in Doctor.objects.filter(
+                pk__in={doctor_id for _, _, doctor_id in espacios}
+            ).values_list('pk', 'user__nombre', 'user__apellido_paterno')
+        }
+        return Response([
+            {
+                'doctor': doctor_id,
+                'doctor_nombre': nombres.get(doctor_id),
+                'fecha': fecha.isoformat(),
+                'hora': hora.strftime('%H:%M'),
+            }
+            for fecha, hora, doctor_id in espacios
+        ])
+
+
 #from django.views.decorators.csrf import csrf_exempt
 #from django.http import JsonResponse
 
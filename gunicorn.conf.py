@@ -0,0 +1,11 @@
+"""
+Configuración de gunicorn (la lee solo desde la raíz del proyecto, ver Procfile).
+"""
+
+
+def post_worker_init(worker):
+    # Cada worker arma su índice de autocompletado al arrancar, no con la
+    # primera búsqueda (ver citas/typeahead.py)
+    from citas import typeahead
+
+    typeahead.indice.precargar()
@@ -11,6 +11,7 @@ https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 import os
 from django.conf import global_settings
+from django.core.exceptions import ImproperlyConfigured
 from pathlib import Path
 
 
@@ -51,7 +52,8 @@ INSTALLED_APPS = [
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework.authentication.TokenAuthentication',
+        # TokenAuthentication con el usuario en caché
+        'citas.autenticacion.TokenEnCache',
     ),
     'DEFAULT_PERMISSION_CLASSES': (
         'rest_framework.permissions.IsAuthenticated',
@@ -63,6 +65,7 @@ REST_FRAMEWORK = {
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
+    'citas.sesiones.RenovarSesionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
@@ -166,5 +169,60 @@ LOGOUT_REDIRECT_URL = '/login/'
 
 # Configuración de sesiones
 SESSION_COOKIE_AGE = 1209600  # 2 semanas en segundos
-SESSION_SAVE_EVERY_REQUEST = True
-SESSION_EXPIRE_AT_BROWSER_CLOSE = False
\ No newline at end of file
+# La expiración la corre RenovarSesionMiddleware sin escribir en cada solicitud
+# (citas/sesiones.py); la sesión se lee de la caché y, si no está, de la base
+SESSION_ENGINE = 'django.contrib.sessions.backends.cached_db'
+SESSION_SAVE_EVERY_REQUEST = False
+SESSION_RENOVAR_SI_QUEDAN = SESSION_COOKIE_AGE - 24 * 60 * 60  # como máximo una escritura al día
+SESSION_EXPIRE_AT_BROWSER_CLOSE = False
+
+# Tareas en segundo plano (citas/tasks.py)
+TAREAS_HILOS = 2        # hilos que atienden la cola de tareas por proceso
+OCR_PROCESOS = 2        # procesos del pool de OCR
+OCR_TIMEOUT = 300       # segundos máximos por archivo
+
+# PDFs generados (citas/pdfs.py)
+PDF_SPOOL_MAX = 2 * 1024 * 1024  # bytes en memoria antes de pasar a archivo temporal
+EXPORTACION_TIMEOUT = 10 * 60  # segundos 'Procesando' tras los que otro worker retoma una exportación
+EXPORTACION_INTENTOS = 3  # veces que se toma una exportación antes de marcarla 'Error'
+EXPORTACION_VIGENCIA = 60 * 60  # segundos que un PDF exportado se puede descargar
+RECETA_CACHE_SEGUNDOS = 7 * 24 * 60 * 60  # vigencia de un PDF de receta en caché
+
+# Caché compartida por todos los procesos y servidores. Es obligatorio que
+# sea la misma para todos: guarda versiones de contenido y PDFs generados
+# (citas/versiones.py), el usuario de cada token de la API
+# (citas/autenticacion.py) y las sesiones (SESSION_ENGINE cached_db). Una
+# caché por servidor dejaría sesiones y tokens válidos en los demás después
+# de cerrar sesión o desactivar al usuario.
+# En producción es Redis y REDIS_URL es obligatorio (p. ej.
+# redis://localhost:6379/1): sin él el sitio no arranca. Solo con DEBUG (y en
+# las pruebas) se acepta una tabla de la base, que se crea con
+# `manage.py createcachetable`; cada lectura de la caché sería una consulta.
+if os.environ.get('REDIS_URL'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.environ['REDIS_URL'],
+        }
+    }
+elif not DEBUG:
+    raise ImproperlyConfigured("Falta REDIS_URL: la caché compartida es obligatoria en producción.")
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+            'LOCATION': 'citas_cache',
+            'OPTIONS': {'MAX_ENTRIES': 20000},
+        }
+    }
+
+# Autocompletado de pacientes (citas/typeahead.py)
+TYPEAHEAD_MAX_EDAD = 300  # segundos máximos antes de reconstruir el índice en memoria
+
+# Sincronización de la app de enfermería (citas/sincronizacion.py)
+SYNC_SOLAPE = 120               # segundos que cada sincronización repite de la anterior
+SYNC_ELIMINACIONES_DIAS = 30    # días que se guardan los registros de borrados
+SYNC_POR_PAGINA = 1000          # registros por respuesta de /api/sync/
+
+# Autenticación de la API (citas/autenticacion.py)
+TOKEN_CACHE_TTL = 300           # segundos que se guarda el usuario de un token